@@ -101,6 +101,9 @@ def _init():
         proprietary_sim_types=(_DEFAULT_PROPRIETARY_CODES, set, 'codes that require authorization'),
         #TODO(robnagler) make sim_type config
         rs4pi_dose_calc=(False, bool, 'run the real dose calculator'),
+        #TODO(robnagler) prototype: the stream is relayed through a flask worker, which
+        # it holds for the whole run. Serve it from the supervisor before enabling by default.
+        run_status_stream=(False, bool, 'prototype: browsers receive animation status as server-sent events'),
         sim_types=(None, _cfg_sim_types, 'simulation types (codes) to be imported'),
         srw=dict(
             mask_in_toolbar=(pkconfig.channel_in_internal_test(), bool, 'Show the mask element in toolbar'),
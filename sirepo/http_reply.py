@@ -14,6 +14,7 @@ from pykern.pkcollections import PKDict
 from pykern.pkdebug import pkdc, pkdexc, pkdlog, pkdp
 import flask
 import mimetypes
+import numpy
 import pykern.pkinspect
 import re
 import sirepo.http_request
@@ -62,6 +63,31 @@ def gen_exception(exc):
     return _gen_exception_error(exc)
 
 
+def gen_event_stream(chunks, on_close=None):
+    """Generate server-sent events flask response
+
+    Args:
+        chunks (iter): bytes already formatted as events
+        on_close (callable): called when the client disconnects or chunks ends
+    Returns:
+        flask.Response: reply object
+    """
+    def _gen():
+        try:
+            for c in chunks:
+                yield c
+        finally:
+            if on_close:
+                on_close()
+
+    r = headers_for_no_cache(
+        flask.Response(_gen(), mimetype=MIME_TYPE.event_stream),
+    )
+    # nginx must not buffer events
+    r.headers['X-Accel-Buffering'] = 'no'
+    return r
+
+
 def gen_file_as_attachment(content_or_path, filename=None, content_type=None):
     """Generate a flask file attachment response
 
@@ -92,6 +118,32 @@ def gen_file_as_attachment(content_or_path, filename=None, content_type=None):
         as_attachment(f(), content_type, filename))
 
 
+def gen_frame(value):
+    """Generate a simulationFrame response
+
+    Clients which accept `MIME_TYPE.sirepo_frame` get the frame in the
+    format of `sirepo.template.template_common.frame_encode` with
+    float32 buffers. Otherwise, the response is JSON.
+
+    Args:
+        value (dict): frame, which may contain numpy arrays
+    Returns:
+        flask.Response: reply object
+    """
+    from sirepo.template import template_common
+
+    if not any(m == MIME_TYPE.sirepo_frame for m, _ in flask.request.accept_mimetypes):
+        r = gen_json(_gen_frame_tolist(value))
+    else:
+        r = flask.current_app.response_class(
+            template_common.frame_encode(value, float32=True),
+            mimetype=MIME_TYPE.sirepo_frame,
+        )
+    # frames may be cached by the browser in either format
+    r.headers['Vary'] = 'Accept'
+    return r
+
+
 def gen_json(value, pretty=False, response_kwargs=None):
     """Generate JSON flask response
 
@@ -206,10 +258,12 @@ def init(app, **imports):
     _app = app
     sirepo.util.setattr_imports(imports)
     MIME_TYPE = pkcollections.Dict(
+        event_stream='text/event-stream',
         html='text/html',
         js='application/javascript',
         json=app.config.get('JSONIFY_MIMETYPE', 'application/json'),
         py='text/x-python',
+        sirepo_frame='application/x-sirepo-frame',
     )
     s = simulation_db.get_schema(sim_type=None)
     _RELOAD_JS_ROUTES = frozenset(
@@ -340,3 +394,14 @@ def _gen_exception_reply_UserAlert(args):
 def _gen_exception_werkzeug(exc):
 #TODO(robnagler) convert exceptions to our own
     raise exc
+
+
+def _gen_frame_tolist(value):
+    """Convert numpy arrays, e.g. from `template_common.frame_decode`, to lists"""
+    if isinstance(value, dict):
+        return PKDict((k, _gen_frame_tolist(v)) for k, v in value.items())
+    if isinstance(value, numpy.ndarray):
+        return value.tolist()
+    if isinstance(value, list):
+        return [_gen_frame_tolist(v) for v in value]
+    return value
@@ -155,6 +155,7 @@ def agent_env(env=None, uid=None):
         **pkconfig.to_environ((
             'pykern.*',
             'sirepo.feature_config.job',
+            'sirepo.pkcli.job_agent.fastcgi_*',
         ))
     ).pksetdefault(
         PYTHONPATH='',
@@ -182,6 +183,11 @@ def init():
             str,
             'shared secret between supervisor and server',
         ),
+        supervisor_unix_socket=(
+            None,
+            str,
+            'unix socket supervisor listens on for server requests (default is tcp)',
+        ),
         verify_tls=(not pkconfig.channel_in('dev'), bool, 'do not validate (self-signed) certs'),
     )
     global SUPERVISOR_SRV_ROOT, LIB_FILE_ROOT, DATA_FILE_ROOT
@@ -11,24 +11,39 @@ from sirepo import api_perm
 from sirepo import simulation_db
 from sirepo.template import template_common
 import inspect
+import os
 import pykern.pkconfig
 import pykern.pkio
 import re
 import requests
+import requests.adapters
 import sirepo.auth
+import sirepo.feature_config
 import sirepo.http_reply
 import sirepo.http_request
 import sirepo.job
 import sirepo.mpi
 import sirepo.sim_data
 import sirepo.util
+import socket
+import urllib3.connection
+import urllib3.connectionpool
 
 
 cfg = None
 
+#: apis which reply pending when they time out (see `_request`)
+_EARLY_RETURN_APIS = frozenset(('api_runSimulation',))
+
 #: how many call frames to search backwards to find the api_.* caller
 _MAX_FRAME_SEARCH_DEPTH = 6
 
+#: how soon the client should poll after an early return
+_PENDING_NEXT_REQUEST_SECONDS = 2
+
+#: requests.Session to supervisor for this process (see `_session`)
+_session_cache = None
+
 @api_perm.require_user
 def api_downloadDataFile(simulation_type, simulation_id, model, frame, suffix=None):
 #TODO(robnagler) validate suffix and frame
@@ -122,6 +137,21 @@ def api_runStatus():
     return _request()
 
 
+@api_perm.require_user
+def api_runStatusStream():
+    """Status replies as server-sent events while the job is running
+
+    This is a prototype, disabled unless feature_config.run_status_stream.
+    The supervisor's stream is relayed here, so each stream holds a server
+    worker for the duration of the run. Clients fall back to
+    `api_runStatus` if this fails.
+    """
+    if not sirepo.feature_config.cfg().run_status_stream:
+        sirepo.util.raise_not_found('runStatusStream is disabled')
+    r = _request(_request_stream=True)
+    return sirepo.http_reply.gen_event_stream(r.iter_content(chunk_size=None), r.close)
+
+
 @api_perm.require_user
 def api_simulationFrame(frame_id):
     return template_common.sim_frame(
@@ -153,7 +183,18 @@ def init_apis(*args, **kwargs):
     pykern.pkio.mkdir_parent(sirepo.job.DATA_FILE_ROOT)
 
     cfg = pykern.pkconfig.init(
+        connect_timeout_secs=(5, int, 'how long to wait to connect to supervisor'),
+        pool_size=(10, int, 'maximum connections kept open to supervisor'),
         supervisor_uri=sirepo.job.DEFAULT_SUPERVISOR_URI_DECL,
+        timeout_secs=dict(
+            default=(0, int, 'how long to wait for supervisor to reply (0 is forever)'),
+            job_supervisor_ping=(10, int, 'overrides default for jobSupervisorPing'),
+            run_simulation=(
+                15,
+                int,
+                'how long before runSimulation replies pending and client polls runStatus',
+            ),
+        ),
     )
 
 
@@ -170,6 +211,7 @@ def _request(**kwargs):
                 '{}: max frame search depth reached'.format(f.f_code)
             )
     k = PKDict(kwargs)
+    s = k.pkdel('_request_stream')
     u = k.pkdel('_request_uri') or cfg.supervisor_uri + sirepo.job.SERVER_URI
     c = k.pkdel('_request_content') or _request_content(k)
     c.pkupdate(
@@ -181,13 +223,34 @@ def _request(**kwargs):
         c.api,
         c.get('runDir')
     )
-    r = requests.post(
-        u,
-        data=pkjson.dump_bytes(c),
-        headers=PKDict({'Content-type': 'application/json'}),
-        verify=sirepo.job.cfg.verify_tls,
-    )
+    try:
+        r = _session().post(
+            u,
+            data=pkjson.dump_bytes(c),
+            headers=PKDict({'Content-type': 'application/json'}),
+            stream=bool(s),
+            timeout=_timeout(c.api),
+            verify=sirepo.job.cfg.verify_tls,
+        )
+    except requests.exceptions.ReadTimeout:
+        if c.api not in _EARLY_RETURN_APIS:
+            raise
+        # supervisor continues processing the request and replies
+        # pending to runStatus for this computeJobHash until it is done
+        pkdlog('api={} timed out so replying pending', c.api)
+        return PKDict(
+            state=sirepo.job.PENDING,
+            nextRequestSeconds=_PENDING_NEXT_REQUEST_SECONDS,
+            nextRequest=PKDict(
+                computeJobHash=c.computeJobHash,
+                report=c.analysisModel,
+                simulationId=c.simulationId,
+                simulationType=c.simulationType,
+            ),
+        )
     r.raise_for_status()
+    if s:
+        return r
     return pkjson.load_any(r.content)
 
 
@@ -250,3 +313,58 @@ def _run_mode(request_content):
         sbatchCores=m.sbatchCores,
         sbatchHours=m.sbatchHours,
     )
+
+
+def _session():
+    """Keep-alive connections to supervisor shared by this process
+
+    uwsgi may fork after `init_apis` so the session is created on first
+    use in each process.
+
+    Returns:
+        requests.Session: session for `cfg.supervisor_uri`
+    """
+    global _session_cache
+
+    p = os.getpid()
+    if not _session_cache or _session_cache.pid != p:
+        s = requests.Session()
+        s.mount(
+            cfg.supervisor_uri,
+            (
+                _UnixSocketAdapter if sirepo.job.cfg.supervisor_unix_socket
+                else requests.adapters.HTTPAdapter
+            )(pool_connections=1, pool_maxsize=cfg.pool_size),
+        )
+        _session_cache = PKDict(pid=p, session=s)
+    return _session_cache.session
+
+
+def _timeout(api):
+    t = cfg.timeout_secs.get(
+        re.sub('([A-Z])', lambda m: '_' + m.group(1).lower(), api[len('api_'):]),
+        cfg.timeout_secs.default,
+    )
+    return (cfg.connect_timeout_secs, t or None)
+
+
+class _UnixSocketAdapter(requests.adapters.HTTPAdapter):
+    """Sends http requests over `sirepo.job.cfg.supervisor_unix_socket`"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = PKDict(http=_UnixSocketPool)
+
+
+class _UnixSocketConnection(urllib3.connection.HTTPConnection):
+
+    def _new_conn(self):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if isinstance(self.timeout, (int, float)):
+            s.settimeout(self.timeout)
+        s.connect(sirepo.job.cfg.supervisor_unix_socket)
+        return s
+
+
+class _UnixSocketPool(urllib3.connectionpool.HTTPConnectionPool):
+    ConnectionCls = _UnixSocketConnection
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""Persistent job state for the supervisor
+
+Each `job_supervisor._ComputeJob` keeps its state (``db``) in a store
+selected by configuration. The default is SQLite (WAL mode); the one
+JSON file per computeJid layout is retained as ``jsonfile``.
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from pykern import pkconfig, pkinspect
+from pykern.pkcollections import PKDict
+from pykern.pkdebug import pkdp, pkdlog
+import importlib
+
+
+#: fields of the job state which can be passed to `DbBase.search`
+SEARCH_FIELDS = frozenset(('simulationType', 'status', 'uid'))
+
+_DEFAULT_MODULE = 'sqlite'
+
+cfg = None
+
+
+class DbBase(PKDict):
+
+    def __init__(self, db_dir):
+        super().__init__(db_dir=db_dir)
+
+    def load_all(self):
+        """Read all job states (used at startup)
+
+        Returns:
+            list: PKDict for each job
+        """
+        raise NotImplementedError()
+
+    def read(self, computeJid):
+        """Read a single job state
+
+        Args:
+            computeJid (str): which job
+        Returns:
+            PKDict: job state or None if not found
+        """
+        raise NotImplementedError()
+
+    def search(self, **kwargs):
+        """Find job states which match all of `kwargs`
+
+        Args:
+            kwargs (dict): subset of `SEARCH_FIELDS` and values to match
+        Returns:
+            list: PKDict for each matching job
+        """
+        raise NotImplementedError()
+
+    def write(self, db):
+        """Persist a single job state
+
+        Args:
+            db (PKDict): job state (must contain computeJid)
+        """
+        self.write_many((db,))
+
+    def write_many(self, dbs):
+        """Persist several job states in one batch
+
+        Args:
+            dbs (iter): PKDict job states
+        """
+        raise NotImplementedError()
+
+    def _assert_search(self, kwargs):
+        assert kwargs and SEARCH_FIELDS.issuperset(kwargs.keys()), \
+            'invalid search fields={}'.format(list(kwargs.keys()))
+
+
+def init(db_dir):
+    """Create the configured job state store
+
+    Args:
+        db_dir (py.path): where the store lives
+    Returns:
+        DbBase: store instance
+    """
+    global cfg
+    assert not cfg
+    cfg = pkconfig.init(
+        module=(_DEFAULT_MODULE, str, 'job state store: sqlite or jsonfile'),
+    )
+    m = importlib.import_module(
+        pkinspect.module_name_join((pkinspect.this_module().__name__, cfg.module)),
+    )
+    pkdlog('module={} db_dir={}', cfg.module, db_dir)
+    return m.init_class()(db_dir)
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""Job state stored as one JSON file per computeJid (legacy layout)
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from pykern import pkio
+from pykern import pkjson
+from pykern.pkdebug import pkdp, pkdlog
+from sirepo import job_db
+import sirepo.util
+
+
+class JsonFileDb(job_db.DbBase):
+
+    def __init__(self, db_dir):
+        super().__init__(db_dir)
+        pkio.mkdir_parent(self.db_dir)
+
+    def load_all(self):
+        return [
+            pkjson.load_any(f)
+            for f in pkio.sorted_glob(self.db_dir.join('*.json'))
+        ]
+
+    def read(self, computeJid):
+        try:
+            return pkjson.load_any(self._path(computeJid))
+        except Exception as e:
+            if pkio.exception_is_not_found(e):
+                return None
+            raise
+
+    def search(self, **kwargs):
+        # no index so linear in the number of jobs
+        self._assert_search(kwargs)
+        return [
+            d for d in self.load_all()
+            if all(d.get(k) == v for k, v in kwargs.items())
+        ]
+
+    def write_many(self, dbs):
+        for d in dbs:
+            sirepo.util.json_dump(d, path=self._path(d.computeJid))
+
+    def _path(self, computeJid):
+        return self.db_dir.join(computeJid + '.json')
+
+
+def init_class():
+    return JsonFileDb
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""Job state stored in a SQLite database in WAL mode
+
+The whole job state is stored as JSON in a single column. The fields
+in `job_db.SEARCH_FIELDS` are duplicated in indexed columns.
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from pykern import pkio
+from pykern import pkjson
+from pykern.pkdebug import pkdp, pkdlog
+from sirepo import job_db
+import sqlite3
+
+
+#: file name within db_dir
+_BASENAME = 'job.db'
+
+#: map of job state fields to columns
+_COLUMNS = (
+    ('computeJid', 'compute_jid'),
+    ('simulationType', 'simulation_type'),
+    ('status', 'status'),
+    ('uid', 'uid'),
+)
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS job_t (
+    compute_jid TEXT PRIMARY KEY NOT NULL,
+    simulation_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    uid TEXT NOT NULL,
+    db_json TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS job_t_simulation_type ON job_t (simulation_type);
+CREATE INDEX IF NOT EXISTS job_t_status ON job_t (status);
+CREATE INDEX IF NOT EXISTS job_t_uid ON job_t (uid);
+'''
+
+
+class SqliteDb(job_db.DbBase):
+
+    def __init__(self, db_dir):
+        super().__init__(db_dir)
+        pkio.mkdir_parent(self.db_dir)
+        f = self.db_dir.join(_BASENAME)
+        n = not f.exists()
+        self._conn = sqlite3.connect(str(f))
+        # WAL avoids rewriting the database on every commit and with
+        # synchronous=NORMAL only checkpoints are fsync'd.
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(_SCHEMA)
+        if n:
+            self._import_jsonfile()
+
+    def load_all(self):
+        return self._select('')
+
+    def read(self, computeJid):
+        r = self._select('WHERE compute_jid = ?', (computeJid,))
+        return r[0] if r else None
+
+    def search(self, **kwargs):
+        self._assert_search(kwargs)
+        c = dict(_COLUMNS)
+        k = sorted(kwargs.keys())
+        return self._select(
+            'WHERE ' + ' AND '.join(c[x] + ' = ?' for x in k),
+            [kwargs[x] for x in k],
+        )
+
+    def write_many(self, dbs):
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO job_t ({}, db_json) VALUES ({}, ?)'.format(
+                    ', '.join(x[1] for x in _COLUMNS),
+                    ', '.join('?' for _ in _COLUMNS),
+                ),
+                (
+                    [d[x[0]] for x in _COLUMNS] + [pkjson.dump_pretty(d, pretty=False)]
+                    for d in dbs
+                ),
+            )
+
+    def _import_jsonfile(self):
+        """Import job state files created by `jsonfile` or db.upgrade_runner_to_job_db"""
+        from sirepo.job_db import jsonfile
+
+        d = jsonfile.JsonFileDb(self.db_dir).load_all()
+        if d:
+            pkdlog('importing {} json files from db_dir={}', len(d), self.db_dir)
+            self.write_many(d)
+
+    def _select(self, where, args=()):
+        return [
+            pkjson.load_any(r[0])
+            for r in self._conn.execute('SELECT db_json FROM job_t ' + where, args)
+        ]
+
+
+def init_class():
+    return SqliteDb
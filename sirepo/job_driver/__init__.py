@@ -12,6 +12,7 @@ import collections
 import importlib
 import inspect
 import pykern.pkio
+import sirepo.job_scheduler
 import sirepo.srdb
 import time
 import tornado.gen
@@ -53,14 +54,16 @@ class DriverBase(PKDict):
             _agent_starting_timeout=None,
             _agent_start_lock=tornado.locks.Lock(),
             _cpu_slot_alloc_time=None,
+            # ops awaiting op_q.get(), which hold op_slots before they run
+            _op_slot_waiters=0,
             kind=req.kind,
             ops=PKDict(),
             op_q=PKDict({
-                #TODO(robnagler) sbatch could override OP_RUN, but not OP_ANALYSIS
-                # because OP_ANALYSIS touches the directory sometimes. Reasonably
-                # there should only be one OP_ANALYSIS running on an agent at one time.
+                #TODO(robnagler) sbatch could override OP_RUN
                 job.OP_RUN: self.init_q(1),
-                job.OP_ANALYSIS: self.init_q(1),
+                # OP_ANALYSIS ops which touch the run_dir are serialized by
+                # job_supervisor._ComputeJob.run_dir_acquire
+                job.OP_ANALYSIS: self.init_q(cfg.analysis_ops_per_agent),
             }),
             cpu_slot=None,
             uid=req.content.uid,
@@ -75,8 +78,7 @@ class DriverBase(PKDict):
     def cpu_slot_free(self):
         if not self.cpu_slot:
             return
-        self.cpu_slot_q.task_done()
-        self.cpu_slot_q.put_nowait(self.cpu_slot)
+        self.cpu_slot_q.put_nowait(self, self.cpu_slot)
         self.cpu_slot = None
         self._cpu_slot_alloc_time = None
 
@@ -84,8 +86,8 @@ class DriverBase(PKDict):
         if self.cpu_slot_q.qsize() > 0:
             # available slots, don't need to free
             return
-        # This is not fair scheduling, but good enough for now.
-        # least recently used and not in use
+        # Fairness is handled by cpu_slot_q (see sirepo.job_scheduler)
+        # so just release the least recently used slot not in use
         d = sorted(
             filter(
                 lambda x: bool(x.cpu_slot and not x.ops),
@@ -96,15 +98,15 @@ class DriverBase(PKDict):
         if d:
             d[0].cpu_slot_free()
 
-    async def cpu_slot_ready(self):
+    async def cpu_slot_ready(self, op):
         if self.cpu_slot:
             return
         try:
-            self.cpu_slot = self.cpu_slot_q.get_nowait()
+            self.cpu_slot = self.cpu_slot_q.get_nowait(self, op)
         except tornado.queues.QueueEmpty:
             self.cpu_slot_free_one()
-            pkdlog('{} await cpu_slot_q.get()', self)
-            self.cpu_slot = await self.cpu_slot_q.get()
+            pkdlog('{} {} await cpu_slot_q.get()', self, op)
+            self.cpu_slot = await self.cpu_slot_q.get(self, op)
             raise job_supervisor.Awaited()
         finally:
             self._cpu_slot_alloc_time = time.time()
@@ -115,11 +117,25 @@ class DriverBase(PKDict):
         if not self.ops:
             # might free our cpu slot if no other ops
             self.cpu_slot_free_one()
+        # Decided before op_slot is released, because a waiter which is
+        # handed op_slot doesn't set its op.op_slot until it runs.
+        y = (
+            self.cpu_slot
+            and self.ops
+            and not self._op_slot_waiters
+            and not any(o.op_slot for o in self.ops.values())
+            and self.cpu_slot_q.should_yield(self)
+        )
         if op.op_slot:
             q = self.op_q[op.opName]
             q.task_done()
             q.put_nowait(op.op_slot)
             op.op_slot = None
+        if y:
+            # Remaining ops are queued, not running, so let another user
+            # have the slot. Queued ops will wait on cpu_slot_q again.
+            pkdlog('{} yielding cpu_slot', self)
+            self.cpu_slot_free()
 
     def free_resources(self):
         """Remove holds on all resources and remove self from data structures"""
@@ -191,7 +207,11 @@ class DriverBase(PKDict):
             op.op_slot = q.get_nowait()
         except tornado.queues.QueueEmpty:
             pkdlog('{} {} await op_q.get()', self, op)
-            op.op_slot = await q.get()
+            self._op_slot_waiters += 1
+            try:
+                op.op_slot = await q.get()
+            finally:
+                self._op_slot_waiters -= 1
             raise job_supervisor.Awaited()
 
     def pkdebug_str(self):
@@ -216,7 +236,7 @@ class DriverBase(PKDict):
             pkdlog('{} {} await _websocket_ready', self, op)
             await self._websocket_ready.wait()
             raise job_supervisor.Awaited()
-        await self.cpu_slot_ready()
+        await self.cpu_slot_ready(op)
         # must be last, because reserves queue position of op
         # relative to other ops even it throws Awaited when the
         # op_slot is assigned.
@@ -369,7 +389,7 @@ class DriverBase(PKDict):
         self._websocket.sr_driver_set(self)
 
     def __str__(self):
-        return f'{type(self).__name__}({self._agentId:.4}, {self.uid:.4}, ops={list(self.ops.values())})'
+        return f'{type(self).__name__}({self._agentId:.4}, {self.uid!s:.4}, ops={list(self.ops.values())})'
 
     def _receive_error(self, msg):
 #TODO(robnagler) what does this mean? Just a way of logging? Document this.
@@ -399,8 +419,10 @@ def init(job_supervisor_module):
     assert not cfg
     job_supervisor = job_supervisor_module
     cfg = pkconfig.init(
+        analysis_ops_per_agent=(2, int, 'concurrent analysis ops per agent'),
         modules=((_DEFAULT_MODULE,), set, 'available job driver modules'),
     )
+    sirepo.job_scheduler.init()
     _CLASSES = PKDict()
     p = pkinspect.this_module().__name__
     for n in cfg.modules:
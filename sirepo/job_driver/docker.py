@@ -16,6 +16,7 @@ import io
 import itertools
 import os
 import re
+import sirepo.job_scheduler
 import subprocess
 import tornado.ioloop
 import tornado.process
@@ -245,7 +246,11 @@ class DockerDriver(job_driver.DriverBase):
                 cpu_slot_q=PKDict(),
             )
             for k in job.KINDS:
-                x.cpu_slot_q[k] = cls.init_q(cls.cfg[k].slots_per_host)
+                x.cpu_slot_q[k] = sirepo.job_scheduler.CpuSlotQ(
+                    '{}-{}'.format(h, k),
+                    k,
+                    cls.cfg[k].slots_per_host,
+                )
                 x.instances[k] = []
         assert len(cls.__hosts) > 0, \
             '{}: no docker hosts found in directory'.format(cls.cfg.tls_d)
@@ -14,6 +14,7 @@ from sirepo import job_driver
 import collections
 import os
 import sirepo.job_driver
+import sirepo.job_scheduler
 import sirepo.mpi
 import sirepo.srdb
 import subprocess
@@ -22,6 +23,10 @@ import tornado.process
 import tornado.queues
 
 
+#: how long to wait before replacing a parked agent which exited
+_PARKED_RETRY_SECS = 10
+
+
 class LocalDriver(job_driver.DriverBase):
 
     cfg = None
@@ -30,17 +35,25 @@ class LocalDriver(job_driver.DriverBase):
 
     __cpu_slot_q = PKDict()
 
+    #: agents started before they are needed (uid is None until claimed)
+    __parked = PKDict()
+
     def __init__(self, req):
         super().__init__(req)
         self.update(
-            _agent_exec_dir=pkio.py_path(req.content.userDir).join(
+            _agent_exec_dir=(
+                pkio.py_path(req.content.userDir) if self.uid
+                # parked agents don't have a user yet
+                else sirepo.srdb.root()
+            ).join(
                 'agent-local',
                 self._agentId,
             ),
             _agent_exit=tornado.locks.Event(),
         )
         self.cpu_slot_q = self.__cpu_slot_q[req.kind]
-        self.__instances[self.kind].append(self)
+        if self.uid:
+            self.__instances[self.kind].append(self)
 
     def cpu_slot_peers(self):
         return self.__instances[self.kind]
@@ -68,7 +81,7 @@ class LocalDriver(job_driver.DriverBase):
             # SECURITY: must only return instances for authorized user
             if d.uid == req.content.uid:
                 return d
-        return cls(req)
+        return cls._parked_claim(req) or cls(req)
 
     @classmethod
     def init_class(cls):
@@ -78,6 +91,10 @@ class LocalDriver(job_driver.DriverBase):
                 int,
                 'how long to wait for agent start',
             ),
+            parked=dict(
+                parallel=(0, int, 'parallel agents to start before they are needed'),
+                sequential=(0, int, 'sequential agents to start before they are needed'),
+            ),
             slots=dict(
                 parallel=(1, int, 'max parallel slots'),
                 sequential=(1, int, 'max sequential slots'),
@@ -86,7 +103,13 @@ class LocalDriver(job_driver.DriverBase):
         )
         for k in job.KINDS:
             cls.__instances[k] = []
-            cls.__cpu_slot_q[k] = cls.init_q(cls.cfg.slots[k])
+            cls.__parked[k] = []
+            tornado.ioloop.IOLoop.current().add_callback(cls._parked_fill, k)
+            cls.__cpu_slot_q[k] = sirepo.job_scheduler.CpuSlotQ(
+                'local-' + k,
+                k,
+                cls.cfg.slots[k],
+            )
         return cls
 
     async def kill(self):
@@ -106,6 +129,13 @@ class LocalDriver(job_driver.DriverBase):
             op.msg.mpiCores = sirepo.mpi.cfg.cores if op.msg.isParallel else 1
         return await super().prepare_send(op)
 
+    def _agent_env(self):
+        if self.uid:
+            return super()._agent_env()
+        # SECURITY: parked agents are not bound to a user. job_cmd gets
+        # the uid from each op's msg (see job_agent._Cmd.job_cmd_env).
+        return super()._agent_env(env=PKDict(SIREPO_AUTH_LOGGED_IN_USER=''))
+
     def _agent_on_exit(self, returncode):
         self._agent_exit.set()
         self.pkdel('subprocess')
@@ -114,6 +144,15 @@ class LocalDriver(job_driver.DriverBase):
             tornado.ioloop.IOLoop.current().remove_timeout(k)
         pkdlog('{} returncode={}', self, returncode)
         self._agent_exec_dir.remove(rec=True, ignore_errors=True)
+        if self in self.__parked[self.kind]:
+            # died before it was claimed, start another later
+            self.__parked[self.kind].remove(self)
+            self.free_resources()
+            tornado.ioloop.IOLoop.current().call_later(
+                _PARKED_RETRY_SECS,
+                self._parked_fill,
+                self.kind,
+            )
 
     async def _do_agent_start(self, op):
         stdin = None
@@ -133,6 +172,33 @@ class LocalDriver(job_driver.DriverBase):
             if stdin:
                 stdin.close()
 
+    @classmethod
+    def _parked_claim(cls, req):
+        p = cls.__parked[req.kind]
+        if not p:
+            return None
+        # prefer agents which have already connected
+        d = ([x for x in p if x._websocket_ready.is_set()] or p)[0]
+        p.remove(d)
+        d.uid = req.content.uid
+        cls.__instances[d.kind].append(d)
+        pkdlog('{} claimed parked agent', d)
+        tornado.ioloop.IOLoop.current().add_callback(cls._parked_fill, d.kind)
+        return d
+
+    @classmethod
+    async def _parked_fill(cls, kind):
+        p = cls.__parked[kind]
+        while len(p) < cls.cfg.parked[kind]:
+            d = cls(PKDict(kind=kind, content=PKDict(uid=None)))
+            p.append(d)
+            try:
+                await d._agent_start(None)
+            except Exception as e:
+                pkdlog('{} error={} stack={}', d, e, pkdexc())
+                p.remove(d)
+                return
+
 
 def init_class():
     return LocalDriver.init_class()
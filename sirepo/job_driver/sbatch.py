@@ -41,7 +41,7 @@ class SbatchDriver(job_driver.DriverBase):
         """We allow as many users as the sbatch system allows"""
         pass
 
-    async def cpu_slot_ready(self):
+    async def cpu_slot_ready(self, op):
         """We allow as many users as the sbatch system allows"""
         pass
 
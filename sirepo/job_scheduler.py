@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""Fair share allocation of cpu slots to drivers
+
+Drivers (see `sirepo.job_driver`) must hold a cpu slot before sending
+ops to their agent. Slots are grouped in pools (`CpuSlotQ`), e.g. one
+per kind for local and one per host and kind for docker.
+
+When a slot becomes available, it is given to the waiting driver with
+the highest precedence:
+
+1. analysis ops before runs,
+2. users holding fewer slots of the kind,
+3. users with less (decayed) slot time used recently,
+4. first come, first served.
+
+Users may also be capped in the number of slots they hold of a kind.
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern import pkconfig
+from pykern.pkcollections import PKDict
+from pykern.pkdebug import pkdp, pkdlog, pkdformat
+from sirepo import job
+import asyncio
+import math
+import time
+import tornado.queues
+
+
+#: all pools for `metrics`
+_POOLS = []
+
+#: number of slots held by each uid (across pools) by kind
+_HELD = None
+
+#: decayed slot seconds used by each uid (across pools) by kind
+_USAGE = None
+
+cfg = None
+
+
+class CpuSlotQ(PKDict):
+    """Pool of cpu slots with a fair share queue
+
+    The interface mimics `tornado.queues.Queue` where possible.
+
+    Args:
+        name (str): identifies pool in logs and `metrics`
+        kind (str): `job.PARALLEL` or `job.SEQUENTIAL`
+        slots (int): number of slots in the pool
+    """
+
+    def __init__(self, name, kind, slots):
+        super().__init__(
+            kind=kind,
+            name=name,
+            slots=slots,
+            _free=list(range(slots, 0, -1)),
+            _waiters=[],
+            _wait_count=0,
+            _wait_max=0.0,
+            _wait_total=0.0,
+        )
+        _POOLS.append(self)
+
+    async def get(self, driver, op):
+        """Wait for a slot
+
+        Args:
+            driver (DriverBase): requester
+            op (_Op): op that needs the slot
+        Returns:
+            int: slot
+        """
+        try:
+            return self.get_nowait(driver, op)
+        except tornado.queues.QueueEmpty:
+            pass
+        w = PKDict(
+            future=asyncio.get_event_loop().create_future(),
+            is_analysis=op.opName == job.OP_ANALYSIS,
+            start=time.time(),
+            uid=driver.uid,
+        )
+        self._waiters.append(w)
+        try:
+            return await w.future
+        except asyncio.CancelledError:
+            if w in self._waiters:
+                self._waiters.remove(w)
+            elif w.future.done() and not w.future.cancelled():
+                # slot was assigned, but requester is gone
+                self.put_nowait(driver, w.future.result())
+            raise
+
+    def get_nowait(self, driver, op):
+        """Allocate a slot if available and no waiter has precedence
+
+        Args:
+            driver (DriverBase): requester
+            op (_Op): op that needs the slot
+        Returns:
+            int: slot
+        Raises:
+            tornado.queues.QueueEmpty: no slot available for `driver`
+        """
+        if not self._free or not self._is_under_cap(driver.uid):
+            raise tornado.queues.QueueEmpty()
+        w = self._next_waiter()
+        if w and self._rank(w) < self._rank(
+            PKDict(
+                is_analysis=op.opName == job.OP_ANALYSIS,
+                start=time.time(),
+                uid=driver.uid,
+            ),
+        ):
+            raise tornado.queues.QueueEmpty()
+        return self._alloc(driver.uid)
+
+    def metrics(self):
+        """Queue depth and wait times
+
+        Returns:
+            PKDict: values for the pool
+        """
+        n = time.time()
+        return PKDict(
+            free=len(self._free),
+            kind=self.kind,
+            queueDepth=len(self._waiters),
+            slots=self.slots,
+            waitCount=self._wait_count,
+            waitSecsAvg=self._wait_total / self._wait_count if self._wait_count else 0.0,
+            waitSecsMax=self._wait_max,
+            waitSecsOldest=max([n - w.start for w in self._waiters] or [0.0]),
+        )
+
+    def pkdebug_str(self):
+        return pkdformat(
+            'CpuSlotQ({} free={} waiters={})',
+            self.name,
+            len(self._free),
+            len(self._waiters),
+        )
+
+    def put_nowait(self, driver, slot):
+        """Return a slot to the pool and hand it to the next waiter
+
+        Args:
+            driver (DriverBase): holder of the slot
+            slot (int): what was returned by `get` or `get_nowait`
+        """
+        self._free.append(slot)
+        u = driver.uid
+        _HELD[self.kind][u] -= 1
+        if _HELD[self.kind][u] <= 0:
+            del _HELD[self.kind][u]
+        if driver.get('_cpu_slot_alloc_time'):
+            _usage_add(self.kind, u, time.time() - driver._cpu_slot_alloc_time)
+        self._dispatch()
+
+    def qsize(self):
+        """Number of free slots"""
+        return len(self._free)
+
+    def should_yield(self, driver):
+        """Is another user waiting for a slot `driver` holds?
+
+        Args:
+            driver (DriverBase): holder of a slot
+        Returns:
+            bool: True if `driver` should free its slot between ops
+        """
+        return any(w.uid != driver.uid for w in self._eligible_waiters())
+
+    def _alloc(self, uid):
+        _HELD[self.kind][uid] = _HELD[self.kind].get(uid, 0) + 1
+        return self._free.pop()
+
+    def _dispatch(self):
+        while self._free:
+            w = self._next_waiter()
+            if not w:
+                return
+            self._waiters.remove(w)
+            s = time.time() - w.start
+            self._wait_count += 1
+            self._wait_total += s
+            self._wait_max = max(self._wait_max, s)
+            pkdlog('{} uid={:.4} wait_secs={:.1f}', self, w.uid, s)
+            w.future.set_result(self._alloc(w.uid))
+
+    def _eligible_waiters(self):
+        return [
+            w for w in self._waiters
+            if not w.future.done() and self._is_under_cap(w.uid)
+        ]
+
+    def _is_under_cap(self, uid):
+        c = cfg.max_slots_per_user[self.kind]
+        return not c or _HELD[self.kind].get(uid, 0) < c
+
+    def _next_waiter(self):
+        w = self._eligible_waiters()
+        return min(w, key=self._rank) if w else None
+
+    def _rank(self, waiter):
+        return (
+            not waiter.is_analysis,
+            _HELD[self.kind].get(waiter.uid, 0),
+            _usage(self.kind, waiter.uid),
+            waiter.start,
+        )
+
+
+def init():
+    global cfg, _HELD, _USAGE
+
+    if cfg:
+        return
+    cfg = pkconfig.init(
+        max_slots_per_user=dict(
+            parallel=(0, int, 'max parallel slots one user may hold (0 is unlimited)'),
+            sequential=(0, int, 'max sequential slots one user may hold (0 is unlimited)'),
+        ),
+        usage_half_life_secs=(
+            3600,
+            int,
+            'how quickly slot time used is forgotten for fair share',
+        ),
+    )
+    _HELD = PKDict(((k, PKDict()) for k in job.KINDS))
+    _USAGE = PKDict(((k, PKDict()) for k in job.KINDS))
+
+
+def metrics():
+    """Queue depth and wait times for all pools
+
+    Returns:
+        PKDict: `CpuSlotQ.metrics` by pool name
+    """
+    return PKDict(((p.name, p.metrics()) for p in _POOLS))
+
+
+def _usage(kind, uid):
+    u = _USAGE[kind].get(uid)
+    if not u:
+        return 0.0
+    r = u.value * _usage_decay(u.time)
+    if r < 1.0:
+        # forgotten so don't need to keep
+        del _USAGE[kind][uid]
+        return 0.0
+    return r
+
+
+def _usage_add(kind, uid, secs):
+    _USAGE[kind][uid] = PKDict(
+        time=time.time(),
+        value=_usage(kind, uid) + secs,
+    )
+
+
+def _usage_decay(since):
+    return math.pow(0.5, (time.time() - since) / cfg.usage_half_life_secs)
@@ -12,16 +12,23 @@ from pykern.pkcollections import PKDict
 from pykern.pkdebug import pkdp, pkdc, pkdformat, pkdlog, pkdexc
 from sirepo import job
 import asyncio
+import collections
 import copy
 import contextlib
+import datetime
+import json
 import os
 import pykern.pkio
+import pykern.pkjson
 import sirepo.http_reply
+import sirepo.job_db
+import sirepo.sim_data
 import sirepo.simulation_db
 import sirepo.srdb
 import sirepo.util
 import time
 import tornado.ioloop
+import tornado.iostream
 import tornado.locks
 import tornado.queues
 
@@ -29,6 +36,15 @@ import tornado.queues
 #: where supervisor state is persisted to disk
 _DB_DIR = None
 
+#: job state store (see `sirepo.job_db`)
+_DB = None
+
+#: job states with non-terminal updates not yet written to _DB
+_DB_PENDING = PKDict()
+
+#: when _DB_PENDING will be flushed
+_DB_PENDING_TIMER = None
+
 #: where job db is stored under srdb.root
 _DB_SUBDIR = 'supervisor-job'
 
@@ -36,6 +52,9 @@ _NEXT_REQUEST_SECONDS = None
 
 _RUNNING_PENDING = (job.RUNNING, job.PENDING)
 
+#: analysis ops which do not modify the run_dir so can share it
+_READ_ONLY_JOB_CMDS = frozenset(('get_data_file', 'get_simulation_frame'))
+
 _HISTORY_FIELDS = frozenset((
     'computeJobSerial',
     'computeJobStart',
@@ -54,6 +73,9 @@ _PARALLEL_STATUS_FIELDS = frozenset((
     'computeJobStart',
 ))
 
+#: simulation frame replies (see _FrameCache)
+_FRAME_CACHE = None
+
 _UNTIMED_OPS = frozenset((job.OP_ALIVE, job.OP_CANCEL, job.OP_ERROR, job.OP_KILL, job.OP_OK))
 cfg = None
 
@@ -67,7 +89,7 @@ class Awaited(Exception):
 
 
 def init():
-    global _DB_DIR, cfg, _NEXT_REQUEST_SECONDS, job_driver
+    global _DB, _DB_DIR, _FRAME_CACHE, cfg, _NEXT_REQUEST_SECONDS, job_driver
     if _DB_DIR:
         return
     job.init()
@@ -76,6 +98,16 @@ def init():
     job_driver.init(pkinspect.this_module())
     _DB_DIR = sirepo.srdb.root().join(_DB_SUBDIR)
     cfg = pkconfig.init(
+        db_write_behind_secs=(
+            5,
+            int,
+            'how often to write non-terminal status updates to disk (0 writes immediately)',
+        ),
+        frame_cache_bytes=(
+            int(5e7),
+            int,
+            'maximum size of simulation frame replies cached (0 disables)',
+        ),
         job_cache_secs=(300, int, 'when to re-read job state from disk'),
         max_hours=dict(
             analysis=(.04, float, 'maximum run-time for analysis job'),
@@ -83,7 +115,13 @@ def init():
             sequential=(.1, float, 'maximum run-time for sequential job')
         ),
         sbatch_poll_secs=(60, int, 'how often to poll squeue and parallel status'),
+        status_stream_keepalive_secs=(
+            15,
+            int,
+            'how often to send a keepalive on an idle runStatusStream',
+        ),
     )
+    _FRAME_CACHE = _FrameCache(cfg.frame_cache_bytes)
     _NEXT_REQUEST_SECONDS = PKDict({
         job.PARALLEL: 2,
         job.SBATCH: cfg.sbatch_poll_secs,
@@ -109,6 +147,8 @@ def init():
             )
     else:
         pykern.pkio.mkdir_parent(_DB_DIR)
+    _DB = sirepo.job_db.init(_DB_DIR)
+    _db_cancel_running()
 
 
 class ServerReq(PKDict):
@@ -129,13 +169,17 @@ class ServerReq(PKDict):
             'no secret in message: {}'.format(self.content)
         assert s == sirepo.job.cfg.server_secret, \
             'server_secret did not match'.format(self.content)
-        self.handler.write(await _ComputeJob.receive(self))
+        r = await _ComputeJob.receive(self)
+        # streaming apis write their own replies
+        if r is not None:
+            self.handler.write(r)
 
 
 async def terminate():
     from sirepo import job_driver
 
     await job_driver.terminate()
+    _db_flush()
 
 
 class _ComputeJob(PKDict):
@@ -147,11 +191,17 @@ class _ComputeJob(PKDict):
             ops=[],
             run_op=None,
             run_dir_mutex=tornado.locks.Event(),
+            run_req=None,
+            status_changed=tornado.locks.Condition(),
+            # incremented on every change so waiters can't miss a notify
+            status_version=0,
             **kwargs,
         )
         # At start we don't know anything about the run_dir so assume ready
         self.run_dir_mutex.set()
-        self.run_dir_owner = None
+        self.run_dir_exclusive = False
+        self.run_dir_exclusive_waiters = 0
+        self.run_dir_owners = set()
         self.pksetdefault(db=lambda: self.__db_init(req))
         self.cache_timeout_set()
 
@@ -172,8 +222,8 @@ class _ComputeJob(PKDict):
             self.ops.remove(op)
         if self.run_op == op:
             self.run_op = None
-        if op == self.run_dir_owner:
-            self.run_dir_release(self.run_dir_owner)
+        if op in self.run_dir_owners:
+            self.run_dir_release(op)
 
     @classmethod
     def get_instance(cls, req):
@@ -217,47 +267,60 @@ class _ComputeJob(PKDict):
                 return sirepo.http_reply.gen_tornado_exception(e)
             raise
 
-    async def run_dir_acquire(self, owner):
-        if self.run_dir_owner == owner:
+    async def run_dir_acquire(self, owner, exclusive=True):
+        """Lock the run_dir for `owner`
+
+        Ops which only read the run_dir share the lock. Waiting exclusive
+        owners have precedence over new shared owners.
+
+        Waiting for the lock does not raise Awaited, because callers
+        acquire it before any other await in their retry loops so there
+        is nothing to restart. Lock contention therefore does not count
+        toward _MAX_RETRIES.
+
+        Args:
+            owner (_Op): who holds the lock
+            exclusive (bool): True if `owner` modifies the run_dir [True]
+        """
+        if owner in self.run_dir_owners:
             return
-        e = None
-        if not self.run_dir_mutex.is_set():
-            pkdlog('{} await self.run_dir_mutex', self)
-            await self.run_dir_mutex.wait()
-            e = Awaited()
-            if self.run_dir_owner:
-                # some other op acquired it before this one
-                raise e
+        while not self.__run_dir_is_available(exclusive):
+            pkdlog('{} await self.run_dir_mutex exclusive={}', self, exclusive)
+            if exclusive:
+                self.run_dir_exclusive_waiters += 1
+            try:
+                await self.run_dir_mutex.wait()
+            finally:
+                if exclusive:
+                    self.run_dir_exclusive_waiters -= 1
+            # another op may have acquired it before this one
         self.run_dir_mutex.clear()
-        self.run_dir_owner = owner
-        if e:
-            raise e
+        self.run_dir_exclusive = exclusive
+        self.run_dir_owners.add(owner)
 
     def run_dir_release(self, owner):
-        assert owner == self.run_dir_owner, \
-            'owner={} not same as releaser={}'.format(self.run_dir_owner, owner)
-        self.run_dir_owner = None
-        self.run_dir_mutex.set()
+        assert owner in self.run_dir_owners, \
+            'owners={} does not contain releaser={}'.format(self.run_dir_owners, owner)
+        self.run_dir_owners.remove(owner)
+        if not self.run_dir_owners:
+            self.run_dir_exclusive = False
+            self.run_dir_mutex.set()
+
+    def __run_dir_is_available(self, exclusive):
+        if not self.run_dir_owners:
+            return True
+        # shared owners may join unless an exclusive owner is waiting
+        return not (exclusive or self.run_dir_exclusive or self.run_dir_exclusive_waiters)
 
     @classmethod
     def __create(cls, req):
-        try:
-            d = pkcollections.json_load_any(
-                cls.__db_file(req.content.computeJid),
-            )
-#TODO(robnagler) when we reconnect with running processes at startup,
-#  we'll need to change this
-            if d.status in _RUNNING_PENDING:
-                d.status = job.CANCELED
-            return cls(req, db=d)
-        except Exception as e:
-            if pykern.pkio.exception_is_not_found(e):
-                return cls(req).__db_write()
-            raise
-
-    @classmethod
-    def __db_file(cls, computeJid):
-        return _DB_DIR.join(computeJid + '.json')
+        j = req.content.computeJid
+        # may have been removed from cache before its last update was flushed
+        d = _DB_PENDING.get(j) or _DB.read(j)
+        if d is None:
+            return cls(req).__db_write()
+        # running and pending jobs were canceled by _db_cancel_running
+        return cls(req, db=d)
 
     def __db_init(self, req, prev_db=None):
         c = req.content
@@ -291,10 +354,31 @@ class _ComputeJob(PKDict):
             PKDict(((k, v) for k, v in prev_db.items() if k in _HISTORY_FIELDS)),
         ]
 
+    def __is_run_req(self, req):
+        return bool(
+            self.run_req
+            and self.run_req.content.computeJobHash == req.content.computeJobHash
+        )
+
     def __db_write(self):
-        sirepo.util.json_dump(self.db, path=self.__db_file(self.db.computeJid))
+        _DB_PENDING.pkdel(self.db.computeJid)
+        _DB.write(self.db)
+        self.__status_notify()
         return self
 
+    def __db_write_behind(self):
+        """Defer writing non-terminal updates (see `_db_flush`)"""
+        if not cfg.db_write_behind_secs:
+            self.__db_write()
+            return
+        _DB_PENDING[self.db.computeJid] = self.db
+        self.__status_notify()
+        _db_flush_schedule()
+
+    def __status_notify(self):
+        self.status_version += 1
+        self.status_changed.notify_all()
+
     async def _receive_api_downloadDataFile(self, req):
         return await self._send_with_single_reply(
             job.OP_ANALYSIS,
@@ -338,7 +422,10 @@ class _ComputeJob(PKDict):
             # timed_out_op might not be a valid request, because a new compute
             # may have been started so either we are canceling a compute by
             # user directive (left) or timing out an op (and canceling all).
-            (not self._req_is_valid(req) and not timed_out_op)
+            (
+                not (self._req_is_valid(req) or self.__is_run_req(req))
+                and not timed_out_op
+            )
             or (self.db.status not in _RUNNING_PENDING and not self.ops)
         ):
             # job is not relevant, but let the user know it isn't running
@@ -369,6 +456,8 @@ class _ComputeJob(PKDict):
                     for x in filter(lambda e: e != c, o):
                         x.destroy(cancel=True)
                     self.db.status = job.CANCELED
+                    # cancel may remove the last frame (see job_cmd._do_cancel)
+                    _FRAME_CACHE.remove_jid(self.db.computeJid)
                     self.__db_write()
                     if c:
                         c.msg.opIdsToCancel = [x.opId for x in o]
@@ -407,6 +496,8 @@ class _ComputeJob(PKDict):
             jobCmd='compute',
             nextRequestSeconds=self.db.nextRequestSeconds,
         )
+        # server may time out waiting and reply pending (see job_api._request)
+        self.run_req = req
         try:
             for i in range(_MAX_RETRIES):
                 try:
@@ -414,10 +505,12 @@ class _ComputeJob(PKDict):
                     await o.prepare_send()
                     self.run_op = o
                     self.__db_init(req, prev_db=self.db)
+                    _FRAME_CACHE.remove_jid(self.db.computeJid)
                     # run mode can change between runs so we must update the db
                     self.db.jobRunMode = req.content.jobRunMode
                     self.db.computeJobSerial = int(time.time())
                     self.db.pkupdate(status=job.PENDING)
+                    self.run_req = None
                     self.__db_write()
                     o.make_lib_dir_symlink()
                     o.send()
@@ -435,6 +528,10 @@ class _ComputeJob(PKDict):
             else:
                 raise AssertionError('too many retries {}'.format(req))
         finally:
+            if self.run_req is req:
+                self.run_req = None
+                # db didn't change so wake runStatusStream to reply
+                self.__status_notify()
             # _run destroys in the happy path (never got to _run here)
             if o:
                 o.destroy(cancel=False)
@@ -449,17 +546,56 @@ class _ComputeJob(PKDict):
             jobCmd='sequential_result',
         )
 
+    async def _receive_api_runStatusStream(self, req):
+        """Send status replies as server-sent events when the job changes
+
+        Ends when the job is no longer running or pending or the
+        server disconnects. Clients which can't stream poll
+        `_receive_api_runStatus`.
+        """
+        h = req.handler
+        h.set_header('Cache-Control', 'no-cache')
+        h.set_header('Content-Type', 'text/event-stream')
+        try:
+            while True:
+                v = self.status_version
+                r = self._status_reply(req) or await self._receive_api_runStatus(req)
+                h.write(b'data: ' + pykern.pkjson.dump_bytes(r) + b'\n\n')
+                await h.flush()
+                if r.get('state') not in _RUNNING_PENDING:
+                    return None
+                # changes while replying or flushing are not notified
+                # to this coroutine so compare versions before waiting
+                while v == self.status_version:
+                    if not await self.status_changed.wait(
+                        timeout=datetime.timedelta(seconds=cfg.status_stream_keepalive_secs),
+                    ):
+                        h.write(b': keepalive\n\n')
+                        await h.flush()
+        except tornado.iostream.StreamClosedError:
+            # server closed the connection (browser went away)
+            return None
+
     async def _receive_api_sbatchLogin(self, req):
         return await self._send_with_single_reply(job.OP_SBATCH_LOGIN, req)
 
     async def _receive_api_simulationFrame(self, req):
         if not self._req_is_valid(req):
             sirepo.util.raise_not_found('invalid {}', req)
-        return await self._send_with_single_reply(
+        # frames are immutable for a computeJobSerial, except for some apps
+        c = sirepo.sim_data.get_class(self.db.simulationType).want_browser_frame_cache()
+        if c:
+            r = _FRAME_CACHE.get_reply(self.db.computeJid, req.content.data)
+            if r:
+                return r
+        r = await self._send_with_single_reply(
             job.OP_ANALYSIS,
             req,
             jobCmd='get_simulation_frame'
         )
+        if c and self._req_is_valid(req):
+            _FRAME_CACHE.put_reply(self.db.computeJid, req.content.data, r)
+        return r
 
     def _create_op(self, opName, req, **kwargs):
 #TODO(robnagler) kind should be set earlier in the queuing process.
@@ -527,6 +663,7 @@ class _ComputeJob(PKDict):
                     if l:
                         l = False
                         self.run_dir_release(op)
+                    p = self.db.status
                     self.db.status = r.state
                     if self.db.status == job.ERROR:
                         self.db.error = r.get('error', '<unknown error>')
@@ -539,9 +676,14 @@ class _ComputeJob(PKDict):
                         # sequential jobs don't send this
                         self.db.lastUpdateTime = int(time.time())
                     #TODO(robnagler) will need final frame count
-                    self.__db_write()
                     if r.state in job.EXIT_STATUSES:
+                        self.__db_write()
                         break
+                    if r.state != p:
+                        self.__db_write()
+                    else:
+                        # only progress (parallelStatus) changed
+                        self.__db_write_behind()
                 except asyncio.CancelledError:
                     return
         except Exception as e:
@@ -559,7 +701,10 @@ class _ComputeJob(PKDict):
             for i in range(_MAX_RETRIES):
                 try:
                     if opName == job.OP_ANALYSIS:
-                        await self.run_dir_acquire(o)
+                        await self.run_dir_acquire(
+                            o,
+                            exclusive=o.msg.get('jobCmd') not in _READ_ONLY_JOB_CMDS,
+                        )
                     await o.prepare_send()
                     o.send()
                     return await o.reply_get()
@@ -594,6 +739,19 @@ class _ComputeJob(PKDict):
                     ),
                 )
             return r
+        if self.__is_run_req(req):
+            # runSimulation is waiting to start the run
+            c = req.content
+            return PKDict(
+                state=job.PENDING,
+                nextRequestSeconds=self.db.nextRequestSeconds,
+                nextRequest=PKDict(
+                    computeJobHash=c.computeJobHash,
+                    report=c.analysisModel,
+                    simulationId=c.simulationId,
+                    simulationType=c.simulationType,
+                ),
+            )
         if self.db.computeJobHash != req.content.computeJobHash:
             return PKDict(state=job.MISSING, reason='computeJobHash-mismatch')
         if (
@@ -606,6 +764,69 @@ class _ComputeJob(PKDict):
         return None
 
 
+class _FrameCache(PKDict):
+    """LRU cache of simulation frame replies bounded by bytes
+
+    Keys are the frame args (which include computeJobHash,
+    computeJobSerial, frameReport and frameIndex) within a computeJid.
+
+    Args:
+        max_bytes (int): total size of JSON encoded replies
+    """
+
+    def __init__(self, max_bytes):
+        super().__init__(
+            max_bytes=max_bytes,
+            _bytes=0,
+            _by_jid=PKDict(),
+            _lru=collections.OrderedDict(),
+        )
+
+    def get_reply(self, computeJid, frame_args):
+        k = self._key(computeJid, frame_args)
+        r = self._lru.get(k)
+        if r is None:
+            return None
+        self._lru.move_to_end(k)
+        return r.reply
+
+    def put_reply(self, computeJid, frame_args, reply):
+        if (
+            not self.max_bytes
+            or reply.get('state') == job.ERROR
+            or 'error' in reply
+        ):
+            return
+        n = len(pykern.pkjson.dump_bytes(reply))
+        if n > self.max_bytes // 4:
+            # one reply should not flush the cache
+            return
+        k = self._key(computeJid, frame_args)
+        self._remove_key(k)
+        self._lru[k] = PKDict(bytes=n, reply=reply)
+        self._by_jid.setdefault(computeJid, set()).add(k)
+        self._bytes += n
+        while self._bytes > self.max_bytes:
+            self._remove_key(next(iter(self._lru)))
+
+    def remove_jid(self, computeJid):
+        for k in list(self._by_jid.get(computeJid, ())):
+            self._remove_key(k)
+
+    def _key(self, computeJid, frame_args):
+        return (computeJid, json.dumps(frame_args, sort_keys=True))
+
+    def _remove_key(self, key):
+        r = self._lru.pop(key, None)
+        if r is None:
+            return
+        self._bytes -= r.bytes
+        s = self._by_jid[key[0]]
+        s.discard(key)
+        if not s:
+            del self._by_jid[key[0]]
+
+
 class _Op(PKDict):
 
     def __init__(self, *args, **kwargs):
@@ -677,3 +898,48 @@ class _Op(PKDict):
 
     def __hash__(self):
         return hash((self.opId,))
+
+
+def _db_cancel_running():
+#TODO(robnagler) when we reconnect with running processes at startup,
+#  we'll need to change this
+    d = []
+    for s in _RUNNING_PENDING:
+        d.extend(_DB.search(status=s))
+    if d:
+        pkdlog('canceling {} jobs which were running or pending', len(d))
+        _DB.write_many(x.pkupdate(status=job.CANCELED) for x in d)
+
+
+def _db_flush():
+    """Write all deferred job states in one batch
+
+    On error, the states are retried on the next flush unless a newer
+    state for the same job was deferred in the meantime.
+    """
+    global _DB_PENDING_TIMER
+
+    if _DB_PENDING_TIMER:
+        tornado.ioloop.IOLoop.current().remove_timeout(_DB_PENDING_TIMER)
+        _DB_PENDING_TIMER = None
+    if not _DB_PENDING:
+        return
+    d = list(_DB_PENDING.values())
+    _DB_PENDING.clear()
+    try:
+        _DB.write_many(d)
+    except Exception as e:
+        pkdlog('error={} jobs={} stack={}', e, len(d), pkdexc())
+        for x in d:
+            _DB_PENDING.setdefault(x.computeJid, x)
+        _db_flush_schedule()
+
+
+def _db_flush_schedule():
+    global _DB_PENDING_TIMER
+
+    if not _DB_PENDING_TIMER:
+        _DB_PENDING_TIMER = tornado.ioloop.IOLoop.current().call_later(
+            cfg.db_write_behind_secs,
+            _db_flush,
+        )
@@ -1481,6 +1481,8 @@ SIREPO.app.factory('panelState', function(appState, requestSender, simulationQue
 
 SIREPO.app.factory('requestSender', function(cookieService, errorService, localRoutes, $http, $location, $interval, $q, $rootScope, $window) {
     var self = {};
+    // POSIT: same as sirepo.http_reply.MIME_TYPE.sirepo_frame
+    var FRAME_MIME_TYPE = 'application/x-sirepo-frame';
     var HTML_TITLE_RE = new RegExp('>([^<]+)</', 'i');
     var IS_HTML_ERROR_RE = new RegExp('^(?:<html|<!doctype)', 'i');
     var LOGIN_ROUTE_NAME = 'login';
@@ -1514,6 +1516,57 @@ SIREPO.app.factory('requestSender', function(cookieService, errorService, localR
         }
     }
 
+    function decodeFrame(buf) {
+        // POSIT: format of sirepo.template.template_common.frame_encode
+        var n = new DataView(buf).getUint32(0, true);
+        var res = JSON.parse(new TextDecoder('utf-8').decode(new Uint8Array(buf, 4, n)));
+        var toArray = function(info) {
+            var shape = info[1];
+            var a = new (info[2] == '<f8' ? Float64Array : Float32Array)(
+                buf, 4 + n + info[0], shape.reduce(function(x, y) {return x * y;}, 1));
+            if (shape.length == 1) {
+                return Array.from(a);
+            }
+            var rows = [];
+            for (var i = 0; i < shape[0]; i++) {
+                rows.push(Array.from(a.subarray(i * shape[1], (i + 1) * shape[1])));
+            }
+            return rows;
+        };
+        var expand = function(obj) {
+            for (var k in obj) {
+                var v = obj[k];
+                if (v && typeof(v) == 'object') {
+                    if (v.__sirepoBuffer) {
+                        obj[k] = toArray(v.__sirepoBuffer);
+                    }
+                    else {
+                        expand(v);
+                    }
+                }
+            }
+        };
+        expand(res);
+        return res;
+    }
+
+    function decodeFrameResponse(data, headers) {
+        if (! (data instanceof ArrayBuffer)) {
+            return data;
+        }
+        if ((headers('Content-Type') || '').indexOf(FRAME_MIME_TYPE) === 0) {
+            return decodeFrame(data);
+        }
+        // errors are JSON or HTML
+        var s = new TextDecoder('utf-8').decode(new Uint8Array(data));
+        try {
+            return JSON.parse(s);
+        }
+        catch (e) {
+            return s;
+        }
+    }
+
     function isFirefox() {
         // https://stackoverflow.com/a/9851769
         return typeof InstallTrigger !== 'undefined';
@@ -1755,6 +1808,13 @@ SIREPO.app.factory('requestSender', function(cookieService, errorService, localR
         var interval, t;
         var timed_out = false;
         t = {timeout: timeout.promise};
+        if (! angular.isString(urlOrParams) && urlOrParams.routeName == 'simulationFrame'
+            && $window.TextDecoder) {
+            // binary frames avoid parsing large arrays as JSON text
+            t.headers = {Accept: FRAME_MIME_TYPE + ', application/json'};
+            t.responseType = 'arraybuffer';
+            t.transformResponse = [decodeFrameResponse];
+        }
         if (SIREPO.http_timeout > 0) {
             interval = $interval(
                 function () {
@@ -1901,6 +1961,11 @@ SIREPO.app.factory('simulationQueue', function($rootScope, $interval, requestSen
     }
 
     function cancelInterval(qi) {
+        if (qi.stream) {
+            var s = qi.stream;
+            qi.stream = null;
+            s.abort();
+        }
         if (! qi.interval) {
             return;
         }
@@ -1943,9 +2008,74 @@ SIREPO.app.factory('simulationQueue', function($rootScope, $interval, requestSen
         );
     }
 
+    function streamStatus(qi, process) {
+        // persistent items receive status as server-sent events so
+        // they don't poll. Returns false if the browser can't stream.
+        if (! SIREPO.APP_SCHEMA.feature_config.run_status_stream
+            || qi.streamFailed || ! qi.persistent
+            || ! (window.fetch && window.AbortController && window.TextDecoder)
+        ) {
+            return false;
+        }
+        var c = new AbortController();
+        qi.stream = c;
+        var failed = function() {
+            if (qi.stream !== c) {
+                // aborted by cancelInterval
+                return;
+            }
+            // poll from now on
+            qi.stream = null;
+            qi.streamFailed = true;
+            $rootScope.$apply(function() {
+                requestSender.sendRequest('runStatus', process, qi.request, process);
+            });
+        };
+        fetch(requestSender.formatUrl('runStatusStream'), {
+            body: JSON.stringify(qi.request),
+            credentials: 'same-origin',
+            headers: {'Content-Type': 'application/json'},
+            method: 'POST',
+            signal: c.signal,
+        }).then(function(response) {
+            var t = response.headers.get('Content-Type') || '';
+            if (! response.ok || ! response.body || t.indexOf('text/event-stream') < 0) {
+                throw new Error('runStatusStream unavailable');
+            }
+            var reader = response.body.getReader();
+            var decoder = new TextDecoder();
+            var buf = '';
+            var read = function() {
+                return reader.read().then(function(chunk) {
+                    if (chunk.done) {
+                        throw new Error('runStatusStream closed');
+                    }
+                    buf += decoder.decode(chunk.value, {stream: true});
+                    var events = buf.split('\n\n');
+                    buf = events.pop();
+                    events.forEach(function(e) {
+                        if (qi.stream === c && e.indexOf('data: ') === 0) {
+                            var resp = JSON.parse(e.substring(6));
+                            $rootScope.$apply(function() {
+                                process(resp);
+                            });
+                        }
+                    });
+                    return read();
+                });
+            };
+            return read();
+        }).catch(failed);
+        return true;
+    }
+
     function runItem(qi) {
         var handleStatus = function(qi, resp) {
             qi.request = resp.nextRequest;
+            if (qi.stream || streamStatus(qi, process)) {
+                qi.responseHandler(resp);
+                return;
+            }
             qi.interval = $interval(
                 function () {
                     qi.runStatusCount++;
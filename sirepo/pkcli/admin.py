@@ -36,7 +36,7 @@ def create_examples():
             simulation_db.verify_app_directory(sim_type)
             names = map(
                 lambda x: x['name'],
-                simulation_db.iterate_simulation_datafiles(sim_type, simulation_db.process_simulation_list, {
+                simulation_db.list_simulations(sim_type, {
                     'simulation.isExample': True,
                 }))
             for example in simulation_db.examples(sim_type):
@@ -7,6 +7,51 @@ u"""Database utilities
 from __future__ import absolute_import, division, print_function
 
 
+def fixup_simulations(force=False):
+    """Upgrade every stored simulation to the current schema once
+
+    Documents which are already stamped with the template's fixup
+    version are only re-stamped, unless `force` is set.
+
+    Args:
+        force (bool): run all fixups even if stamped [False]
+    Returns:
+        str: counts of simulations saved and errors
+    """
+    from pykern import pkio
+    from pykern.pkdebug import pkdlog, pkdexc
+    from sirepo import auth
+    from sirepo import feature_config
+    from sirepo import server
+    from sirepo import simulation_db
+    import re
+
+    server.init()
+    n = 0
+    e = 0
+    for d in pkio.sorted_glob(simulation_db.user_dir_name().join('*')):
+        if re.search(r'/src$', str(d)):
+            # not a uid, so not a user's simulations (see pkcli.admin._is_src_dir)
+            continue
+        auth.init_mock(simulation_db.uid_from_dir_name(d))
+        for t in feature_config.cfg().sim_types:
+            for p in pkio.sorted_glob(
+                d.join(t, '*', simulation_db.SIMULATION_DATA_FILE),
+            ):
+                try:
+                    x, c = simulation_db.fixup_old_data(
+                        simulation_db.open_json_file(t, p, fixup=False),
+                        force=force,
+                    )
+                    if c:
+                        simulation_db.save_simulation_json(x, do_validate=False)
+                        n += 1
+                except Exception:
+                    e += 1
+                    pkdlog('path={} stack={}', p, pkdexc())
+    return 'saved={} errors={}'.format(n, e)
+
+
 def upgrade():
     """Upgrade the database"""
     from pykern import pkio
@@ -27,6 +27,7 @@ import tornado.ioloop
 import tornado.iostream
 import tornado.locks
 import tornado.process
+import tornado.queues
 import tornado.websocket
 import tornado.netutil
 
@@ -50,6 +51,17 @@ def start():
 
     cfg = pkconfig.init(
         agent_id=pkconfig.Required(str, 'id of this agent'),
+        fastcgi_max_requests=(
+            100,
+            int,
+            'analysis ops a job_cmd fastcgi process serves before it is replaced (0 is never)',
+        ),
+        fastcgi_preload=(
+            set(),
+            set,
+            'templates imported by job_cmd fastcgi processes when they start',
+        ),
+        fastcgi_workers=(2, int, 'job_cmd fastcgi processes serving analysis ops'),
         supervisor_uri=pkconfig.Required(
             str,
             'how to connect to the supervisor',
@@ -117,7 +129,12 @@ def start_sbatch():
 class _Dispatcher(PKDict):
 
     def __init__(self):
-        super().__init__(cmds=[], fastcgi_cmd=None)
+        super().__init__(
+            cmds=[],
+            fastcgi_cmds=PKDict(),
+            _fastcgi_msg_q=None,
+            _fastcgi_ops=0,
+        )
 
     def format_op(self, msg, opName, **kwargs):
         if msg:
@@ -227,6 +244,7 @@ class _Dispatcher(PKDict):
         await self.send(
             self.format_op(msg, job.OP_OK, reply=PKDict(state=job.CANCELED)),
         )
+        self._fastcgi_cancel(msg.opIdsToCancel)
         for c in list(self.cmds):
             if c.op_id in msg.opIdsToCancel:
                 pkdlog('cmd={}', c)
@@ -246,16 +264,21 @@ class _Dispatcher(PKDict):
         )
 
     async def _cmd(self, msg, **kwargs):
-        if msg.opName == job.OP_ANALYSIS and msg.jobCmd != 'fastcgi':
+        if (
+            msg.opName == job.OP_ANALYSIS
+            and msg.jobCmd != 'fastcgi'
+            # analysis ops beyond what the workers can serve run in their own job_cmd
+            and self._fastcgi_ops < cfg.fastcgi_workers
+        ):
             return await self._fastcgi_op(msg)
         c = _Cmd
         if msg.jobRunMode == job.SBATCH:
             c = _SbatchRun if msg.isParallel else _SbatchCmd
-        elif msg.jobCmd == 'fastcgi':
-            c = _FastCgiCmd
         p = c(msg=msg, dispatcher=self, op_id=msg.opId, **kwargs)
         if msg.jobCmd == 'fastcgi':
-            self.fastcgi_cmd = p
+            # op_id is set while the worker is serving an op (see _fastcgi_read)
+            p.op_id = None
+            self.fastcgi_cmds[msg.fastcgiWorkerId] = p
         self.cmds.append(p)
         await p.start()
         return None
@@ -265,9 +288,33 @@ class _Dispatcher(PKDict):
         # bind_unix_socket doesn't await the callable.
         tornado.ioloop.IOLoop.current().add_callback(self._fastcgi_read, connection)
 
-    async def _fastcgi_handle_error(self, msg, error, stack=None):
+    def _fastcgi_cancel(self, op_ids):
+        """Remove canceled ops waiting for a worker
 
-        async def _reply_error(msg):
+        Ops being served are canceled by destroying their worker.
+        """
+        q = self._fastcgi_msg_q
+        if not q:
+            return
+        k = []
+        while q.qsize() > 0:
+            m = q.get_nowait()
+            q.task_done()
+            if m.opId in op_ids:
+                pkdlog('canceled queued o={:.4}', m.opId)
+                self._fastcgi_ops -= 1
+            else:
+                k.append(m)
+        # no getters are waiting, because the queue was not empty
+        for m in k:
+            q.put_nowait(m)
+
+    async def _fastcgi_handle_error(self, msg, cmd, error):
+        if cmd:
+            cmd.destroy()
+        if msg:
+            self._fastcgi_ops -= 1
+            # supervisor ignores the reply if the op was canceled
             try:
                 await self.send(
                     self.format_op(
@@ -282,68 +329,88 @@ class _Dispatcher(PKDict):
                 )
             except Exception as e:
                 pkdlog('msg={} error={} stack={}', msg, e, pkdexc())
-        # destroy _fastcgi state first, then send replies to avoid
-        # asynchronous modification of _fastcgi state.
-        self._fastcgi_remove_handler()
-        q = self._fastcgi_msg_q
-        self._fastcgi_msg_q = None
-        self.fastcgi_cmd.destroy()
-        if msg:
-            await _reply_error(msg)
-        while q.qsize() > 0:
-            await _reply_error(q.get_nowait())
-            q.task_done()
+            if self._fastcgi_msg_q.qsize() > 0:
+                # replace the worker so queued ops get served
+                await self._fastcgi_start(msg)
 
     async def _fastcgi_op(self, msg):
-        if not self.fastcgi_cmd:
-            m = msg.copy()
-            m.jobCmd = 'fastcgi'
+        if not self._fastcgi_msg_q:
             self._fastcgi_file = 'job_cmd_fastcgi.sock'
-            self._fastcgi_msg_q = tornado.queues.Queue(1)
+            self._fastcgi_msg_q = tornado.queues.Queue()
             pkio.unchecked_remove(self._fastcgi_file)
-            # Avoid OSError: AF_UNIX path too long (max=100)
-            # Use relative path
-            m.fastcgiFile = self._fastcgi_file
-            # Runs in a agent's directory, but chdir's to real runDirs
-            m.runDir = pkio.py_path()
             # Kind of backwards, but it makes sense since we need to listen
             # so _do_fastcgi can connect
             self._fastcgi_remove_handler = tornado.netutil.add_accept_handler(
                 tornado.netutil.bind_unix_socket(self._fastcgi_file),
                 self._fastcgi_accept,
             )
-            # last thing, because of await: start fastcgi process
-            await self._cmd(m, send_reply=False)
+        self._fastcgi_ops += 1
         self._fastcgi_msg_q.put_nowait(msg)
-        self.fastcgi_cmd.op_id = msg.opId
+        await self._fastcgi_start(msg)
         return None
 
     async def _fastcgi_read(self, connection):
-        s = None
+        c = None
         m = None
+        s = None
         try:
             s = tornado.iostream.IOStream(connection)
+            i = pkjson.load_any(
+                await s.read_until(b'\n', job.cfg.max_message_size),
+            ).fastcgiWorkerId
+            c = self.fastcgi_cmds.get(i)
+            if not c:
+                pkdlog('unknown fastcgiWorkerId={}', i)
+                return
+            n = 0
             while True:
                 m = await self._fastcgi_msg_q.get()
                 # Avoid issues with exceptions. We don't use q.join()
                 # so not an issue to call before work is done.
                 self._fastcgi_msg_q.task_done()
+                if c._terminating:
+                    # worker exited while idle so m goes to a replacement
+                    pkdlog('{} exited while idle', c)
+                    self._fastcgi_msg_q.put_nowait(m)
+                    await self._fastcgi_start(m)
+                    return
+                c.op_id = m.opId
                 await s.write(pkjson.dump_bytes(m) + b'\n')
-                await self.job_cmd_reply(
-                    m,
-                    job.OP_ANALYSIS,
-                    await s.read_until(b'\n', job.cfg.max_message_size),
-                )
+                r = await s.read_until(b'\n', job.cfg.max_message_size)
+                c.op_id = None
+                self._fastcgi_ops -= 1
+                x = m
+                m = None
+                await self.job_cmd_reply(x, job.OP_ANALYSIS, r)
+                n += 1
+                if cfg.fastcgi_max_requests and n >= cfg.fastcgi_max_requests:
+                    # closing the connection (finally) causes job_cmd to exit
+                    pkdlog('{} recycling after ops={}', c, n)
+                    self.fastcgi_cmds.pkdel(i)
+                    await self._fastcgi_start(x)
+                    return
         except Exception as e:
-            pkdlog('msg={} error={} stack={}', m, e, pkdexc())
-            # If self.fastcgi_cmd is None we initiated the kill so not an error
-            if not self.fastcgi_cmd:
-                return
-            await self._fastcgi_handle_error(m, e, pkdexc())
+            pkdlog('{} msg={} error={} stack={}', c, m, e, pkdexc())
+            await self._fastcgi_handle_error(m, c, e)
         finally:
             if s:
                 s.close()
 
+    async def _fastcgi_start(self, msg):
+        while len(self.fastcgi_cmds) < cfg.fastcgi_workers:
+            m = msg.copy()
+            m.pkupdate(
+                jobCmd='fastcgi',
+                # Avoid OSError: AF_UNIX path too long (max=100)
+                # Use relative path
+                fastcgiFile=self._fastcgi_file,
+                fastcgiPreload=sorted(cfg.fastcgi_preload),
+                fastcgiWorkerId=job.unique_key(),
+                # Runs in a agent's directory, but chdir's to real runDirs
+                runDir=pkio.py_path(),
+            )
+            await self._cmd(m, send_reply=False)
+
 
 class _Cmd(PKDict):
 
@@ -362,6 +429,8 @@ class _Cmd(PKDict):
 
     def destroy(self):
         self._terminating = True
+        if self.msg.jobCmd == 'fastcgi':
+            self.dispatcher.fastcgi_cmds.pkdel(self.msg.fastcgiWorkerId)
         if '_in_file' in self:
             pkio.unchecked_remove(self.pkdel('_in_file'))
         self._process.kill()
@@ -387,6 +456,8 @@ class _Cmd(PKDict):
                 SIREPO_MPI_CORES=self.msg.get('mpiCores', 1),
                 SIREPO_SIM_DATA_LIB_FILE_URI=self.msg.get('libFileUri', ''),
             ),
+            # agent may have been started before it was assigned a user
+            uid=self.msg.uid,
         )
 
     def job_cmd_pyenv(self):
@@ -492,12 +563,6 @@ class _Cmd(PKDict):
         return f
 
 
-class _FastCgiCmd(_Cmd):
-    def destroy(self):
-        self.dispatcher.fastcgi_cmd = None
-        super().destroy()
-
-
 class _SbatchCmd(_Cmd):
 
     async def exited(self):
@@ -12,7 +12,12 @@ from pykern.pkdebug import pkdp, pkdexc, pkdc, pkdlog
 from sirepo import job
 from sirepo import simulation_db
 from sirepo.template import template_common
+import base64
+import fcntl
+import os
 import requests
+import select
+import signal
 import sirepo.template
 import sirepo.util
 import subprocess
@@ -20,6 +25,10 @@ import sys
 import time
 
 
+#: how often a running parallel simulation's run_dir is checked for changes
+_PARALLEL_STATUS_SECS = 2
+
+
 def default_command(in_file):
     """Reads `in_file` passes to `msg.jobCmd`
 
@@ -55,16 +64,26 @@ def default_command(in_file):
     return pkjson.dump_pretty(r, pretty=False)
 
 
-def _background_percent_complete(msg, template, is_running):
+def _background_percent_complete(msg, template, is_running, state):
+    if hasattr(template, 'background_percent_complete_incremental'):
+        # template keeps what it has parsed so far in state.template
+        r = template.background_percent_complete_incremental(
+            msg.data.report,
+            msg.runDir,
+            is_running,
+            state.pksetdefault(template=PKDict).template,
+        )
+    else:
+        r = template.background_percent_complete(
+            msg.data.report,
+            msg.runDir,
+            is_running,
+        )
     # some templates return a dict so wrap in PKDict
-    r = PKDict(template.background_percent_complete(
-        msg.data.report,
-        msg.runDir,
-        is_running,
-    ))
-#TODO(robnagler) this is incorrect, because we want to see file updates
-#   not just our polling frequency
-    r.pksetdefault(lastUpdateTime=lambda: _mtime_or_now(msg.runDir))
+    r = PKDict(r)
+    r.pksetdefault(
+        lastUpdateTime=lambda: state.get('lastUpdateTime') or _mtime_or_now(msg.runDir),
+    )
     r.pksetdefault(frameCount=0)
     r.pksetdefault(percentComplete=0.0)
     return r
@@ -78,24 +97,24 @@ def _do_cancel(msg, template):
 
 def _do_compute(msg, template):
     msg.runDir = pkio.py_path(msg.runDir)
+    # before Popen so the exit can't be missed
+    w = _exit_wakeup()
     with msg.runDir.join(template_common.RUN_LOG).open('w') as run_log:
         p = subprocess.Popen(
             _do_prepare_simulation(msg, template).cmd,
             stdout=run_log,
             stderr=run_log,
         )
+    s = PKDict()
     while True:
-        for j in range(20):
-            time.sleep(.1)
-            r = p.poll()
-            i = r is None
-            if not i:
-                break
+        r = p.poll()
+        i = r is None
         if msg.isParallel:
             # TODO(e-carlin): This has a potential to fail. We likely
             # don't want the job to fail in this case
-            _write_parallel_status(msg, template, i)
+            _write_parallel_status(msg, template, i, s)
         if i:
+            _exit_wait(w, _PARALLEL_STATUS_SECS if msg.isParallel else None)
             continue
         if r != 0:
             return PKDict(state=job.ERROR, error='non zero returncode={}'.format(r))
@@ -105,12 +124,21 @@ def _do_compute(msg, template):
 def _do_fastcgi(msg, template):
     import socket
 
+    # template for msg already imported by default_command
+    for t in msg.get('fastcgiPreload', ()):
+        sirepo.template.import_module(t)
     s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
     # relative file name (see job_agent.fastcgi_op)
     s.connect(msg.fastcgiFile)
+    # agent pairs the connection with this process
+    s.sendall(pkjson.dump_bytes(PKDict(fastcgiWorkerId=msg.fastcgiWorkerId)) + b'\n')
     while True:
+        m = s.recv(int(1e8))
+        if not m:
+            # agent closed the connection to recycle this process
+            return
         try:
-            m = pkjson.load_any(s.recv(int(1e8)))
+            m = pkjson.load_any(m)
             m.runDir = pkio.py_path(m.runDir)
             with pkio.save_chdir(m.runDir):
                 r = globals()['_do_' + m.jobCmd](
@@ -128,9 +156,17 @@ def _do_fastcgi(msg, template):
 
 
 def _do_get_simulation_frame(msg, template):
-    return template_common.sim_frame_dispatch(
-        msg.data.copy().pkupdate(run_dir=msg.runDir),
-    )
+    # large numeric lists are sent as buffers, not JSON numbers, through
+    # the agent and supervisor (see template_common.sim_frame)
+    return PKDict({
+        template_common.ENCODED_FRAME_KEY: base64.b64encode(
+            template_common.frame_encode(
+                template_common.sim_frame_dispatch(
+                    msg.data.copy().pkupdate(run_dir=msg.runDir),
+                ),
+            ),
+        ).decode('ascii'),
+    })
 
 
 def _do_get_data_file(msg, template):
@@ -164,15 +200,16 @@ def _do_prepare_simulation(msg, template):
 
 def _do_sbatch_status(msg, template):
     s = pkio.py_path(msg.stopSentinel)
+    t = PKDict()
     while True:
         if s.exists():
             if job.COMPLETED not in s.read():
                 # told to stop for an error or otherwise
                 return None
-            _write_parallel_status(msg, template, False)
+            _write_parallel_status(msg, template, False, t)
             pkio.unchecked_remove(s)
             return PKDict(state=job.COMPLETED)
-        _write_parallel_status(msg, template, True)
+        _write_parallel_status(msg, template, True, t)
         time.sleep(msg.nextRequestSeconds)
     # DOES NOT RETURN
 
@@ -188,6 +225,39 @@ def _do_sequential_result(msg, template):
     return r
 
 
+def _exit_wait(fd, timeout):
+    """Wait for a child to exit or timeout
+
+    Args:
+        fd (int): from `_exit_wakeup`
+        timeout (float): seconds or None for forever
+    """
+    try:
+        if select.select([fd], [], [], timeout)[0]:
+            # any signal writes to fd so caller must check the child
+            os.read(fd, 1024)
+    except (OSError, select.error):
+        # EINTR on py2
+        pass
+
+
+def _exit_wakeup():
+    """Deliver SIGCHLD to a file descriptor so `_exit_wait` needn't poll
+
+    Returns:
+        int: read end of the wakeup pipe
+    """
+    r, w = os.pipe()
+    for f in r, w:
+        fcntl.fcntl(f, fcntl.F_SETFL, fcntl.fcntl(f, fcntl.F_GETFL) | os.O_NONBLOCK)
+    # handler must be set for set_wakeup_fd to see the signal
+    signal.signal(signal.SIGCHLD, lambda *args: None)
+    # restart system calls (py2 does not retry on EINTR)
+    signal.siginterrupt(signal.SIGCHLD, False)
+    signal.set_wakeup_fd(w)
+    return r
+
+
 def _mtime_or_now(path):
     """mtime for path if exists else time.time()
 
@@ -200,12 +270,51 @@ def _mtime_or_now(path):
     return int(path.mtime() if path.exists() else time.time())
 
 
-def _write_parallel_status(msg, template, is_running):
+def _run_dir_signature(run_dir):
+    """Names, sizes, and mtimes of files in run_dir
+
+    Args:
+        run_dir (py.path): directory to walk
+    Returns:
+        list: changes whenever the simulation writes output
+    """
+    res = []
+    for d, _, files in os.walk(str(run_dir)):
+        for f in files:
+            try:
+                s = os.stat(os.path.join(d, f))
+            except OSError:
+                # removed while walking
+                continue
+            res.append((d, f, s.st_size, s.st_mtime))
+    return res
+
+
+def _write_parallel_status(msg, template, is_running, state):
+    """Write status if run_dir changed since the last call
+
+    Args:
+        msg (PKDict): compute or sbatch_status msg
+        template (module): simulation type's template
+        is_running (bool): whether the simulation is still running
+        state (PKDict): persists between calls for a single run
+    """
+    s = _run_dir_signature(msg.runDir)
+    if is_running and s == state.get('runDirSignature'):
+        return
+    state.runDirSignature = s
+    if s:
+        state.lastUpdateTime = int(max(x[3] for x in s))
     sys.stdout.write(
         pkjson.dump_pretty(
             PKDict(
                 state=job.RUNNING,
-                parallelStatus=_background_percent_complete(msg, template, is_running),
+                parallelStatus=_background_percent_complete(
+                    msg,
+                    template,
+                    is_running,
+                    state,
+                ),
             ),
             pretty=False,
         ) + '\n',
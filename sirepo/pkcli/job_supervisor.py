@@ -14,10 +14,12 @@ import asyncio
 import signal
 import sirepo.job
 import sirepo.job_driver
+import sirepo.job_scheduler
 import sirepo.job_supervisor
 import sirepo.srdb
 import tornado.httpserver
 import tornado.ioloop
+import tornado.netutil
 import tornado.web
 import tornado.websocket
 
@@ -52,9 +54,13 @@ def default_command():
     )
     server = tornado.httpserver.HTTPServer(app, xheaders=True)
     server.listen(cfg.port, cfg.ip)
+    u = sirepo.job.cfg.supervisor_unix_socket
+    if u:
+        # server requests only; agents always connect with tcp
+        server.add_socket(tornado.netutil.bind_unix_socket(u))
     signal.signal(signal.SIGTERM, _sigterm)
     signal.signal(signal.SIGINT, _sigterm)
-    pkdlog('ip={} port={}', cfg.ip, cfg.port)
+    pkdlog('ip={} port={} unix_socket={}', cfg.ip, cfg.port, u)
     tornado.ioloop.IOLoop.current().start()
 
 
@@ -129,7 +135,12 @@ class _ServerPing(tornado.web.RequestHandler):
 
     async def post(self):
         r = pkjson.load_any(self.request.body)
-        self.write(r.pkupdate(state='ok'))
+        self.write(
+            r.pkupdate(
+                cpuSlots=sirepo.job_scheduler.metrics(),
+                state='ok',
+            ),
+        )
 
     def set_default_headers(self):
         self.set_header("Content-Type", 'application/json; charset="utf-8"')
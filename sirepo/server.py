@@ -199,9 +199,8 @@ def api_findByNameWithAuth(simulation_type, application_mode, simulation_name):
     #TODO(pjm): need to unquote when redirecting from saved cookie redirect?
     simulation_name = urllib.unquote(simulation_name)
     # use the existing named simulation, or copy it from the examples
-    rows = simulation_db.iterate_simulation_datafiles(
+    rows = simulation_db.list_simulations(
         req.type,
-        simulation_db.process_simulation_list,
         {
             'simulation.name': simulation_name,
             'simulation.isExample': True,
@@ -212,9 +211,8 @@ def api_findByNameWithAuth(simulation_type, application_mode, simulation_name):
             if s['models']['simulation']['name'] != simulation_name:
                 continue
             simulation_db.save_new_example(s)
-            rows = simulation_db.iterate_simulation_datafiles(
+            rows = simulation_db.list_simulations(
                 req.type,
-                simulation_db.process_simulation_list,
                 {
                     'simulation.name': simulation_name,
                 },
@@ -456,9 +454,8 @@ def api_listSimulations():
     simulation_db.verify_app_directory(req.type)
     return http_reply.gen_json(
         sorted(
-            simulation_db.iterate_simulation_datafiles(
+            simulation_db.list_simulations(
                 req.type,
-                simulation_db.process_simulation_list,
                 req.req_data.get('search'),
             ),
             key=lambda row: row['name'],
@@ -674,10 +671,7 @@ def _simulation_data_iterator(res, path, data):
 
 def _simulations_using_file(req, ignore_sim_id=None):
     res = []
-    for r in simulation_db.iterate_simulation_datafiles(req.type, _simulation_data_iterator):
-        if not req.sim_data.lib_file_in_use(r, req.filename):
-            continue
-        s = r.models.simulation
+    for s in req.sim_data.lib_file_simulations(req.filename):
         if s.simulationId == ignore_sim_id:
             continue
         res.append(
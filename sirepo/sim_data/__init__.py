@@ -15,6 +15,7 @@ from pykern import pkresource
 from pykern.pkdebug import pkdp
 import hashlib
 import importlib
+import importlib.util
 import inspect
 import re
 import requests
@@ -112,6 +113,9 @@ class SimDataBase(object):
 
     ANALYSIS_ONLY_FIELDS = frozenset()
 
+    #: increment when fixups outside sirepo.sim_data change (e.g. in a template)
+    FIXUP_VERSION = 1
+
     WATCHPOINT_REPORT = 'watchpointReport'
 
     WATCHPOINT_REPORT_RE = re.compile('^{}(\d+)$'.format(WATCHPOINT_REPORT))
@@ -193,6 +197,32 @@ class SimDataBase(object):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def fixup_version(cls):
+        """Stamp of the schema models, fixup code, and `FIXUP_VERSION`
+
+        Stored in data.fixupVersion so documents which have already been
+        upgraded skip `fixup_old_data` when only the release changed.
+        The source of the fixup modules (see `_fixup_source_paths`) is
+        included so changing any fixup invalidates the stamp without
+        bumping `FIXUP_VERSION`.
+
+        Returns:
+            str: hash of fixup inputs
+        """
+        return cls._memoize(
+            hashlib.md5(
+                pkjson.dump_bytes(
+                    PKDict(
+                        fixupVersion=cls.FIXUP_VERSION,
+                        model=cls.schema().model,
+                        source=cls._fixup_source_hash(),
+                    ),
+                    sort_keys=True,
+                ),
+            ).hexdigest(),
+        )
+
     @classmethod
     def frame_id(cls, data, response, model, index):
         """Generate a frame_id from values (unit testing)
@@ -330,6 +360,20 @@ class SimDataBase(object):
     def lib_file_resource_dir(cls):
         return cls._memoize(cls.resource_dir().join('lib'))
 
+    @classmethod
+    def lib_file_simulations(cls, basename):
+        """Simulations of the logged in user which use `basename`
+
+        Args:
+            basename (str): lib file
+        Returns:
+            list: models.simulation of each simulation
+        """
+        cls._assert_server_side()
+        from sirepo import simulation_db
+
+        return simulation_db.lib_file_simulations(cls.sim_type(), basename)
+
     @classmethod
     def lib_file_write_path(cls, basename):
         cls._assert_server_side()
@@ -529,6 +573,44 @@ class SimDataBase(object):
             return _ANIMATION_NAME
         return analysis_model
 
+    @classmethod
+    def _fixup_source_hash(cls):
+        """Hash of the modules in `_fixup_source_paths`
+
+        Returns:
+            str: md5 of the sources or empty if not available
+        """
+        h = hashlib.md5()
+        for p in cls._fixup_source_paths():
+            try:
+                h.update(pkio.read_binary(p))
+            except (IOError, OSError):
+                return ''
+        return h.hexdigest()
+
+    @classmethod
+    def _fixup_source_paths(cls):
+        """Files of the modules which fixup data for `cls`
+
+        The sim_data modules which define `cls`, the common fixups in
+        `sirepo.simulation_db`, and the template with its optional
+        ``<sim_type>_fixup`` module (e.g. `sirepo.template.srw_fixup`).
+        Whole modules are included, because fixups call helpers.
+
+        Returns:
+            list: paths sorted by module name
+        """
+        t = 'sirepo.template.' + cls.sim_type()
+        res = []
+        for m in sorted(
+            set(c.__module__ for c in cls.__mro__ if c.__module__.startswith(__name__))
+            .union(('sirepo.simulation_db', t, t + '_fixup')),
+        ):
+            s = importlib.util.find_spec(m)
+            if s and s.has_location:
+                res.append(s.origin)
+        return res
+
     @classmethod
     def _force_recompute(cls):
         """Random value to force a compute_job to recompute.
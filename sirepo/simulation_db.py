@@ -21,6 +21,7 @@ import copy
 import datetime
 import errno
 import glob
+import hashlib
 import json
 import numconv
 import os
@@ -58,6 +59,9 @@ STATIC_FOLDER = RESOURCE_FOLDER.join('static')
 #: where users live under db_dir
 USER_ROOT_DIR = 'user'
 
+#: Index of simulations in simulation_dir (see `_catalog`)
+_CATALOG_FILE = 'sirepo-catalog' + JSON_SUFFIX
+
 #: How to find examples in resources
 _EXAMPLE_DIR = 'examples'
 
@@ -88,9 +92,15 @@ _RUN_LOG_CANCEL_RE = re.compile(r'^KeyboardInterrupt$', flags=re.MULTILINE)
 #: Absolute path of rsmanifest file
 _RSMANIFEST_PATH = pkio.py_path('/rsmanifest' + JSON_SUFFIX)
 
+#: Compiled schemas are stored in this subdirectory of the srdb root
+_SCHEMA_BUNDLE_SUBDIR = 'schema'
+
 #: Cache of schemas keyed by app name
 _SCHEMA_CACHE = PKDict()
 
+#: Cache of enum value to label maps keyed by app name and enum name
+_SCHEMA_ENUM_CACHE = PKDict()
+
 #: Special field to direct pseudo-subclassing of schema objects
 _SCHEMA_SUPERCLASS_FIELD = '_super'
 
@@ -166,6 +176,7 @@ def delete_simulation(simulation_type, sid):
     """Deletes the simulation's directory.
     """
     pkio.unchecked_remove(simulation_dir(simulation_type, sid))
+    _catalog_update(simulation_type, sid)
 
 
 def examples(app):
@@ -214,6 +225,13 @@ def fixup_old_data(data, force=False):
     try:
         if not force and 'version' in data and data.version == SCHEMA_COMMON.version:
             return data, False
+        import sirepo.sim_data
+        if not force and data.get('fixupVersion') and data.get('simulationType') \
+            and sirepo.template.is_sim_type(data.simulationType) \
+            and data.fixupVersion == sirepo.sim_data.get_class(data.simulationType).fixup_version():
+            # already upgraded by a release with the same models and fixups
+            data.version = SCHEMA_COMMON.version
+            return data, True
         try:
             data.fixup_old_version = data.version
         except AttributeError:
@@ -235,8 +253,9 @@ def fixup_old_data(data, force=False):
             data.simulationType = 'warpvnd'
         if 'simulationSerial' not in data.models.simulation:
             data.models.simulation.simulationSerial = 0
-        import sirepo.sim_data
-        sirepo.sim_data.get_class(data.simulationType).fixup_old_data(data)
+        c = sirepo.sim_data.get_class(data.simulationType)
+        c.fixup_old_data(data)
+        data.fixupVersion = c.fixup_version()
         data.pkdel('fixup_old_version')
         return data, True
     except Exception as e:
@@ -260,27 +279,37 @@ def get_schema(sim_type):
         else feature_config.cfg().sim_types[0]
     if t in _SCHEMA_CACHE:
         return _SCHEMA_CACHE[t]
-    schema = read_json(
-        STATIC_FOLDER.join('json/{}-schema'.format(t)))
-    pkcollections.mapping_merge(schema, SCHEMA_COMMON)
-    pkcollections.mapping_merge(
-        schema,
-        PKDict(feature_config=feature_config.for_sim_type(t)),
+    p = _schema_bundle_path(t)
+    s = _schema_bundle_read(p)
+    if s is None:
+        s = _schema_compile(t)
+        _schema_bundle_write(p, s, t)
+    # config differs between processes (e.g. server and job_cmd), which
+    # share bundles, so it is not in the bundle
+    s.feature_config = feature_config.for_sim_type(t).pkupdate(
+        run_status_stream=feature_config.cfg().run_status_stream,
     )
-    schema.simulationType = t
-    _SCHEMA_CACHE[t] = schema
+    _SCHEMA_CACHE[t] = s
+    return s
 
-    #TODO(mvk): improve merging common and local schema
-    _merge_dicts(schema.common.dynamicFiles, schema.dynamicFiles)
-    schema.dynamicModules = _files_in_schema(schema.dynamicFiles)
 
-    for item in ['appModes', 'constants', 'cookies', 'enum', 'notifications', 'localRoutes', 'model', 'view']:
-        if item not in schema:
-            schema[item] = PKDict()
-        _merge_dicts(schema.common[item], schema[item])
-        _merge_subclasses(schema, item)
-    srschema.validate(schema)
-    return schema
+def get_schema_enum(sim_type, name):
+    """Map of values to labels for enum `name`
+
+    Args:
+        sim_type (str): must be valid
+        name (str): enum in schema
+    Returns:
+        dict: enum value to label
+    """
+    k = (sim_type, name)
+    if k not in _SCHEMA_ENUM_CACHE:
+        e = PKDict()
+        for v in get_schema(sim_type).enum[name]:
+            # first label wins, as with a scan of the list
+            e.setdefault(v[0], v[1])
+        _SCHEMA_ENUM_CACHE[k] = e
+    return _SCHEMA_ENUM_CACHE[k]
 
 
 def generate_json(data, pretty=False):
@@ -373,6 +402,61 @@ def lib_dir_from_sim_dir(sim_dir):
     return _sim_from_path(sim_dir)[1].join(_REL_LIB_DIR)
 
 
+def lib_file_simulations(simulation_type, basename):
+    """Simulations which use lib file `basename`
+
+    Uses the catalog's reverse index of lib files.
+
+    Args:
+        simulation_type (str): app
+        basename (str): lib file
+    Returns:
+        list: models.simulation of each simulation
+    """
+    c = _catalog(simulation_type)
+    res = [c.simulations[i].simulation for i in c.libFiles.get(basename, ())]
+    s = sirepo.sim_data.get_class(simulation_type)
+    for i, e in c.simulations.items():
+        if e.libFiles is None:
+            # lib_file_basenames failed when indexed so try again
+            try:
+                if s.lib_file_in_use(open_json_file(simulation_type, sid=i), basename):
+                    res.append(e.simulation)
+            except Exception as x:
+                pkdlog('sid={} lib_file_in_use error={}', i, x)
+    return res
+
+
+def list_simulations(simulation_type, search=None):
+    """Rows like `process_simulation_list` from the simulation catalog
+
+    Only reads sirepo-data.json files which changed since they were
+    last indexed.
+
+    Args:
+        simulation_type (str): app
+        search (dict): ``simulation.<field>`` values to match [None]
+    Returns:
+        list: PKDict rows in no particular order
+    """
+    if search and any(not k.startswith('simulation.') for k in search):
+        # catalog only indexes models.simulation
+        return iterate_simulation_datafiles(
+            simulation_type,
+            process_simulation_list,
+            search,
+        )
+    res = []
+    for sid, e in _catalog(simulation_type).simulations.items():
+        if search and not _search_data(
+            PKDict(models=PKDict(simulation=e.simulation)),
+            search,
+        ):
+            continue
+        res.append(_simulation_list_row(sid, e.simulation, e.mtime))
+    return res
+
+
 def move_user_simulations(from_uid, to_uid):
     """Moves all non-example simulations `from_uid` into `to_uid`.
 
@@ -510,17 +594,13 @@ def prepare_simulation(data, run_dir=None):
 
 
 def process_simulation_list(res, path, data):
-    sim = data['models']['simulation']
-    res.append(PKDict(
-        simulationId=_sim_from_path(path)[0],
-        name=sim['name'],
-        folder=sim['folder'],
-        last_modified=datetime.datetime.fromtimestamp(
-            os.path.getmtime(str(path))
-        ).strftime('%Y-%m-%d %H:%M'),
-        isExample=sim['isExample'] if 'isExample' in sim else False,
-        simulation=sim,
-    ))
+    res.append(
+        _simulation_list_row(
+            _sim_from_path(path)[0],
+            data['models']['simulation'],
+            os.path.getmtime(str(path)),
+        ),
+    )
 
 
 def read_json(filename):
@@ -628,11 +708,10 @@ def save_simulation_json(data, do_validate=True):
         if need_validate and do_validate:
             srschema.validate_name(
                 data,
-                iterate_simulation_datafiles(
-                    sim_type,
-                    lambda res, _, d: res.append(d),
-                    PKDict({'simulation.folder': s.folder}),
-                ),
+                [
+                    PKDict(models=PKDict(simulation=r.simulation)) for r
+                    in list_simulations(sim_type, PKDict({'simulation.folder': s.folder}))
+                ],
                 SCHEMA_COMMON.common.constants.maxSimCopies
             )
             srschema.validate_fields(data, get_schema(data.simulationType))
@@ -641,6 +720,7 @@ def save_simulation_json(data, do_validate=True):
         d = copy.deepcopy(data)
         pkcollections.unchecked_del(d.models, 'simulationStatus', 'computeJobCacheKey')
         write_json(fn, d)
+        _catalog_update(sim_type, s.simulationId, path=fn, data=d)
     return data
 
 
@@ -901,6 +981,110 @@ def write_status(status, run_dir):
         )
 
 
+def _catalog(simulation_type):
+    """Read the catalog and bring it up to date with simulation_dir
+
+    The catalog is a cache so it is rebuilt if missing, unreadable, or
+    from another app version. Entries are reindexed when the mtime of
+    their sirepo-data.json differs so changes by other processes and
+    lost updates are corrected on the next read.
+
+    Args:
+        simulation_type (str): app
+    Returns:
+        PKDict: version, simulations (sid to catalog entry), and
+            libFiles (lib file basename to sids)
+    """
+    d = simulation_dir(simulation_type)
+    with _global_lock:
+        c = _catalog_read(simulation_type)
+        changed = False
+        seen = set()
+        for p in glob.glob(str(d.join('*', SIMULATION_DATA_FILE))):
+            p = py.path.local(p)
+            sid = p.dirpath().basename
+            try:
+                m = os.path.getmtime(str(p))
+            except OSError:
+                # deleted while iterating
+                continue
+            e = c.simulations.get(sid)
+            if e and e.mtime == m:
+                seen.add(sid)
+                continue
+            try:
+                data = open_json_file(simulation_type, p, fixup=False)
+                data, x = fixup_old_data(data)
+                # save changes to avoid re-applying fixups on each iteration
+                if x:
+                    save_simulation_json(data, do_validate=False)
+                c.simulations[sid] = _catalog_entry(simulation_type, p, data)
+                seen.add(sid)
+            except ValueError as e:
+                pkdlog('{}: error: {}', p, e)
+                c.simulations.pop(sid, None)
+            changed = True
+        for sid in list(c.simulations.keys()):
+            if sid not in seen:
+                del c.simulations[sid]
+                changed = True
+        if changed:
+            _catalog_write(simulation_type, c)
+    return c
+
+
+def _catalog_entry(simulation_type, path, data):
+    try:
+        l = sirepo.sim_data.get_class(simulation_type).lib_file_basenames(data)
+    except Exception as e:
+        # None means unknown so users of libFiles must read data
+        pkdlog('{}: lib_file_basenames error={}', path, e)
+        l = None
+    return PKDict(
+        libFiles=l,
+        mtime=os.path.getmtime(str(path)),
+        simulation=data.models.simulation,
+    )
+
+
+def _catalog_read(simulation_type):
+    f = simulation_dir(simulation_type).join(_CATALOG_FILE)
+    try:
+        c = json_load(f)
+        if c.version == SCHEMA_COMMON.version and 'libFiles' in c:
+            return c
+    except Exception as e:
+        if not pkio.exception_is_not_found(e):
+            pkdlog('{}: rebuilding catalog error={}', f, e)
+    return PKDict(libFiles=PKDict(), simulations=PKDict(), version=SCHEMA_COMMON.version)
+
+
+def _catalog_update(simulation_type, sid, path=None, data=None):
+    """Replace (or remove if not data) sid's entry
+
+    Only updates an existing catalog, because `_catalog` creates it.
+    """
+    f = simulation_dir(simulation_type).join(_CATALOG_FILE)
+    with _global_lock:
+        if not f.check(file=True):
+            return
+        c = _catalog_read(simulation_type)
+        if data:
+            c.simulations[sid] = _catalog_entry(simulation_type, path, data)
+        elif not c.simulations.pop(sid, None):
+            return
+        _catalog_write(simulation_type, c)
+
+
+def _catalog_write(simulation_type, catalog):
+    i = PKDict()
+    for sid, e in catalog.simulations.items():
+        for b in e.libFiles or ():
+            i.setdefault(b, []).append(sid)
+    catalog.libFiles = i
+    util.json_dump(catalog, path=simulation_dir(simulation_type).join(_CATALOG_FILE))
+
+
 def _create_lib_and_examples(simulation_type):
     import sirepo.sim_data
 
@@ -932,9 +1116,8 @@ def _files_in_schema(schema):
 
 
 def _find_user_simulation_copy(simulation_type, sid):
-    rows = iterate_simulation_datafiles(
+    rows = list_simulations(
         simulation_type,
-        process_simulation_list,
         PKDict({'simulation.outOfSessionSimulationId': sid}),
     )
     if len(rows):
@@ -950,6 +1133,7 @@ def _init():
         nfs_tries=(10, int, 'How many times to poll in hack_nfs_write_status'),
         nfs_sleep=(0.5, float, 'Seconds sleep per hack_nfs_write_status poll'),
         sbatch_display=(None, str, 'how to display sbatch cluster to user'),
+        schema_bundle=(True, bool, 'store compiled schemas in the db for faster process startup'),
         tmp_dir=(None, pkio.py_path, 'Used by utilities (not regular config)'),
     )
     fn = STATIC_FOLDER.join('json/schema-common{}'.format(JSON_SUFFIX))
@@ -1054,6 +1238,92 @@ def _random_id(parent_dir, simulation_type=None):
     raise RuntimeError('{}: failed to create unique directory'.format(parent_dir))
 
 
+def _schema_bundle_path(sim_type):
+    """Compiled schema file keyed by version and schema sources
+
+    Only inputs to `_schema_compile` are in the key, because processes
+    with different configuration share the bundle.
+
+    Args:
+        sim_type (str): must be valid
+    Returns:
+        py.path: path to bundle or None if not cached
+    """
+    if not cfg.schema_bundle:
+        return None
+    try:
+        k = [SCHEMA_COMMON.version]
+        for f in 'schema-common', sim_type + '-schema':
+            f = STATIC_FOLDER.join('json/{}{}'.format(f, JSON_SUFFIX))
+            k.extend((f.mtime(), f.size()))
+        return sirepo.srdb.root().join(
+            _SCHEMA_BUNDLE_SUBDIR,
+            '{}-{}{}'.format(
+                sim_type,
+                hashlib.md5(
+                    util.json_dump(k).encode(),
+                ).hexdigest(),
+                JSON_SUFFIX,
+            ),
+        )
+    except Exception as e:
+        pkdlog('sim_type={} error={}', sim_type, e)
+        return None
+
+
+def _schema_bundle_read(path):
+    if not path or not path.check(file=True):
+        return None
+    try:
+        return read_json(path)
+    except Exception as e:
+        pkdlog('path={} error={}', path, e)
+        return None
+
+
+def _schema_bundle_write(path, schema, sim_type):
+    """Write bundle atomically and remove bundles of earlier releases"""
+    if not path:
+        return
+    try:
+        pkio.mkdir_parent_only(path)
+        util.json_dump(schema, path=path)
+    except Exception as e:
+        pkdlog('path={} error={}', path, e)
+        return
+    r = re.compile(r'^{}-[0-9a-f]{{32}}\.(?:json|pickle)$'.format(re.escape(sim_type)))
+    for f in pkio.sorted_glob(path.dirpath().join('{}-*'.format(sim_type))):
+        if f != path and r.search(f.basename):
+            pkio.unchecked_remove(f)
+
+
+def _schema_compile(sim_type):
+    """Read, merge, and validate schema for `sim_type`
+
+    Args:
+        sim_type (str): must be valid
+    Returns:
+        dict: schema
+    """
+    t = sim_type
+    schema = read_json(
+        STATIC_FOLDER.join('json/{}-schema'.format(t)))
+    pkcollections.mapping_merge(schema, SCHEMA_COMMON)
+    schema.simulationType = t
+
+    #TODO(mvk): improve merging common and local schema
+    _merge_dicts(schema.common.dynamicFiles, schema.dynamicFiles)
+    schema.dynamicModules = _files_in_schema(schema.dynamicFiles)
+
+    for item in ['appModes', 'constants', 'cookies', 'enum', 'notifications', 'localRoutes', 'model', 'view']:
+        if item not in schema:
+            schema[item] = PKDict()
+        _merge_dicts(schema.common[item], schema[item])
+        _merge_subclasses(schema, item)
+    srschema.validate(schema)
+    return schema
+
+
 def _search_data(data, search):
     for field, expect in search.items():
         path = field.split('.')
@@ -1107,6 +1377,17 @@ def _sim_from_path(path):
     raise AssertionError('path={} is not valid simulation'.format(path))
 
 
+def _simulation_list_row(sid, sim, mtime):
+    return PKDict(
+        simulationId=sid,
+        name=sim['name'],
+        folder=sim['folder'],
+        last_modified=datetime.datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M'),
+        isExample=sim['isExample'] if 'isExample' in sim else False,
+        simulation=sim,
+    )
+
+
 def _timestamp(time=None):
     if not time:
         time = datetime.datetime.utcnow()
@@ -137,6 +137,28 @@ def background_percent_complete(report, run_dir, is_running):
     )
 
 
+def background_percent_complete_incremental(report, run_dir, is_running, state):
+    if not is_running:
+        return background_percent_complete(report, run_dir, is_running)
+    if 'log' not in state:
+        state.pkupdate(
+            beamline=_beamline_index(
+                simulation_db.read_json(run_dir.join(template_common.INPUT_BASE_NAME)),
+            ),
+            log=_elegant_log_state(),
+            logOffset=0,
+        )
+    p = run_dir.join(ELEGANT_LOG_FILE)
+    if p.exists():
+        t, state.logOffset = template_common.read_appended(p, state.logOffset)
+        _parse_elegant_log_lines(t.split('\n')[:-1], state.log)
+    return PKDict(
+        percentComplete=_beamline_percent_complete(state.beamline, state.log.last_element),
+        frameCount=0,
+        errors=state.log.errors,
+    )
+
+
 def copy_related_files(data, source_path, target_path):
     # copy results and log for the long-running simulations
     for m in ('animation',):
@@ -260,34 +282,9 @@ def parse_elegant_log(run_dir):
     path = run_dir.join(ELEGANT_LOG_FILE)
     if not path.exists():
         return '', 0
-    res = ''
-    last_element = None
-    text = pkio.read_text(str(path))
-    want_next_line = False
-    prev_line = ''
-    prev_err = ''
-    for line in text.split('\n'):
-        if line == prev_line:
-            continue
-        match = re.search('^Starting (\S+) at s\=', line)
-        if match:
-            name = match.group(1)
-            if not re.search('^M\d+\#', name):
-                last_element = name
-        if want_next_line:
-            res += line + '\n'
-            want_next_line = False
-        elif _is_ignore_error_text(line):
-            pass
-        elif _is_error_text(line):
-            if len(line) < 10:
-                want_next_line = True
-            else:
-                if line != prev_err:
-                    res += line + '\n'
-                prev_err = line
-        prev_line = line
-    return res, last_element
+    s = _elegant_log_state()
+    _parse_elegant_log_lines(pkio.read_text(str(path)).split('\n'), s)
+    return s.errors, s.last_element
 
 
 def prepare_for_client(data):
@@ -461,9 +458,7 @@ def _command_file_extension(model):
     return 'sdds'
 
 
-def _compute_percent_complete(data, last_element):
-    if not last_element:
-        return 0
+def _beamline_index(data):
     elements = PKDict()
     for e in data.models.elements:
         elements[e._id] = e
@@ -473,13 +468,25 @@ def _compute_percent_complete(data, last_element):
     id = data.models.simulation.visualizationBeamlineId
     beamline_map = PKDict()
     count = _walk_beamline(beamlines[id], 1, elements, beamlines, beamline_map)
-    index = beamline_map[last_element] if last_element in beamline_map else 0
-    res = index * 100 / count
+    return PKDict(count=count, map=beamline_map)
+
+
+def _beamline_percent_complete(beamline, last_element):
+    if not last_element:
+        return 0
+    index = beamline.map[last_element] if last_element in beamline.map else 0
+    res = index * 100 / beamline.count
     if res > 100:
         return 100
     return res
 
 
+def _compute_percent_complete(data, last_element):
+    if not last_element:
+        return 0
+    return _beamline_percent_complete(_beamline_index(data), last_element)
+
+
 def _contains_columns(column_names, search):
     for col in search:
         if col not in column_names:
@@ -493,35 +500,46 @@ def _correct_halo_gaussian_distribution_type(m):
         m.distribution_type = m.distribution_type.replace('halogaussian', 'halo(gaussian)')
 
 
+def _elegant_log_state():
+    return PKDict(
+        errors='',
+        last_element=None,
+        prev_err='',
+        prev_line='',
+        want_next_line=False,
+    )
+
+
 def _extract_report_data(xFilename, frame_args, page_count=0):
     page_index = frame_args.frameIndex
     xfield = frame_args.x if 'x' in frame_args else frame_args[_X_FIELD]
-    # x, column_names, x_def, err
-    x_col = sdds_util.extract_sdds_column(xFilename, xfield, page_index)
-    if x_col['err']:
-        return x_col['err']
-    x = x_col['values']
-    if not _is_histogram_file(xFilename, x_col['column_names']):
+    #TODO(pjm): y2Filename, y3Filename are not currently used. Would require rescaling x value across files.
+    yfields = []
+    for f in ('y1', 'y2', 'y3'):
+        if f not in frame_args:
+            continue
+        if re.search(r'^none$', frame_args[f], re.IGNORECASE) or frame_args[f] == ' ':
+            continue
+        yfields.append(frame_args[f])
+    if 'y1' not in frame_args:
+        yfields.append(frame_args['y'])
+    # all columns for the page are read in one pass. Histograms only
+    # use x and y1, so the other y fields may not be in the file.
+    cols = sdds_util.extract_sdds_columns(xFilename, [xfield], page_index, optional_fields=yfields)
+    if cols.err:
+        return cols.err
+    x = cols.columns[xfield]
+    if not _is_histogram_file(xFilename, cols.column_names):
         # parameter plot
+        if any(f not in cols.columns for f in yfields):
+            # returns the error for the missing column
+            return sdds_util.extract_sdds_columns(xFilename, [xfield] + yfields, page_index).err
         plots = []
-        filename = PKDict(
-            y1=xFilename,
-            #TODO(pjm): y2Filename, y3Filename are not currently used. Would require rescaling x value across files.
-            y2=xFilename,
-            y3=xFilename,
-        )
-        for f in ('y1', 'y2', 'y3'):
-            if re.search(r'^none$', frame_args[f], re.IGNORECASE) or frame_args[f] == ' ':
-                continue
-            yfield = frame_args[f]
-            y_col = sdds_util.extract_sdds_column(filename[f], yfield, page_index)
-            if y_col['err']:
-                return y_col['err']
-            y = y_col['values']
+        for yfield in yfields:
             plots.append(PKDict(
                 field=yfield,
-                points=y,
-                label=_field_label(yfield, y_col['column_def'][1]),
+                points=cols.columns[yfield],
+                label=_field_label(yfield, cols.column_defs[yfield][1]),
             ))
         title = ''
         if page_count > 1:
@@ -529,15 +547,16 @@ def _extract_report_data(xFilename, frame_args, page_count=0):
         return template_common.parameter_plot(x, plots, frame_args, PKDict(
             title=title,
             y_label='',
-            x_label=_field_label(xfield, x_col['column_def'][1]),
+            x_label=_field_label(xfield, cols.column_defs[xfield][1]),
         ))
     yfield = frame_args['y1'] if 'y1' in frame_args else frame_args['y']
-    y_col = sdds_util.extract_sdds_column(xFilename, yfield, page_index)
-    if y_col['err']:
-        return y_col['err']
-    return template_common.heatmap([x, y_col['values']], frame_args, PKDict(
-        x_label=_field_label(xfield, x_col['column_def'][1]),
-        y_label=_field_label(yfield, y_col['column_def'][1]),
+    if yfield not in cols.columns:
+        cols = sdds_util.extract_sdds_columns(xFilename, [xfield, yfield], page_index)
+        if cols.err:
+            return cols.err
+    return template_common.heatmap([x, cols.columns[yfield]], frame_args, PKDict(
+        x_label=_field_label(xfield, cols.column_defs[xfield][1]),
+        y_label=_field_label(yfield, cols.column_defs[yfield][1]),
         title=_plot_title(xfield, yfield, page_index, page_count),
     ))
 
@@ -868,6 +887,30 @@ def _parameter_definitions(parameters):
     return res
 
 
+def _parse_elegant_log_lines(lines, state):
+    for line in lines:
+        if line == state.prev_line:
+            continue
+        match = re.search('^Starting (\S+) at s\=', line)
+        if match:
+            name = match.group(1)
+            if not re.search('^M\d+\#', name):
+                state.last_element = name
+        if state.want_next_line:
+            state.errors += line + '\n'
+            state.want_next_line = False
+        elif _is_ignore_error_text(line):
+            pass
+        elif _is_error_text(line):
+            if len(line) < 10:
+                state.want_next_line = True
+            else:
+                if line != state.prev_err:
+                    state.errors += line + '\n'
+                state.prev_err = line
+        state.prev_line = line
+
+
 def _plot_title(xfield, yfield, page_index, page_count):
     title_key = xfield + '-' + yfield
     title = ''
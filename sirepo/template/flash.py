@@ -5,15 +5,16 @@ u"""FLASH execution template.
 :license: http://www.apache.org/licenses/LICENSE-2.0.html
 """
 from __future__ import absolute_import, division, print_function
+from pykern import pkconfig
 from pykern import pkio
 from pykern import pkjinja
 from pykern.pkcollections import PKDict
-from pykern.pkdebug import pkdc, pkdp
+from pykern.pkdebug import pkdc, pkdlog, pkdp
 from sirepo import simulation_db
 from sirepo.template import template_common
 import glob
-import h5py
 import numpy as np
+import py.path
 import re
 import sirepo.sim_data
 
@@ -23,6 +24,7 @@ _FLASH_UNITS_PATH = {
     'RTFlame': '/home/vagrant/src/FLASH4.5/object/setup_units',
     'CapLaser': '/home/vagrant/src/FLASH4.5/CapLaser/setup_units',
 }
+_GRID_CACHE_DIR = '.flash-grid'
 _GRID_EVOLUTION_FILE = 'flash.dat'
 _PLOT_FILE_PREFIX = 'flash_hdf5_plt_cnt_'
 
@@ -326,30 +328,21 @@ def sim_frame_gridEvolutionAnimation(frame_args):
 
 
 def sim_frame_varAnimation(frame_args):
+    import h5py
+
     field = frame_args['var']
     filename = _h5_file_list(frame_args.run_dir)[frame_args.frameIndex]
     with h5py.File(filename) as f:
         params = _parameters(f)
-        node_type = f['node type']
-        bounding_box = f['bounding box']
         xdomain = [params['xmin'], params['xmax']]
         ydomain = [params['ymin'], params['ymax']]
-        size = _cell_size(f, params['lrefine_max'])
-        dim = (
-            _rounded_int((ydomain[1] - ydomain[0]) / size[1]) * params['nyb'],
-            _rounded_int((xdomain[1] - xdomain[0]) / size[0]) * params['nxb'],
-        )
-        grid = np.zeros(dim)
-        values = f[field]
-        amr_grid = []
-        for i in xrange(len(node_type)):
-            if node_type[i] == 1:
-                bounds = bounding_box[i]
-                _apply_to_grid(grid, values[i, 0], bounds, size, xdomain, ydomain)
-                amr_grid.append([
-                    (bounds[0] / 100).tolist(),
-                    (bounds[1] / 100).tolist(),
-                ])
+        s = template_common.npz_cache_source(filename)
+        g = _grid_cache_read(filename, s, field, cfg.grid_max_size)
+        if not g:
+            g = _resample_grid(f, field, params, xdomain, ydomain, cfg.grid_max_size)
+            _grid_cache_write(filename, s, field, cfg.grid_max_size, g)
+    grid = g.grid
+    amr_grid = g.amr_grid
 
     # imgplot = plt.imshow(grid, extent=[xdomain[0], xdomain[1], ydomain[1], ydomain[0]], cmap='PiYG')
     aspect_ratio = float(params['nblocky']) / params['nblockx']
@@ -389,17 +382,24 @@ def write_parameters(data, run_dir, is_parallel):
 
 
 def _apply_to_grid(grid, values, bounds, cell_size, xdomain, ydomain):
-    xsize = len(values)
-    ysize = len(values[0])
-    xi = _rounded_int((bounds[0][0] - xdomain[0]) / cell_size[0]) * xsize
-    yi = _rounded_int((bounds[1][0] - ydomain[0]) / cell_size[1]) * ysize
-    xscale = _rounded_int((bounds[0][1] - bounds[0][0]) / cell_size[0])
-    yscale = _rounded_int((bounds[1][1] - bounds[1][0]) / cell_size[1])
-    for x in xrange(xsize):
-        for y in xrange(ysize):
-            for x1 in xrange(xscale):
-                for y1 in xrange(yscale):
-                    grid[yi + (y * yscale) + y1][xi + (x * xscale) + x1] = values[y][x]
+    """Paint AMR blocks onto grid at the finest refinement level
+
+    Args:
+        values (ndarray): [block, y, x] cell values
+        bounds (ndarray): [block, axis, (min, max)] bounding boxes
+    """
+    ny, nx = values.shape[1:]
+    xi = np.rint((bounds[:, 0, 0] - xdomain[0]) / cell_size[0]).astype(int) * nx
+    yi = np.rint((bounds[:, 1, 0] - ydomain[0]) / cell_size[1]).astype(int) * ny
+    xscale = np.rint((bounds[:, 0, 1] - bounds[:, 0, 0]) / cell_size[0]).astype(int)
+    yscale = np.rint((bounds[:, 1, 1] - bounds[:, 1, 0]) / cell_size[1]).astype(int)
+    # blocks at the same refinement level expand to the same shape
+    for xs, ys in set(zip(xscale.tolist(), yscale.tolist())):
+        m = (xscale == xs) & (yscale == ys)
+        grid[
+            yi[m][:, np.newaxis, np.newaxis] + np.arange(ny * ys)[np.newaxis, :, np.newaxis],
+            xi[m][:, np.newaxis, np.newaxis] + np.arange(nx * xs)[np.newaxis, np.newaxis, :],
+        ] = np.repeat(np.repeat(values[m], ys, axis=1), xs, axis=2)
 
 
 def _cell_size(f, refine_max):
@@ -460,6 +460,34 @@ def _generate_parameters_file(data):
     return res
 
 
+def _grid_cache_read(filename, source, field, max_size):
+    c = template_common.npz_cache_read(
+        filename,
+        _GRID_CACHE_DIR,
+        source=source,
+        suffix='-{}-{}'.format(field, max_size),
+    )
+    if not c:
+        return None
+    return PKDict(
+        amr_grid=c.amr_grid.tolist(),
+        grid=c.grid,
+    )
+
+
+def _grid_cache_write(filename, source, field, max_size, value):
+    template_common.npz_cache_write(
+        filename,
+        _GRID_CACHE_DIR,
+        source,
+        PKDict(
+            amr_grid=np.array(value.amr_grid),
+            grid=value.grid,
+        ),
+        suffix='-{}-{}'.format(field, max_size),
+    )
+
+
 def _h5_file_list(run_dir):
     return sorted(glob.glob(str(run_dir.join('{}*'.format(_PLOT_FILE_PREFIX)))))
 
@@ -472,5 +500,43 @@ def _parameters(f):
     return res
 
 
+def _reduce_grid(grid, max_size):
+    """Average square cell groups so neither side exceeds max_size"""
+    n = int(np.ceil(float(max(grid.shape)) / max_size))
+    if n <= 1:
+        return grid
+    h, w = grid.shape
+    grid = np.pad(grid, ((0, -h % n), (0, -w % n)), mode='edge')
+    return grid.reshape(grid.shape[0] // n, n, grid.shape[1] // n, n).mean(axis=(1, 3))
+
+
+def _resample_grid(f, field, params, xdomain, ydomain, max_size):
+    size = _cell_size(f, params['lrefine_max'])
+    grid = np.zeros((
+        _rounded_int((ydomain[1] - ydomain[0]) / size[1]) * params['nyb'],
+        _rounded_int((xdomain[1] - xdomain[0]) / size[0]) * params['nxb'],
+    ))
+    leaf = np.flatnonzero(f['node type'][:] == 1)
+    bounds = f['bounding box'][:][leaf]
+    _apply_to_grid(grid, f[field][:, 0][leaf], bounds, size, xdomain, ydomain)
+    if max_size:
+        grid = _reduce_grid(grid, max_size)
+    return PKDict(
+        amr_grid=(bounds[:, :2] / 100).tolist(),
+        grid=grid,
+    )
+
+
 def _rounded_int(v):
     return int(round(v))
+
+
+def _init():
+    global cfg
+
+    cfg = pkconfig.init(
+        grid_max_size=(0, int, 'average varAnimation grid cells to this many rows or columns (0 is never)'),
+    )
+
+
+_init()
@@ -115,14 +115,11 @@ def sim_frame_beamAnimation(frame_args):
 def sim_frame_beamHistogramAnimation(frame_args):
     beam_info = hellweg_dump_reader.beam_info(_dump_file(run_dir))
     points = hellweg_dump_reader.get_points(beam_info, frame_args.reportType)
-    hist, edges = np.histogram(points, template_common.histogram_bins(frame_args.histogramBins))
-    return {
-        'title': _report_title(frame_args.reportType, 'BeamHistogramReportType', beam_info),
-        'x_range': [edges[0], edges[-1]],
-        'y_label': 'Number of Particles',
-        'x_label': hellweg_dump_reader.get_label(frame_args.reportType),
-        'points': hist.T.tolist(),
-    }
+    return template_common.histogram(points, frame_args, PKDict(
+        title=_report_title(frame_args.reportType, 'BeamHistogramReportType', beam_info),
+        y_label='Number of Particles',
+        x_label=hellweg_dump_reader.get_label(frame_args.reportType),
+    ))
 
 
 def sim_frame_parameterAnimation(frame_args):
@@ -195,19 +192,7 @@ def _compute_range_across_files(run_dir, data):
     dump_file = _dump_file(run_dir)
     if not os.path.exists(dump_file):
         return res
-    beam_header = hellweg_dump_reader.beam_header(dump_file)
-    for frame in xrange(beam_header.NPoints):
-        beam_info = hellweg_dump_reader.beam_info(dump_file, frame)
-        for field in res:
-            values = hellweg_dump_reader.get_points(beam_info, field)
-            if not len(values):
-                pass
-            elif len(res[field]):
-                res[field][0] = min(min(values), res[field][0])
-                res[field][1] = max(max(values), res[field][1])
-            else:
-                res[field] = [min(values), max(values)]
-    return res
+    return hellweg_dump_reader.field_ranges(dump_file, list(res.keys()))
 
 
 def _dump_file(run_dir):
@@ -215,11 +200,10 @@ def _dump_file(run_dir):
 
 
 def _enum_text(enum_name, v):
-    enum_values = _SCHEMA['enum'][enum_name]
-    for e in enum_values:
-        if e[0] == v:
-            return e[1]
-    raise RuntimeError('invalid enum value: {}, {}'.format(enum_values, v))
+    e = simulation_db.get_schema_enum(SIM_TYPE, enum_name)
+    if v not in e:
+        raise RuntimeError('invalid enum value: {}, {}'.format(list(e.keys()), v))
+    return e[v]
 
 
 def _generate_beam(models):
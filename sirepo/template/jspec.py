@@ -13,11 +13,9 @@ from pykern.pkdebug import pkdc, pkdp
 from sirepo import simulation_db
 from sirepo.template import template_common, sdds_util
 import glob
-import math
 import os.path
 import py.path
 import re
-import sdds
 import sirepo.sim_data
 
 _SIM_DATA, SIM_TYPE, _SCHEMA = sirepo.sim_data.template_globals()
@@ -279,24 +277,12 @@ def _beam_evolution_status(run_dir, settings, has_rates):
 
 
 def _compute_range_across_files(run_dir, data):
-    res = {}
-    for v in _SCHEMA.enum.ParticleColumn:
-        res[_map_field_name(v[0])] = []
-    for filename in _ion_files(run_dir):
-        sdds_util.process_sdds_page(filename, 0, _compute_sdds_range, res)
-    return res
-
-
-def _compute_sdds_range(res):
-    sdds_index = 0
-    column_names = sdds.sddsdata.GetColumnNames(sdds_index)
-    for field in res:
-        values = sdds.sddsdata.GetColumn(sdds_index, column_names.index(field))
-        if len(res[field]):
-            res[field][0] = _safe_sdds_value(min(min(values), res[field][0]))
-            res[field][1] = _safe_sdds_value(max(max(values), res[field][1]))
-        else:
-            res[field] = [_safe_sdds_value(min(values)), _safe_sdds_value(max(values))]
+    return template_common.field_range_across_files(
+        run_dir,
+        [_map_field_name(v[0]) for v in _SCHEMA.enum.ParticleColumn],
+        _ion_files(run_dir),
+        _ion_file_range,
+    )
 
 
 def _field_description(field, data):
@@ -364,13 +350,24 @@ def _ion_files(run_dir):
     return map(lambda v: v[0], sorted(res, key=lambda v: v[1]))
 
 
+def _ion_file_range(path):
+    res = PKDict()
+    c = sdds_util.extract_sdds_columns(
+        str(path),
+        [_map_field_name(v[0]) for v in _SCHEMA.enum.ParticleColumn],
+        0,
+    )
+    if c.err:
+        return res
+    for f, v in c.columns.items():
+        if len(v):
+            res[f] = [v.min(), v.max()]
+    return res
+
+
 def _map_field_name(f):
     if f in _FIELD_MAP:
         return _FIELD_MAP[f]
     return f
 
 
-def _safe_sdds_value(v):
-    if isinstance(v, float) and (math.isinf(v) or math.isnan(v)):
-        return 0
-    return v
@@ -16,8 +16,8 @@ from sirepo.template import lattice
 from sirepo.template import sdds_util
 from sirepo.template import template_common
 from sirepo.template.lattice import LatticeUtil
-import h5py
 import numpy as np
+import py.path
 import re
 import sirepo.sim_data
 
@@ -36,6 +36,7 @@ _DIM_INDEX = PKDict(
 )
 _OPAL_H5_FILE = 'opal.h5'
 _OPAL_SDDS_FILE = 'opal.stat'
+_STEP_CACHE_DIR = '.opal-steps'
 _ELEMENTS_WITH_TYPE_FIELD = ('CYCLOTRON', 'RFCAVITY', )
 _HEADER_COMMANDS = ('option', 'filter', 'geometry', 'particlematterinteraction', 'wake')
 _TWISS_FILE_NAME = 'twiss.out'
@@ -154,6 +155,8 @@ def save_report_data(data, run_dir):
 
 
 def sim_frame_bunchAnimation(frame_args):
+    import h5py
+
     a = frame_args.sim_in.models.bunchAnimation
     a.update(frame_args)
     res = PKDict()
@@ -175,16 +178,6 @@ def sim_frame_bunchAnimation(frame_args):
 
 
 def sim_frame_plotAnimation(frame_args):
-
-    def _walk_file(h5file, key, step, res):
-        if key:
-            for field in res.values():
-                field.points.append(h5file[key].attrs[field.name][field.index])
-        else:
-            for field in res.values():
-                _units_from_hdf5(h5file, field)
-
-
     res = PKDict()
     for dim in 'x', 'y1', 'y2', 'y3':
         parts = frame_args[dim].split(' ')
@@ -193,11 +186,17 @@ def sim_frame_plotAnimation(frame_args):
         res[dim] = PKDict(
             label=frame_args[dim],
             dim=dim,
-            points=[],
             name=parts[0],
             index=_DIM_INDEX[parts[1]] if len(parts) > 1 else 0,
         )
-    _iterate_hdf5_steps(frame_args.run_dir.join(_OPAL_H5_FILE), _walk_file, res)
+    s = _read_steps(
+        frame_args.run_dir.join(_OPAL_H5_FILE),
+        attrs=[f.name for f in res.values()],
+    )
+    for field in res.values():
+        v = s.steps['a_' + field.name]
+        field.points = v[:, field.index] if v.ndim > 1 else v
+        _field_units(s.units[field.name], field)
     plots = []
     for field in res.values():
         if field.dim != 'x':
@@ -256,22 +255,15 @@ def _code_var(variables):
 
 
 def _compute_range_across_frames(run_dir, data):
-    def _walk_file(h5file, key, step, res):
-        if key:
-            for field in res:
-                v = np.array(h5file['/{}/{}'.format(key, field)])
-                min1, max1 = v.min(), v.max()
-                if res[field]:
-                    if res[field][0] > min1:
-                        res[field][0] = min1
-                    if res[field][1] < max1:
-                        res[field][1] = max1
-                else:
-                    res[field] = [min1, max1]
     res = PKDict()
     for v in _SCHEMA.enum.PhaseSpaceCoordinate:
         res[v[0]] = None
-    return _iterate_hdf5_steps(run_dir.join(_OPAL_H5_FILE), _walk_file, res)
+    s = _read_steps(run_dir.join(_OPAL_H5_FILE), datasets=list(res.keys()))
+    for field in res:
+        v = s.steps['r_' + field]
+        if len(v):
+            res[field] = [float(np.min(v[:, 0])), float(np.max(v[:, 1]))]
+    return res
 
 
 def _column_data(col, col_names, rows):
@@ -462,18 +454,6 @@ def _generate_variables(code_var, data):
     return res
 
 
-def _iterate_hdf5_steps(path, callback, state):
-    with h5py.File(str(path), 'r') as f:
-        step = 0
-        key = 'Step#{}'.format(step)
-        while key in f:
-            callback(f, key, step, state)
-            step += 1
-            key = 'Step#{}'.format(step)
-        callback(f, None, -1, state)
-    return state
-
-
 def _read_data_file(path):
     col_names = []
     rows = []
@@ -502,16 +482,104 @@ def _read_data_file(path):
 
 
 def _read_frame_count(run_dir):
-    def _walk_file(h5file, key, step, res):
-        if key:
-            res[0] = step + 1
     try:
-        return _iterate_hdf5_steps(run_dir.join(_OPAL_H5_FILE), _walk_file, [0])[0]
-    except IOError:
+        return _read_steps(run_dir.join(_OPAL_H5_FILE)).count
+    except (IOError, OSError):
         pass
     return 0
 
 
+def _read_steps(path, attrs=(), datasets=()):
+    """Step attributes and dataset ranges for all steps of the h5 file
+
+    Values are saved in a sidecar and only steps written since the
+    last read are loaded from the h5 file.
+
+    Args:
+        path (py.path): opal.h5
+        attrs (list): Step#N attributes, as a_<name> [step, ...]
+        datasets (list): Step#N datasets, as r_<name> [step, (min, max)]
+    Returns:
+        PKDict: count, steps (values by key), and units of attrs;
+            steps may be stale if neither attrs nor datasets are passed
+    """
+    import h5py
+
+    keys = ['a_' + n for n in attrs] + ['r_' + n for n in datasets]
+    source = template_common.npz_cache_source(path)
+    res = _step_cache_read(path)
+    if res and res.source == source and all(k in res.steps for k in keys):
+        return res
+    if not res or source[1] < res.source[1]:
+        # new or rewritten file
+        res = PKDict(count=0, steps=PKDict(), units=PKDict())
+    if keys:
+        # keep all cached keys at the same step count
+        keys += [k for k in res.steps if k not in keys]
+    start = PKDict(
+        # the last step may have been incomplete
+        (k, max(res.count - 1, 0) if k in res.steps else 0) for k in keys
+    )
+    new = PKDict((k, []) for k in keys)
+    with h5py.File(str(path), 'r') as f:
+        step = min(start.values()) if keys else max(res.count - 1, 0)
+        key = 'Step#{}'.format(step)
+        while key in f:
+            g = f[key]
+            for k in keys:
+                if step < start[k]:
+                    continue
+                if k.startswith('a_'):
+                    new[k].append(g.attrs[k[2:]])
+                else:
+                    v = g[k[2:]][()]
+                    new[k].append([v.min(), v.max()])
+            step += 1
+            key = 'Step#{}'.format(step)
+        for n in attrs:
+            if n not in res.units:
+                u = f.attrs['{}Unit'.format(n)]
+                res.units[n] = u.decode() if isinstance(u, bytes) else str(u)
+    for k in keys:
+        v = np.array(new[k])
+        if k in res.steps:
+            v = np.concatenate((res.steps[k][:start[k]], v)) if len(v) \
+                else res.steps[k][:start[k]]
+        res.steps[k] = v
+    res.count = step
+    res.source = source
+    if keys:
+        # frame count polls only count steps so don't rewrite the cache
+        _step_cache_write(path, res)
+    return res
+
+
+def _step_cache_read(path):
+    c = template_common.npz_cache_read(path, _STEP_CACHE_DIR)
+    if not c:
+        return None
+    return PKDict(
+        count=int(c['count']),
+        source=c.source,
+        steps=PKDict((k, v) for k, v in c.items() if k[:2] in ('a_', 'r_')),
+        units=PKDict(zip(c.unit_names.tolist(), c.unit_values.tolist())),
+    )
+
+
+def _step_cache_write(path, steps):
+    template_common.npz_cache_write(
+        path,
+        _STEP_CACHE_DIR,
+        steps.source,
+        PKDict(
+            count=np.array(steps.count),
+            unit_names=np.array(list(steps.units.keys()), dtype=str),
+            unit_values=np.array(list(steps.units.values()), dtype=str),
+            **steps.steps
+        ),
+    )
+
+
 def _units(twiss_field):
     if twiss_field in ('betx', 'bety', 'dx'):
         return '[m]'
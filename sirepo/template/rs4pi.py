@@ -10,13 +10,11 @@ from pykern.pkcollections import PKDict
 from pykern import pkio
 from pykern import pkjinja
 from pykern.pkdebug import pkdc, pkdp
-from scipy.ndimage.interpolation import zoom
 from sirepo import simulation_db
 from sirepo.template import template_common
 import ctypes
 import datetime
 import glob
-import h5py
 import numpy as np
 import os
 import os.path
@@ -24,7 +22,6 @@ import py.path
 import re
 import sirepo.sim_data
 import sirepo.util
-import struct
 import time
 import werkzeug
 import zipfile
@@ -54,13 +51,14 @@ _DICOM_MIN_VALUE = -1000
 _DOSE_DICOM_FILE = RTDOSE_EXPORT_FILENAME
 _DOSE_FILE = 'dose3d.dat'
 _EXPECTED_ORIENTATION = np.array([1, 0, 0, 0, 1, 0])
-# using np.float32 for pixel storage
-_FLOAT_SIZE = 4
 _PIXEL_FILE = 'pixels3d.dat'
 _RADIASOFT_ID = 'RadiaSoft'
 _ROI_FILE_NAME = 'rs4pi-roi-data.json'
 _TMP_INPUT_FILE_FIELD = 'tmpDicomFilePath'
 _TMP_ZIP_DIR = 'tmp-dicom-files'
+# pixel and dose volumes (np.float32) memory mapped by _volume
+_VOLUME_CACHE = PKDict()
+_VOLUME_CACHE_MAX = 4
 _ZIP_FILE_NAME = 'input.zip'
 
 
@@ -92,6 +90,9 @@ def copy_related_files(data, source_path, target_path):
 
 
 def generate_rtdose_file(data, run_dir):
+    from scipy.ndimage.interpolation import zoom
+    import h5py
+
     dose_hd5 = str(run_dir.join(DOSE_CALC_OUTPUT))
     dicom_series = data['models']['dicomSeries']
     frame = PKDict(
@@ -532,61 +533,32 @@ def _pixel_filename(simulation):
 
 
 def _read_dose_frame(idx, data):
-    res = []
     if 'dicomDose' not in data['models']:
-        return res
+        return np.zeros((0,), dtype=np.float32)
     dicom_dose = data['models']['dicomDose']
     if idx >= dicom_dose['frameCount']:
-        return res
+        return np.zeros((0,), dtype=np.float32)
     shape = dicom_dose['shape']
-    with open (_dose_filename(data['models']['simulation']), 'rb') as f:
-        f.seek(idx * _FLOAT_SIZE * shape[0] * shape[1], 1)
-        for r in range(shape[0]):
-            row = []
-            res.append(row)
-            for c in range(shape[1]):
-                row.append(struct.unpack('f', f.read(_FLOAT_SIZE))[0])
-    return res
+    return _volume(
+        _dose_filename(data['models']['simulation']),
+        (dicom_dose['frameCount'], shape[0], shape[1]),
+    )[idx]
 
 
 def _read_pixel_plane(plane, idx, data):
     plane_info = data['models']['dicomSeries']['planes']
-    size = [plane_info['c']['frameCount'], plane_info['s']['frameCount'], plane_info['t']['frameCount']]
-    frame = []
-    # pixels = np.array(all_frame_pixels)[:, idx]
-    # pixels = np.array(all_frame_pixels)[:, :, idx]
-    with open (_pixel_filename(data['models']['simulation']), 'rb') as f:
-        if plane == 't':
-            if idx > 0:
-                f.seek(idx * _FLOAT_SIZE * size[0] * size[1], 1)
-            for r in range(size[1]):
-                row = []
-                frame.append(row)
-                for v in range(size[0]):
-                    row.append(struct.unpack('f', f.read(_FLOAT_SIZE))[0])
-        elif plane == 'c':
-            if idx > 0:
-                f.seek(idx * _FLOAT_SIZE * size[0], 1)
-            for r in range(size[2]):
-                row = []
-                frame.append(row)
-                for v in range(size[0]):
-                    row.append(struct.unpack('f', f.read(_FLOAT_SIZE))[0])
-                f.seek(_FLOAT_SIZE * (size[0] - 1) * size[1], 1)
-            frame = np.flipud(frame).tolist()
-        elif plane == 's':
-            if idx > 0:
-                f.seek(idx * _FLOAT_SIZE, 1)
-            for r in range(size[2]):
-                row = []
-                frame.append(row)
-                for v in range(size[1]):
-                    row.append(struct.unpack('f', f.read(_FLOAT_SIZE))[0])
-                    f.seek(_FLOAT_SIZE * (size[0] - 1), 1)
-            frame = np.flipud(frame).tolist()
-        else:
-            raise RuntimeError('plane not supported: {}'.format(plane))
-    return frame
+    # frames are stored transverse plane first: [t][s][c]
+    v = _volume(
+        _pixel_filename(data['models']['simulation']),
+        (plane_info['t']['frameCount'], plane_info['s']['frameCount'], plane_info['c']['frameCount']),
+    )
+    if plane == 't':
+        return v[idx]
+    if plane == 'c':
+        return np.flipud(v[:, idx, :])
+    if plane == 's':
+        return np.flipud(v[:, :, idx])
+    raise RuntimeError('plane not supported: {}'.format(plane))
 
 
 def _read_roi_file(sim_id):
@@ -808,3 +780,17 @@ def _update_roi_file(sim_id, contours):
     #TODO(pjm): file locking or atomic update
     simulation_db.write_json(_roi_file(sim_id), data)
     return {}
+
+
+def _volume(path, shape):
+    """Memory map of a float32 volume, cached while the file is unchanged"""
+    s = os.stat(path)
+    k = (path, tuple(shape))
+    c = _VOLUME_CACHE.get(k)
+    if c and c[0] == (s.st_mtime, s.st_size):
+        return c[1]
+    if len(_VOLUME_CACHE) >= _VOLUME_CACHE_MAX:
+        _VOLUME_CACHE.clear()
+    v = np.memmap(path, dtype=np.float32, mode='r', shape=tuple(shape))
+    _VOLUME_CACHE[k] = ((s.st_mtime, s.st_size), v)
+    return v
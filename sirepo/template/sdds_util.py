@@ -10,7 +10,7 @@ from pykern import pksubprocess
 from pykern.pkcollections import PKDict
 from pykern.pkdebug import pkdc, pkdexc, pkdlog, pkdp
 from sirepo.template import elegant_common
-import math
+import numpy
 import re
 import sdds
 
@@ -38,7 +38,35 @@ _SDDS_INDEX = 0
 
 
 def extract_sdds_column(filename, field, page_index):
-    return process_sdds_page(filename, page_index, _sdds_column, field)
+    res = extract_sdds_columns(filename, [field], page_index)
+    if res.err:
+        return res
+    return PKDict(
+        values=res.columns[field].tolist(),
+        column_names=res.column_names,
+        column_def=res.column_defs[field],
+        err=None,
+    )
+
+
+def extract_sdds_columns(filename, fields, page_index, optional_fields=()):
+    """Read several columns of a page in one pass
+
+    sddsdata cannot seek to a page so reading page N parses all the
+    pages before it. Reading all the fields at once avoids repeating
+    that for each column.
+
+    Args:
+        filename (str): sdds file
+        fields (list): column names
+        page_index (int): zero-based page
+        optional_fields (list): column names read only if in the file
+    Returns:
+        PKDict: columns (numpy arrays with nan and inf set to 0) and
+            column_defs keyed by field, column_names, and err (also set
+            if one of `fields` is not in the file)
+    """
+    return process_sdds_page(filename, page_index, _sdds_columns, fields, optional_fields)
 
 
 def process_sdds_page(filename, page_index, callback, *args, **kwargs):
@@ -63,9 +91,9 @@ def process_sdds_page(filename, page_index, callback, *args, **kwargs):
             sdds.sddsdata.Terminate(_SDDS_INDEX)
         except Exception:
             pass
-    return {
-        'err': err,
-    }
+    return PKDict(
+        err=err,
+    )
 
 
 def twiss_to_madx(elegant_twiss_file, madx_twiss_file):
@@ -89,25 +117,33 @@ def twiss_to_madx(elegant_twiss_file, madx_twiss_file):
     pkio.write_text(madx_twiss_file, header + '\n'.join(lines) + '\n')
 
 
-def _safe_sdds_value(v):
-    if isinstance(v, float) and (math.isinf(v) or math.isnan(v)):
-        return 0
-    return v
-
-
-def _sdds_column(field):
-    column_names = sdds.sddsdata.GetColumnNames(_SDDS_INDEX)
-    column_def = sdds.sddsdata.GetColumnDefinition(_SDDS_INDEX, field)
-    values = sdds.sddsdata.GetColumn(
-        _SDDS_INDEX,
-        column_names.index(field),
-    )
-    return PKDict(
-        values=map(lambda v: _safe_sdds_value(v), values),
-        column_names=column_names,
-        column_def=column_def,
+def _safe_sdds_values(values):
+    res = numpy.array(values)
+    if res.dtype.kind == 'f':
+        res[~numpy.isfinite(res)] = 0
+    return res
+
+
+def _sdds_columns(fields, optional_fields):
+    n = sdds.sddsdata.GetColumnNames(_SDDS_INDEX)
+    for f in fields:
+        if f not in n:
+            pkdlog('{}: column not found in {}', f, n)
+            return PKDict(
+                err=_sdds_error('Column {} not found'.format(f)),
+            )
+    res = PKDict(
+        columns=PKDict(),
+        column_defs=PKDict(),
+        column_names=n,
         err=None,
     )
+    for f in list(fields) + [x for x in optional_fields if x in n]:
+        res.column_defs[f] = sdds.sddsdata.GetColumnDefinition(_SDDS_INDEX, f)
+        res.columns[f] = _safe_sdds_values(
+            sdds.sddsdata.GetColumn(_SDDS_INDEX, n.index(f)),
+        )
+    return res
 
 
 def _sdds_error(error_text='invalid data file'):
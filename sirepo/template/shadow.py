@@ -135,9 +135,9 @@ def _convert_meters_to_centimeters(models):
 
 def _eq(item, field, *values):
     t = _SCHEMA.model[item['type']][field][1]
-    for v, n in _SCHEMA.enum[t]:
-        if item[field] == v:
-            return n in values
+    e = simulation_db.get_schema_enum(SIM_TYPE, t)
+    if item[field] in e:
+        return e[item[field]] in values
     raise AssertionError(
         '{}: value not found for model={} field={} type={}'.format(
             item[field], item['type'], field, t))
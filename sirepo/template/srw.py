@@ -288,21 +288,20 @@ def extract_report_data(filename, sim_in):
         y_units = '({})'.format(y_units)
 
     subtitle = ''
-    schema_enum = []
+    schema_enum = PKDict()
     report_model = m[r]
     subtitle_datum = ''
     subtitle_format = '{}'
     if r in ('intensityReport',):
-        schema_enum = _SCHEMA['enum']['Polarization']
+        schema_enum = simulation_db.get_schema_enum(SIM_TYPE, 'Polarization')
         subtitle_datum = report_model['polarization']
         subtitle_format = '{} Polarization'
     elif r in ('initialIntensityReport', 'sourceIntensityReport') or _SIM_DATA.is_watchpoint(r):
-        schema_enum = _SCHEMA['enum']['Characteristic']
+        schema_enum = simulation_db.get_schema_enum(SIM_TYPE, 'Characteristic')
         subtitle_datum = report_model['characteristic']
     # Schema enums are indexed by strings, but model data may be numeric
-    schema_values = [e for e in schema_enum if e[0] == str(subtitle_datum)]
-    if len(schema_values) > 0:
-        subtitle = subtitle_format.format(schema_values[0][1])
+    if str(subtitle_datum) in schema_enum:
+        subtitle = subtitle_format.format(schema_enum[str(subtitle_datum)])
     info = PKDict({
         'title': title,
         'subtitle': subtitle,
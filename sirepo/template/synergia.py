@@ -13,9 +13,7 @@ from sirepo.srschema import get_enums
 from sirepo.template import lattice
 from sirepo.template import template_common
 from sirepo.template.lattice import LatticeUtil
-from synergia import foundation
 import glob
-import h5py
 import math
 import py.path
 import re
@@ -88,6 +86,8 @@ class SynergiaLatticeIterator(lattice.LatticeIterator):
 
 
 def background_percent_complete(report, run_dir, is_running):
+    import h5py
+
     diag_file = run_dir.join(OUTPUT_FILE.beamEvolutionAnimation)
     if diag_file.exists():
         particle_file_count = len(_particle_file_list(run_dir))
@@ -222,6 +222,8 @@ def parse_synergia_log(run_dir):
 
 
 def save_report_data(data, run_dir):
+    import h5py
+
     if 'bunchReport' in data.report:
         import synergia.bunch
         with h5py.File(str(run_dir.join(OUTPUT_FILE.twissReport)), 'r') as f:
@@ -277,6 +279,8 @@ def save_report_data(data, run_dir):
 
 
 def sim_frame_beamEvolutionAnimation(frame_args):
+    import h5py
+
     plots = []
     n = str(frame_args.run_dir.join(OUTPUT_FILE.beamEvolutionAnimation))
     with h5py.File(n, 'r') as f:
@@ -306,6 +310,8 @@ def sim_frame_beamEvolutionAnimation(frame_args):
 
 
 def sim_frame_bunchAnimation(frame_args):
+    import h5py
+
     n = _particle_file_list(frame_args.run_dir)[frame_args.frameIndex]
     with h5py.File(str(n), 'r') as f:
         x = f['particles'][:, _COORD6.index(frame_args.x)].tolist()
@@ -330,6 +336,8 @@ def sim_frame_bunchAnimation(frame_args):
 
 
 def sim_frame_turnComparisonAnimation(frame_args):
+    import h5py
+
     turn_count = frame_args.sim_in.models.simulationSettings.turn_count
     plots = []
     with h5py.File(str(frame_args.run_dir.join(OUTPUT_FILE.beamEvolutionAnimation)), 'r') as f:
@@ -369,6 +377,8 @@ def sim_frame_turnComparisonAnimation(frame_args):
 
 
 def validate_file(file_type, path):
+    import h5py
+
     if file_type != 'bunch-particleFile':
         return 'invalid file type'
     try:
@@ -394,6 +404,7 @@ def write_parameters(data, run_dir, is_parallel):
 
 
 def _calc_bunch_parameters(bunch):
+    from synergia import foundation
     bunch_def = bunch.beam_definition
     bunch_enums = get_enums(_SCHEMA, 'BeamDefinition')
     mom = foundation.Four_momentum(bunch.mass)
@@ -452,19 +463,12 @@ def _calc_particle_info(bunch):
 
 
 def _compute_range_across_files(run_dir, data):
-    res = PKDict()
-    for v in _SCHEMA.enum.PhaseSpaceCoordinate6:
-        res[v[0]] = []
-    for filename in _particle_file_list(run_dir):
-        with h5py.File(str(filename), 'r') as f:
-            for field in res:
-                values = f['particles'][:, _COORD6.index(field)].tolist()
-                if len(res[field]):
-                    res[field][0] = min(min(values), res[field][0])
-                    res[field][1] = max(max(values), res[field][1])
-                else:
-                    res[field] = [min(values), max(values)]
-    return res
+    return template_common.field_range_across_files(
+        run_dir,
+        [v[0] for v in _SCHEMA.enum.PhaseSpaceCoordinate6],
+        _particle_file_list(run_dir),
+        _particle_file_range,
+    )
 
 
 def _drift_name(length):
@@ -508,6 +512,7 @@ def _generate_parameters_file(data):
 
 
 def _import_bunch(lattice, data):
+    from synergia import foundation
     from synergia.foundation import pconstants
     if not lattice.has_reference_particle():
         # create a default reference particle, proton,energy=1.5
@@ -787,6 +792,18 @@ def _particle_file_list(run_dir):
     return sorted(glob.glob(str(run_dir.join('particles_*.h5'))))
 
 
+def _particle_file_range(path):
+    import h5py
+
+    with h5py.File(str(path), 'r') as f:
+        p = f['particles'][:, :len(_COORD6)]
+    if not len(p):
+        return PKDict()
+    a = p.min(axis=0)
+    b = p.max(axis=0)
+    return PKDict((c, [a[i], b[i]]) for i, c in enumerate(_COORD6))
+
+
 def _plot_field(field):
     if field == 'numparticles':
         return 'num_particles', None, None
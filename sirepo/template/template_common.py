@@ -5,10 +5,12 @@ u"""Common execution template.
 :license: http://www.apache.org/licenses/LICENSE-2.0.html
 """
 from __future__ import absolute_import, division, print_function
+from pykern import pkconfig
 from pykern import pkio
 from pykern import pkjinja
 from pykern.pkcollections import PKDict
 from pykern.pkdebug import pkdc, pkdlog, pkdp, pkdexc
+import base64
 import math
 import numpy
 import os.path
@@ -18,6 +20,7 @@ import sirepo.http_request
 import sirepo.sim_data
 import sirepo.template
 import sirepo.util
+import struct
 import subprocess
 import types
 
@@ -26,6 +29,9 @@ ANIMATION_ARGS_VERSION_RE = re.compile(r'v(\d+)$')
 
 DEFAULT_INTENSITY_DISTANCE = 20
 
+#: job_cmd reply key for a frame in the format of frame_encode
+ENCODED_FRAME_KEY = 'encodedFrame'
+
 #: Input json file
 INPUT_BASE_NAME = 'in'
 
@@ -38,10 +44,41 @@ PARAMETERS_PYTHON_FILE = 'parameters.py'
 #: stderr and stdout
 RUN_LOG = 'run.log'
 
+#: significant digits of float32, kept by compact_values
+_FLOAT32_DIGITS = 7
+
+#: per file field ranges kept in the run_dir by field_range_across_files
+_FIELD_RANGE_INDEX = 'field-range-index.json'
+
+#: frame_encode header key which refers to a buffer
+_FRAME_BUFFER = '__sirepoBuffer'
+
+#: fields of frames which are encoded as buffers
+_FRAME_BUFFER_FIELDS = frozenset((
+    'dose_array',
+    'pixel_array',
+    'points',
+    'x_points',
+    'y_points',
+    'z_matrix',
+))
+
+#: lists with fewer values are left in the header
+_FRAME_BUFFER_MIN_LEN = 64
+
+#: fields which stay float64 in float32 frames, e.g. epoch times in webcon
+_FRAME_FLOAT64_FIELDS = frozenset(('x_points',))
+
 _HISTOGRAM_BINS_MAX = 500
 
+#: numpy dtype kinds which are plotted as numbers
+_NUMERIC_KINDS = 'fiu'
+
 _PLOT_LINE_COLOR = ['#1f77b4', '#ff7f0e', '#2ca02c']
 
+#: configuration
+cfg = None
+
 class ModelUnits(object):
     """Convert model fields from native to sirepo format, or from sirepo to native format.
 
@@ -114,6 +151,34 @@ class ModelUnits(object):
         return model
 
 
+def compact_values(values):
+    """Convert numeric values to a list for a smaller response
+
+    Integral values, e.g. unweighted histogram counts, are returned as
+    ints. Other values are rounded to float32 precision, each relative
+    to its own magnitude, so their JSON representation is short. Values
+    with a large offset, e.g. epoch times, lose their differences, so
+    don't compact them.
+
+    Args:
+        values (list or numpy.ndarray): numbers
+    Returns:
+        list: rounded values
+    """
+    a = numpy.asarray(values, dtype=float)
+    if not a.size:
+        return a.tolist()
+    f = numpy.isfinite(a)
+    if f.all() and numpy.array_equal(a, numpy.rint(a)) \
+        and numpy.abs(a).max() < 2 ** 53:
+        return a.astype(numpy.int64).tolist()
+    with numpy.errstate(all='ignore'):
+        e = numpy.floor(numpy.log10(numpy.abs(numpy.where(f & (a != 0), a, 1))))
+        s = 10.0 ** (_FLOAT32_DIGITS - 1 - e)
+        r = numpy.round(a * s) / s
+    return numpy.where(f & numpy.isfinite(r), r, a).tolist()
+
+
 def compute_field_range(args, compute_range):
     """ Computes the fieldRange values for all parameters across all animation files.
     Caches the value on the animation input file. compute_range() is called to
@@ -147,11 +212,18 @@ def compute_plot_color_and_range(plots, plot_colors=None, fixed_y_range=None):
     for i in range(len(plots)):
         plot = plots[i]
         plot['color'] = colors[i % len(colors)]
-        if not len(plot['points']):
+        p = numpy.asarray(plot['points'])
+        if p.dtype.kind in _NUMERIC_KINDS:
+            plot['points'] = compact_values(p)
+        if not len(p):
             y_range = [0, 0]
         elif fixed_y_range is None:
-            vmin = min(plot['points'])
-            vmax = max(plot['points'])
+            if p.dtype.kind in _NUMERIC_KINDS:
+                vmin = p.min().item()
+                vmax = p.max().item()
+            else:
+                vmin = min(plot['points'])
+                vmax = max(plot['points'])
             if y_range:
                 if vmin < y_range[0]:
                     y_range[0] = vmin
@@ -187,10 +259,61 @@ def dict_to_h5(d, hf, path=None):
 
 
 def enum_text(schema, name, value):
-    for e in schema['enum'][name]:
-        if e[0] == value:
-            return e[1]
-    assert False, 'unknown {} enum value: {}'.format(name, value)
+    from sirepo import simulation_db
+
+    e = simulation_db.get_schema_enum(schema.simulationType, name)
+    assert value in e, 'unknown {} enum value: {}'.format(name, value)
+    return e[value]
+
+
+def field_range_across_files(run_dir, fields, paths, file_range):
+    """Merge the min and max of fields across data files
+
+    file_range(path) returns a dict of field to [min, max] for one
+    file. Its results are kept in an index in run_dir keyed by file
+    name, mtime, and size so each file is only read once, even while
+    the simulation is still writing new files.
+
+    Args:
+        run_dir (py.path): animation directory
+        fields (list): field names
+        paths (list): data files
+        file_range (callable): computes ranges for a single file
+    Returns:
+        PKDict: field to [min, max] or [] if there are no values
+    """
+    from pykern import pkjson
+
+    p = run_dir.join(_FIELD_RANGE_INDEX)
+    i = PKDict()
+    if p.check(file=True):
+        try:
+            i = pkjson.load_any(p)
+        except Exception as e:
+            pkdlog('{}: ignoring index error={}', p, e)
+    n = PKDict()
+    res = PKDict((f, []) for f in fields)
+    for f in paths:
+        f = pkio.py_path(f)
+        s = [f.mtime(), f.size()]
+        e = i.get(f.basename)
+        if not e or e.source != s or any(k not in e.range for k in fields):
+            e = PKDict(source=s, range=PKDict(file_range(f)))
+            for k in fields:
+                r = e.range.get(k)
+                r = [float(r[0]), float(r[1])] if r else []
+                # nan and inf can't be stored in the index or merged
+                e.range[k] = r if numpy.all(numpy.isfinite(r)) else []
+        n[f.basename] = e
+        for k in fields:
+            r = e.range[k]
+            if not r:
+                continue
+            res[k] = [min(r[0], res[k][0]), max(r[1], res[k][1])] if res[k] \
+                else list(r)
+    if n != i:
+        sirepo.util.json_dump(n, path=p)
+    return res
 
 
 def flatten_data(d, res, prefix=''):
@@ -206,6 +329,57 @@ def flatten_data(d, res, prefix=''):
     return res
 
 
+def frame_decode(data):
+    """Parse a frame encoded by `frame_encode`
+
+    Args:
+        data (bytes): encoded frame
+    Returns:
+        PKDict: frame with buffers as numpy arrays
+    """
+    from pykern import pkjson
+
+    n = struct.unpack_from('<I', data)[0]
+
+    def _decode(value):
+        if isinstance(value, dict):
+            b = value.get(_FRAME_BUFFER)
+            if b:
+                return numpy.frombuffer(
+                    data,
+                    dtype=b[2],
+                    count=int(numpy.prod(b[1])),
+                    offset=4 + n + b[0],
+                ).reshape(b[1])
+            return PKDict((k, _decode(v)) for k, v in value.items())
+        if isinstance(value, list):
+            return [_decode(v) for v in value]
+        return value
+
+    return _decode(pkjson.load_any(data[4:4 + n]))
+
+
+def frame_encode(value, float32=False):
+    """Encode a frame with its large numeric lists as binary buffers
+
+    The format is a little-endian uint32 header length, the JSON header
+    padded to eight bytes, and then the buffers, each padded to eight
+    bytes. Lists and arrays in `_FRAME_BUFFER_FIELDS` are replaced in
+    the header by ``{"__sirepoBuffer": [offset, shape, dtype]}``, where
+    offset is relative to the end of the header.
+
+    Args:
+        value (dict): frame
+        float32 (bool): buffers are float32 except `_FRAME_FLOAT64_FIELDS` [False]
+    Returns:
+        bytes: encoded frame
+    """
+    b = []
+    h = sirepo.util.json_dump(_frame_buffers(value, b, None, float32)).encode('utf-8')
+    h += b' ' * (-(4 + len(h)) % 8)
+    return b''.join([struct.pack('<I', len(h)), h] + b)
+
+
 def generate_parameters_file(data):
     v = flatten_data(data['models'], PKDict())
     v['notes'] = _get_notes(v)
@@ -221,7 +395,11 @@ def sim_frame(frame_id, op):
     except Exception as e:
         pkdlog('error generating report frame_id={} stack={}', frame_id, pkdexc())
         raise sirepo.util.convert_exception(e, display_text='Report not generated')
-    r = sirepo.http_reply.gen_json(x)
+    if ENCODED_FRAME_KEY in x:
+        x = frame_decode(base64.b64decode(x[ENCODED_FRAME_KEY])).pksetdefault(
+            state=x.state,
+        )
+    r = sirepo.http_reply.gen_frame(x)
     if 'error' not in x and s.want_browser_frame_cache():
         r.headers['Cache-Control'] = 'private, max-age=31536000'
     else:
@@ -280,19 +458,53 @@ def h5_to_dict(hf, path=None):
     return d
 
 
-def heatmap(values, model, plot_fields=None):
-    """Computes a report histogram (x_range, y_range, z_matrix) for a report model."""
+def heatmap(values, model, plot_fields=None, weights=None):
+    """Computes a report histogram (x_range, y_range, z_matrix) for a report model.
+
+    values are two lists or numpy arrays, and weights is an optional
+    weight per point.
+    """
     range = None
     if 'plotRangeType' in model:
         if model['plotRangeType'] == 'fixed':
             range = [_plot_range(model, 'horizontal'), _plot_range(model, 'vertical')]
         elif model['plotRangeType'] == 'fit' and 'fieldRange' in model:
             range = [model.fieldRange[model['x']], model.fieldRange[model['y']]]
-    hist, edges = numpy.histogramdd(values, histogram_bins(model['histogramBins']), range=range)
+    hist, edges = numpy.histogramdd(
+        [numpy.asarray(v) for v in values],
+        histogram_bins(model['histogramBins']),
+        range=range,
+        weights=None if weights is None else numpy.asarray(weights),
+    )
     res = PKDict(
         x_range=[float(edges[0][0]), float(edges[0][-1]), len(hist)],
         y_range=[float(edges[1][0]), float(edges[1][-1]), len(hist[0])],
-        z_matrix=hist.T.tolist(),
+        z_matrix=[compact_values(r) for r in hist.T],
+    )
+    if plot_fields:
+        res.update(plot_fields)
+    return res
+
+
+def histogram(values, model, plot_fields=None, weights=None):
+    """Computes a 1D histogram (x_range, points) for a report model
+
+    Args:
+        values (list or numpy.ndarray): points
+        model (dict): with histogramBins
+        plot_fields (dict): added to result [None]
+        weights (list or numpy.ndarray): weight per point [None]
+    Returns:
+        PKDict: x_range and points
+    """
+    hist, edges = numpy.histogram(
+        numpy.asarray(values),
+        histogram_bins(model['histogramBins']),
+        weights=None if weights is None else numpy.asarray(weights),
+    )
+    res = PKDict(
+        x_range=[float(edges[0]), float(edges[-1])],
+        points=compact_values(hist),
     )
     if plot_fields:
         res.update(plot_fields)
@@ -309,10 +521,94 @@ def histogram_bins(nbins):
     return nbins
 
 
+def npz_cache_read(path, cache_dir, source=None, suffix=''):
+    """Arrays saved by `npz_cache_write` for `path`
+
+    Args:
+        path (py.path): file the arrays were computed from
+        cache_dir (str): directory next to path holding the caches
+        source (list): expected `npz_cache_source` or None for any
+        suffix (str): distinguishes caches of the same path
+    Returns:
+        PKDict: arrays by name and source when written or None if
+            not cached, unreadable, or not from `source`
+    """
+    p = _npz_cache_path(path, cache_dir, suffix)
+    try:
+        if not p.check(file=True):
+            return None
+        with numpy.load(str(p)) as d:
+            res = PKDict((k, d[k]) for k in d.files)
+        res.source = res.source.tolist()
+        if source is None or res.source == source:
+            return res
+    except Exception as e:
+        pkdlog('{}: cache error={}', p, e)
+    return None
+
+
+def npz_cache_source(path):
+    """Identifies the contents of `path` for `npz_cache_read`
+
+    Args:
+        path (py.path): file
+    Returns:
+        list: mtime and size
+    """
+    s = os.stat(str(path))
+    return [s.st_mtime, s.st_size]
+
+
+def npz_cache_write(path, cache_dir, source, arrays, suffix=''):
+    """Atomically save arrays computed from `path` in a numpy archive
+
+    Errors are logged, because the cache is only an optimization.
+
+    Args:
+        path (py.path): file the arrays were computed from
+        cache_dir (str): directory next to path holding the caches
+        source (list): `npz_cache_source` before path was read
+        arrays (dict): numpy arrays (or values convertible) by name
+        suffix (str): distinguishes caches of the same path
+    """
+    p = _npz_cache_path(path, cache_dir, suffix)
+    t = p.new(basename=p.basename + '.{}'.format(os.getpid()))
+    try:
+        pkio.mkdir_parent_only(p)
+        with open(str(t), 'wb') as o:
+            numpy.savez(o, source=numpy.array(source), **arrays)
+        t.rename(p)
+    except Exception as e:
+        pkdlog('{}: cache error={}', p, e)
+        pkio.unchecked_remove(t)
+
+
 def parameter_plot(x, plots, model, plot_fields=None, plot_colors=None):
+    """Line plots of plots' points against x
+
+    x and points may be lists or numpy arrays. Plots with more than
+    cfg.plot_max_points are downsampled, keeping the min and max of
+    each plot in every bucket of points.
+    """
+    i = _downsample_indices(x, plots, cfg.plot_max_points)
+    if i is not None:
+        x = numpy.asarray(x)[i]
+        for p in plots:
+            p['points'] = numpy.asarray(p['points'])[i]
+    a = numpy.asarray(x)
+    if not len(a):
+        r = [0, 0]
+    elif a.dtype.kind in _NUMERIC_KINDS:
+        r = [a.min().item(), a.max().item()]
+        # not compacted, because x may have a large offset (e.g. epoch times)
+        x = a.tolist()
+    else:
+        r = [min(x), max(x)]
+        if i is not None:
+            x = x.tolist()
     res = PKDict(
         x_points=x,
-        x_range=[min(x), max(x)] if len(x) else [0, 0],
+        x_range=r,
         plots=plots,
         y_range=compute_plot_color_and_range(plots, plot_colors),
     )
@@ -343,6 +639,30 @@ def parse_enums(enum_schema):
     return res
 
 
+def read_appended(path, offset):
+    """Read complete lines appended to path since offset
+
+    Used by templates' background_percent_complete_incremental so logs
+    of running simulations aren't reparsed from the start. A partial
+    last line is left for the next call. If the file was truncated,
+    reads from the beginning.
+
+    Args:
+        path (py.path): file written by the simulation
+        offset (int): returned by the previous call (0 initially)
+    Returns:
+        (str, int): text ending in newline (or empty) and new offset
+    """
+    with open(str(path), 'rb') as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < offset:
+            offset = 0
+        f.seek(offset)
+        b = f.read()
+    i = b.rfind(b'\n') + 1
+    return b[:i].decode('utf-8', errors='replace'), offset + i
+
+
 def render_jinja(sim_type, v, name=PARAMETERS_PYTHON_FILE):
     """Render the values into a jinja template.
 
@@ -475,10 +795,84 @@ def subprocess_output(cmd, env):
     return ''
 
 
+def _downsample_indices(x, plots, max_points):
+    """Indices of the min and max of each plot in each bucket
+
+    Returns:
+        numpy.ndarray: sorted indices or None if no downsampling
+    """
+    n = len(x)
+    if not max_points or n <= max_points or not plots:
+        return None
+    y = []
+    for p in plots:
+        v = numpy.asarray(p['points'])
+        if len(v) != n or v.dtype.kind not in _NUMERIC_KINDS:
+            return None
+        y.append(v)
+    # each bucket contributes a min and max for each plot
+    b = max(1, max_points // (2 * len(y)))
+    k = -(-n // b)
+    f = (n // k) * k
+    o = numpy.arange(0, f, k)
+    res = [numpy.array([0, n - 1])]
+    for v in y:
+        if f:
+            r = v[:f].reshape(-1, k)
+            res.extend((o + r.argmin(axis=1), o + r.argmax(axis=1)))
+        if f < n:
+            res.append(numpy.array([f + v[f:].argmin(), f + v[f:].argmax()]))
+    return numpy.unique(numpy.concatenate(res))
+
+
 def _escape(v):
     return re.sub("[\"'()]", '', str(v))
 
 
+def _frame_buffer_array(value, dtype):
+    if isinstance(value, list) and (
+        not value
+        or isinstance(value[0], bool)
+        or not isinstance(value[0], (float, int, list))
+    ):
+        return None
+    if not isinstance(value, (list, numpy.ndarray)):
+        return None
+    try:
+        with numpy.errstate(over='ignore'):
+            a = numpy.asarray(value, dtype=dtype)
+    except (TypeError, ValueError):
+        return None
+    # non-finite values (and float32 overflows) stay in the header
+    if a.size < _FRAME_BUFFER_MIN_LEN or a.ndim > 2 or not numpy.isfinite(a).all():
+        return None
+    return a
+
+
+def _frame_buffers(value, buffers, field, float32):
+    """Replace numeric lists in value with references to buffers"""
+    if isinstance(value, dict):
+        return PKDict(
+            (k, _frame_buffers(v, buffers, k, float32))
+            for k, v in value.items()
+        )
+    if field in _FRAME_BUFFER_FIELDS:
+        t = '<f4' if float32 and field not in _FRAME_FLOAT64_FIELDS else '<f8'
+        a = _frame_buffer_array(value, t)
+        if a is not None:
+            res = PKDict({
+                _FRAME_BUFFER: [sum(len(x) for x in buffers), list(a.shape), t],
+            })
+            a = a.tobytes()
+            buffers.append(a + b'\0' * (-len(a) % 8))
+            return res
+    if isinstance(value, numpy.ndarray):
+        value = value.tolist()
+    if isinstance(value, list):
+        return [_frame_buffers(v, buffers, None, float32) for v in value]
+    return value
+
+
 def _get_notes(data):
     notes = []
     for key in data.keys():
@@ -491,7 +885,23 @@ def _get_notes(data):
     return sorted(notes, key=lambda n: n[0])
 
 
+def _npz_cache_path(path, cache_dir, suffix):
+    p = pkio.py_path(path)
+    return p.dirpath(cache_dir).join(p.basename + suffix + '.npz')
+
+
 def _plot_range(report, axis):
     half_size = float(report['{}Size'.format(axis)]) / 2.0
     midpoint = float(report['{}Offset'.format(axis)])
     return [midpoint - half_size, midpoint + half_size]
+
+
+def _init():
+    global cfg
+
+    cfg = pkconfig.init(
+        plot_max_points=(20000, int, 'downsample line plots with more points (0 is never)'),
+    )
+
+
+_init()
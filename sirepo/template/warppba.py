@@ -5,16 +5,12 @@ u"""WARP execution template.
 :license: http://www.apache.org/licenses/LICENSE-2.0.html
 """
 from __future__ import absolute_import, division, print_function
-from opmd_viewer import OpenPMDTimeSeries
-from opmd_viewer.openpmd_timeseries import main
-from opmd_viewer.openpmd_timeseries.data_reader import field_reader
 from pykern import pkcollections
 from pykern import pkio
 from pykern.pkcollections import PKDict
 from pykern.pkdebug import pkdc, pkdp
 from sirepo import simulation_db
 from sirepo.template import template_common
-import h5py
 import numpy
 import os
 import os.path
@@ -29,6 +25,8 @@ WANT_BROWSER_FRAME_CACHE = True
 
 
 def background_percent_complete(report, run_dir, is_running):
+    from opmd_viewer.openpmd_timeseries.data_reader import field_reader
+
     files = _h5_file_list(run_dir)
     if len(files) < 2:
         return PKDict(
@@ -89,6 +87,9 @@ def extract_field_report(field, coordinate, mode, data_file):
 
 
 def extract_particle_report(frame_args, particle_type):
+    from opmd_viewer.openpmd_timeseries import main
+    import h5py
+
     data_file = open_data_file(frame_args.run_dir, frame_args.frameIndex)
     xarg = frame_args.x
     yarg = frame_args.y
@@ -267,6 +268,8 @@ def write_parameters(data, run_dir, is_parallel):
 
 
 def _adjust_z_width(data_list, data_file):
+    from opmd_viewer.openpmd_timeseries.data_reader import field_reader
+
     # match boundaries with field report
     Fr, info = field_reader.read_field_circ(data_file.filename, 'E/r')
     extent = info.imshow_extent
@@ -290,6 +293,9 @@ def _iteration_title(opmd, data_file):
 
 
 def _opmd_time_series(data_file):
+    from opmd_viewer import OpenPMDTimeSeries
+    from opmd_viewer.openpmd_timeseries import main
+
     prev = None
     try:
         prev = main.list_h5_files
@@ -10,12 +10,8 @@ from pykern import pkcollections
 from pykern import pkio
 from pykern.pkcollections import PKDict
 from pykern.pkdebug import pkdc, pkdp, pkdlog
-from rswarp.cathode import sources
-from rswarp.utilities.file_utils import readparticles
-from scipy import constants
 from sirepo import simulation_db
 from sirepo.template import template_common
-import h5py
 import numpy as np
 import os.path
 import py.path
@@ -106,6 +102,8 @@ sim_frame_particle3d = sim_frame_particleAnimation
 
 
 def generate_field_comparison_report(data, run_dir, args=None):
+    import h5py
+
     params = args if args is not None else data['models']['fieldComparisonAnimation']
     grid = data['models']['simulationGrid']
     dimension = params['dimension']
@@ -136,6 +134,7 @@ def generate_field_comparison_report(data, run_dir, args=None):
 
 
 def generate_field_report(data, run_dir, args=None):
+    import h5py
 
     grid = data.models.simulationGrid
     axes, slice_axis, phi_slice, show3d = _field_input(args)
@@ -215,6 +214,8 @@ def get_zcurrent_new(particle_array, momenta, mesh, particle_weight, dz):
     particle_weight: Weight from Warp
     dz: Cell Size
     """
+    from scipy import constants
+
     current = np.zeros_like(mesh)
     velocity = constants.c * momenta / np.sqrt(momenta**2 + (constants.electron_mass * constants.c)**2) * particle_weight
 
@@ -439,6 +440,9 @@ def _cull_particle_point(curr, next, prev):
 
 
 def _extract_current(data, data_file):
+    from rswarp.utilities.file_utils import readparticles
+    import h5py
+
     grid = data['models']['simulationGrid']
     plate_spacing = _meters(grid['plate_spacing'])
     dz = plate_spacing / grid['num_z']
@@ -452,6 +456,8 @@ def _extract_current(data, data_file):
 
 
 def _extract_current_results(data, curr, data_time):
+    from rswarp.cathode import sources
+
     grid = data['models']['simulationGrid']
     plate_spacing = _meters(grid['plate_spacing'])
     zmesh = np.linspace(0, plate_spacing, grid['num_z'] + 1) #holds the z-axis grid points in an array
@@ -494,6 +500,8 @@ def _extract_egun_current(data, data_file, frame_index):
 
 
 def _extract_field(field, data, data_file, args=None):
+    import h5py
+
     grid = data.models.simulationGrid
     axes, slice_axis, field_slice, show3d = _field_input(args)
 
@@ -533,6 +541,8 @@ def _extract_field(field, data, data_file, args=None):
 
 
 def _extract_impact_density(run_dir, data):
+    import h5py
+
     try:
         with h5py.File(str(run_dir.join(_DENSITY_FILE)), 'r') as hf:
             plot_info = template_common.h5_to_dict(hf, path='density')
@@ -632,6 +642,8 @@ def _extract_optimization_results(run_dir, data, args):
 
 
 def _extract_particle(run_dir, model_name, data, args):
+    import h5py
+
     limit = int(args.renderCount)
     hf = h5py.File(str(run_dir.join(_PARTICLE_FILE)), 'r')
     d = template_common.h5_to_dict(hf, 'particle')
@@ -1089,6 +1101,8 @@ def _stl_polygon_file(filename):
 
 
 def _save_stl_polys(data):
+    import h5py
+
     try:
         with h5py.File(str(_SIM_DATA.lib_file_write_path(_stl_polygon_file(data.file)))) as hf:
             template_common.dict_to_h5(data, hf, path='/')
@@ -6,6 +6,7 @@ u"""Webcon execution template.
 """
 from __future__ import absolute_import, division, print_function
 from pykern import pkcollections
+from pykern import pkconfig
 from pykern import pkio
 from pykern import pkjinja
 from pykern.pkcollections import PKDict
@@ -20,18 +21,11 @@ import math
 import numpy as np
 import os
 import os.path
+import py.path
 import random
 import re
-import scipy.fftpack
-import scipy.optimize
-import scipy.signal
 import sirepo.sim_data
 import sirepo.util
-import sklearn.cluster
-import sklearn.metrics.pairwise
-import sklearn.mixture
-import sklearn.preprocessing
-import sympy
 
 _SIM_DATA, SIM_TYPE, _SCHEMA = sirepo.sim_data.template_globals()
 
@@ -73,6 +67,12 @@ _DIM_PLOT_COLORS = [
     '#9400d3'
 ]
 
+#: sidecar directory, next to the monitor log, of values already parsed
+_MONITOR_CACHE_DIR = '.monitor-log'
+
+#: bytes at the start of the monitor log which identify the file
+_MONITOR_HEAD_SIZE = 128
+
 _MONITOR_TO_MODEL_FIELDS = pkcollections.Dict()
 
 _SCHEMA = simulation_db.get_schema(SIM_TYPE)
@@ -113,7 +113,9 @@ def background_percent_complete(report, run_dir, is_running):
         #pkdlog('background_percent_complete for correctorSettingAnimation')
         monitor_file = run_dir.join(MONITOR_LOGFILE)
         if monitor_file.exists():
-            values, count, start_time = _read_monitor_file(monitor_file, True)
+            # latest values only, because this is polled and the history
+            # is plotted by get_settings_report
+            values, count, start_time = _read_monitor_file(monitor_file)
             return PKDict(
                 percentComplete=0,
                 frameCount=count,
@@ -238,6 +240,9 @@ def get_data_file(run_dir, model, frame, options=None, **kwargs):
 
 
 def get_fft(run_dir, data):
+    import scipy.fftpack
+    import scipy.signal
+
     data.report = _SIM_DATA.webcon_analysis_report_name_for_fft(data)
     report, col_info, plot_data = _report_info(run_dir, data)
     col1 = _safe_index(col_info, report.x)
@@ -399,6 +404,8 @@ def validate_file(file_type, path):
 
 
 def validate_sympy(str):
+    import sympy
+
     try:
         sympy.sympify(str)
         return True
@@ -614,6 +621,11 @@ def _column_info(path):
 
 
 def _compute_clusters(report, plot_data, col_info):
+    import sklearn.cluster
+    import sklearn.metrics.pairwise
+    import sklearn.mixture
+    import sklearn.preprocessing
+
     cols = []
     if 'clusterFields' not in report:
         if len(cols) <= 1:
@@ -698,6 +710,9 @@ def _epics_dir(sim_id):
 
 
 def _fit_to_equation(x, y, equation, var, params):
+    import scipy.optimize
+    import sympy
+
     # TODO: must sanitize input - sympy uses eval
 
     # These security measures taken so far:
@@ -873,6 +888,45 @@ def _load_file_with_history(report, path, col_info):
     return res
 
 
+def _monitor_cache_read(path):
+    c = template_common.npz_cache_read(path, _MONITOR_CACHE_DIR)
+    if not c:
+        return None
+    return PKDict(
+        count=int(c.meta[0]),
+        head=c.head.tobytes(),
+        history=PKDict(
+            (n, PKDict(times=c['t_{}'.format(i)], vals=c['v_{}'.format(i)]))
+            for i, n in enumerate(c.names.tolist())
+        ),
+        offset=int(c.meta[1]),
+        start_time=None if np.isnan(c.meta[2]) else c.meta[2],
+    )
+
+
+def _monitor_cache_write(path, source, monitor_log):
+    n = list(monitor_log.history.keys())
+    a = PKDict()
+    for i, k in enumerate(n):
+        a['t_{}'.format(i)] = monitor_log.history[k].times
+        a['v_{}'.format(i)] = monitor_log.history[k].vals
+    template_common.npz_cache_write(
+        path,
+        _MONITOR_CACHE_DIR,
+        source,
+        PKDict(
+            head=np.frombuffer(monitor_log.head, dtype=np.uint8),
+            meta=np.array([
+                monitor_log.count,
+                monitor_log.offset,
+                np.nan if monitor_log.start_time is None else monitor_log.start_time,
+            ]),
+            names=np.array(n, dtype=str),
+            **a
+        ),
+    )
+
+
 def _monitor_data_for_plots(data, history, start_time, type):
     m_data = PKDict()
     _build_monitor_to_model_fields(data)
@@ -886,14 +940,11 @@ def _monitor_data_for_plots(data, history, start_time, type):
             m_data[el_name] = PKDict()
         el_setting = s_map.setting
         h = history[mon_setting]
-        t_deltas = [
-            round(((dt.days * 86400) + dt.seconds + (dt.microseconds / 1000000))) for dt in
-            [t - start_time for t in h.times]
-        ]
+        t_deltas = np.round(h.times - start_time)
         pos = np.full(len(t_deltas), _position_of_element(data, el['_id']))
         m_data[el_name][el_setting] = PKDict(
-            vals=h.vals,
-            times=t_deltas,
+            vals=h.vals.tolist(),
+            times=t_deltas.tolist(),
             position=pos.tolist()
         )
     return m_data
@@ -925,34 +976,71 @@ def _read_epics_kickers(data):
 
 
 def _read_monitor_file(monitor_path, history=False):
+    m = _read_monitor_log(monitor_path)
+    if history:
+        return m.history, m.count, m.start_time
+    return PKDict(
+        (k, float(v.vals[-1])) for k, v in m.history.items()
+    ), m.count, m.start_time
+
+
+def _read_monitor_log(monitor_path):
+    """Parse lines appended to the monitor log since the last call
+
+    The parsed values and the byte offset of the next unread line are
+    saved in a sidecar so each call only reads the tail of the log.
+
+    Returns:
+        PKDict: count of values, start_time (epoch seconds), and history
+            of times and vals arrays by variable, the most recent
+            cfg.monitor_history_max of each
+    """
     from datetime import datetime
-    monitor_values = PKDict()
-    count = 0
-    min_time = datetime.max
-    #TODO(pjm): currently reading entire file to get list of current values (most recent at bottom)
-    for line in pkio.read_text(str(monitor_path)).split("\n"):
-        m = re.match(r'(\S+)(.*?)\s([\d\.\e\-\+]+)\s*$', line)
+
+    p = py.path.local(monitor_path)
+    source = template_common.npz_cache_source(p)
+    size = source[1]
+    with open(str(p), 'rb') as f:
+        head = f.read(_MONITOR_HEAD_SIZE)
+        res = _monitor_cache_read(p)
+        if not res or size < res.offset or not head.startswith(res.head):
+            # new or rewritten file
+            res = PKDict(count=0, head=b'', history=PKDict(), offset=0, start_time=None)
+        f.seek(res.offset)
+        b = f.read(size - res.offset)
+    # a partial last line is read on the next call
+    n = b.rfind(b'\n') + 1
+    if not n:
+        return res
+    res.offset += n
+    res.head = head
+    e = datetime(1970, 1, 1)
+    new = PKDict()
+    for line in b[:n].decode('utf-8').split('\n'):
+        m = re.match(r'(\S+)(.*?)\s([\d\.e\-\+]+)\s*$', line)
         if not m:
             continue
-        var_name = m.group(1)
-        timestamp = m.group(2)
-        t = datetime.strptime(timestamp.strip(), '%Y-%m-%d %H:%M:%S.%f')
-        min_time = min(min_time, t)
-        var_value = m.group(3)
-        var_name = re.sub(r'^sr_epics:', '', var_name)
+        var_name = re.sub(r'^sr_epics:', '', m.group(1))
         var_name = re.sub(r':', '_', var_name)
-        if not history:
-            monitor_values[var_name] = float(var_value)
-        else:
-            if var_name not in monitor_values:
-                monitor_values[var_name] = PKDict(
-                    vals=[],
-                    times=[]
-                )
-            monitor_values[var_name].vals.append(float(var_value))
-            monitor_values[var_name].times.append(t)
-        count += 1
-    return monitor_values, count, min_time
+        t = (datetime.strptime(m.group(2).strip(), '%Y-%m-%d %H:%M:%S.%f') - e).total_seconds()
+        if res.start_time is None or t < res.start_time:
+            res.start_time = t
+        v = new.setdefault(var_name, PKDict(times=[], vals=[]))
+        v.times.append(t)
+        v.vals.append(float(m.group(3)))
+        res.count += 1
+    for k, v in new.items():
+        h = res.history.get(k)
+        for f in ('times', 'vals'):
+            a = np.array(v[f])
+            if h:
+                a = np.concatenate((h[f], a))
+            if cfg.monitor_history_max:
+                a = a[-cfg.monitor_history_max:]
+            v[f] = a
+        res.history[k] = v
+    _monitor_cache_write(p, source, res)
+    return res
 
 
 def _report_info(run_dir, data):
@@ -1082,3 +1170,14 @@ def _update_epics_kicker(data):
 
 def _validate_eq_var(val):
     return len(val) == 1 and re.match(r'^[a-zA-Z]+$', val)
+
+
+def _init():
+    global cfg
+
+    cfg = pkconfig.init(
+        monitor_history_max=(10000, int, 'most recent monitor log values kept per variable (0 is all)'),
+    )
+
+
+_init()
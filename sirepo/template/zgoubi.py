@@ -8,7 +8,7 @@ from __future__ import absolute_import, division, print_function
 from pykern import pkio
 from pykern import pkjinja
 from pykern.pkcollections import PKDict
-from pykern.pkdebug import pkdc, pkdp
+from pykern.pkdebug import pkdc, pkdlog, pkdp
 from sirepo import simulation_db
 from sirepo.template import lattice, template_common, zgoubi_importer, zgoubi_parser
 import copy
@@ -33,6 +33,13 @@ TUNES_INPUT_FILE = 'tunesFromFai.In'
 
 ZGOUBI_LOG_FILE = 'sr_zgoubi.log'
 
+#: in-process cache of parsed zgoubi.fai and zgoubi.plt columns by path
+_COLUMN_CACHE = PKDict()
+
+_COLUMN_CACHE_DIR = '.zgoubi-columns'
+
+_COLUMN_CACHE_MAX = 2
+
 _ELEMENT_NAME_MAP = {
     'FFAG': 'FFA',
     'FFAG-SPI': 'FFA-SPI',
@@ -41,6 +48,9 @@ _ELEMENT_NAME_MAP = {
 #TODO(pjm): could be determined from schema ParticleSelector enum
 _MAX_FILTER_PLOT_PARTICLES = 10
 
+#: text columns which may hold numeric looking values
+_STRING_COLUMNS = ('KLEY', 'LABEL1', 'LABEL2')
+
 _TUNES_FILE = 'tunesFromFai_spctra.Out'
 
 _ZGOUBI_COMMAND_FILE = 'zgoubi.dat'
@@ -452,9 +462,7 @@ def prepare_output_file(run_dir, data):
 def read_frame_count(run_dir):
     data_file = run_dir.join(_ZGOUBI_FAI_DATA_FILE)
     if data_file.exists():
-        col_names, rows = _read_data_file(data_file)
-        ipasses = _ipasses_for_data(col_names, rows)
-        return len(ipasses) + 1
+        return len(_read_columns(data_file).ipass_index) + 1
     return 0
 
 
@@ -501,8 +509,12 @@ def save_report_data(data, run_dir):
         }
     elif 'bunchReport' in report_name:
         report = data['models'][report_name]
-        col_names, rows = _read_data_file(py.path.local(run_dir).join(_ZGOUBI_FAI_DATA_FILE))
-        res = _extract_heatmap_data(report, col_names, rows, '')
+        res = _extract_heatmap_data(
+            report,
+            _read_columns(py.path.local(run_dir).join(_ZGOUBI_FAI_DATA_FILE)),
+            slice(None),
+            '',
+        )
         summary_file = py.path.local(run_dir).join(BUNCH_SUMMARY_FILE)
         if summary_file.exists():
             res['summaryData'] = {
@@ -537,44 +549,52 @@ def write_parameters(data, run_dir, is_parallel, python_file=template_common.PAR
                         z.extract(info, str(run_dir))
 
 
+def _column_cache_read(path, source):
+    c = template_common.npz_cache_read(path, _COLUMN_CACHE_DIR, source=source)
+    if not c:
+        return None
+    return PKDict(
+        columns=PKDict((n, c['c_' + n]) for n in c.col_names.tolist()),
+        ipass_index=[tuple(v) for v in c.ipass_index.tolist()],
+        row_order=c.row_order,
+    )
+
+
+def _column_cache_write(path, source, data):
+    template_common.npz_cache_write(
+        path,
+        _COLUMN_CACHE_DIR,
+        source,
+        PKDict(
+            col_names=np.array(list(data.columns.keys())),
+            ipass_index=np.array(data.ipass_index, dtype=int).reshape(-1, 3),
+            row_order=data.row_order,
+            **PKDict(('c_' + n, v) for n, v in data.columns.items())
+        ),
+    )
+
+
 def _compute_range_across_frames(run_dir, data):
     res = {}
     for v in _SCHEMA.enum.PhaseSpaceCoordinate:
         res[v[0]] = []
     for v in _SCHEMA.enum.EnergyPlotVariable:
         res[v[0]] = []
-    col_names, rows = _read_data_file(py.path.local(run_dir).join(_ZGOUBI_FAI_DATA_FILE))
-    for field in res:
-        values = column_data(field, col_names, rows)
+    c = _read_columns(py.path.local(run_dir).join(_ZGOUBI_FAI_DATA_FILE)).columns
+    for field in list(res.keys()):
+        values = [c[field]]
         initial_field = _initial_phase_field(field)
-        if initial_field in col_names:
-            values += column_data(initial_field, col_names, rows)
-        if len(res[field]):
-            res[field][0] = min(min(values), res[field][0])
-            res[field][1] = max(max(values), res[field][1])
-        else:
-            res[field] = [min(values), max(values)]
-    for field in res.keys():
+        if initial_field in c:
+            values.append(c[initial_field])
         factor = _ANIMATION_FIELD_INFO[field][1]
-        res[field][0] *= factor
-        res[field][1] *= factor
-        res[_initial_phase_field(field)] = res[field]
+        res[field] = [
+            float(min(np.min(v) for v in values)) * factor,
+            float(max(np.max(v) for v in values)) * factor,
+        ]
+        res[initial_field] = res[field]
     return res
 
 
-def _2d_range(rows):
-    # returns min, max from a set of 2d data
-    # the rows may have an uneven shape, this works when np.amin(), np.amax() doesn't
-    vmax = vmin = rows[0][0]
-    for row in rows:
-        for v in row:
-            if v > vmax:
-                vmax = v
-            elif v < vmin:
-                vmin = v
-    return [vmin, vmax]
-
-
 def _extract_animation(frame_args):
     r = frame_args.frameReport
     frame_index = frame_args.frameIndex
@@ -593,30 +613,17 @@ def _extract_animation(frame_args):
                 frame_args[f] = _initial_phase_field(frame_args[f])
             frame_index = 1
     model.update(frame_args)
-    if r == 'elementStepAnimation':
-        col_names, all_rows = _read_data_file(frame_args.run_dir.join(_ZGOUBI_PLT_DATA_FILE))
-    else:
-        col_names, all_rows = _read_data_file(frame_args.run_dir.join(_ZGOUBI_FAI_DATA_FILE))
-    ipasses = _ipasses_for_data(col_names, all_rows)
-    ipass = int(ipasses[frame_index - 1])
-    rows = []
-    ipass_index = int(col_names.index('IPASS'))
-    it_index = int(col_names.index('IT'))
+    d = _read_columns(frame_args.run_dir.join(
+        _ZGOUBI_PLT_DATA_FILE if r == 'elementStepAnimation' else _ZGOUBI_FAI_DATA_FILE,
+    ))
+    ipass, start, end = d.ipass_index[frame_index - 1]
     it_filter = None
     if _particle_count(frame_args.sim_in) <= _MAX_FILTER_PLOT_PARTICLES:
         if frame_args.particleSelector != 'all':
             it_filter = frame_args.particleSelector
-
-    count = 0
-    el_names = []
-    for row in all_rows:
-        if frame_args.showAllFrames == '1':
-            if it_filter and row[it_index] != it_filter:
-                continue
-            rows.append(row)
-        elif int(row[ipass_index]) == ipass:
-            rows.append(row)
     if frame_args.showAllFrames == '1':
+        rows = np.flatnonzero(d.columns.IT == float(it_filter)) if it_filter \
+            else slice(None)
         title = 'All Frames'
         if it_filter:
             title += ', Particle {}'.format(it_filter)
@@ -624,97 +631,87 @@ def _extract_animation(frame_args):
             # unset 'fit' plot - all frames are shown
             model.plotRangeType = 'none'
     else:
+        rows = d.row_order[start:end]
         title = 'Initial Distribution' if is_frame_0 else 'Pass {}'.format(ipass)
     if frame_args.get('plotType') == 'particle':
-        return _extract_particle_data(model, col_names, rows, title)
-    return _extract_heatmap_data(model, col_names, rows, title)
+        return _extract_particle_data(model, d, rows, title)
+    return _extract_heatmap_data(model, d, rows, title)
 
 
-def _extract_heatmap_data(report, col_names, rows, title):
+def _extract_heatmap_data(report, data, rows, title):
     x_info = _ANIMATION_FIELD_INFO[report['x']]
     y_info = _ANIMATION_FIELD_INFO[report['y']]
-    x = np.array(column_data(report['x'], col_names, rows)) * x_info[1]
-    y = np.array(column_data(report['y'], col_names, rows)) * y_info[1]
-    return template_common.heatmap([x, y], report, {
-        'x_label': x_info[0],
-        'y_label': y_info[0],
-        'title': title,
-        'z_label': 'Number of Particles',
-    })
+    return template_common.heatmap(
+        [
+            data.columns[report['x']][rows] * x_info[1],
+            data.columns[report['y']][rows] * y_info[1],
+        ],
+        report,
+        {
+            'x_label': x_info[0],
+            'y_label': y_info[0],
+            'title': title,
+            'z_label': 'Number of Particles',
+        },
+    )
 
 
-def _extract_particle_data(report, col_names, rows, title):
+def _extract_particle_data(report, data, rows, title):
     x_info = _ANIMATION_FIELD_INFO[report['x']]
     y_info = _ANIMATION_FIELD_INFO[report['y']]
-    x = np.array(column_data(report['x'], col_names, rows)) * x_info[1]
-    y = np.array(column_data(report['y'], col_names, rows)) * y_info[1]
-    it = column_data('IT', col_names, rows)
-    x_points = []
-    points = []
-    if 'ENEKI' in col_names:
-        # zgoubi.fai
-        points_by_num = {}
-        for idx in range(len(x)):
-            num = it[idx];
-            if num not in points_by_num:
-                points_by_num[num] = [[], []]
-            points_by_num[num][0].append(x[idx])
-            points_by_num[num][1].append(y[idx])
-        for num in points_by_num:
-            x_points.append(points_by_num[num][0])
-            points.append(points_by_num[num][1])
+    c = data.columns
+    x = c[report['x']][rows] * x_info[1]
+    y = c[report['y']][rows] * y_info[1]
+    it = c.IT[rows]
+    if 'ENEKI' in c:
+        # zgoubi.fai, one line per particle in order of first appearance
+        u, first, inverse = np.unique(it, return_index=True, return_inverse=True)
+        order = np.argsort(inverse, kind='mergesort')
+        splits = np.cumsum(np.bincount(inverse))[:-1]
+        groups = np.argsort(np.argsort(first))
+        x_points = [None] * len(u)
+        points = [None] * len(u)
+        for g, xs, ys in zip(groups, np.split(x[order], splits), np.split(y[order], splits)):
+            x_points[g] = xs.tolist()
+            points[g] = ys.tolist()
     else:
-        # zgoubi.plt
-        kley_index = col_names.index('KLEY')
-        label_index = col_names.index('LABEL1')
-        ipass_index = col_names.index('IPASS')
+        # zgoubi.plt, a new line when the particle or pass changes
+        ipass = c.IPASS[rows]
+        splits = np.flatnonzero((it[1:] != it[:-1]) | (ipass[1:] != ipass[:-1])) + 1
+        kley = c.KLEY[rows]
+        label = c.LABEL1[rows]
         names = []
-        current_it = None
-        current_ipass = None
-        for idx in range(len(x)):
-            ipass = rows[idx][ipass_index]
-            if current_it != it[idx] or current_ipass != ipass:
-                el_type = re.sub(r'\'', '', rows[idx][kley_index])
-                name = _ELEMENT_NAME_MAP.get(el_type, el_type) + ' ' + rows[idx][label_index]
-                if name not in names:
-                    names.append(name)
-                current_it = it[idx]
-                current_ipass = ipass
-                x_points.append([])
-                points.append([])
-            x_points[-1].append(x[idx])
-            points[-1].append(y[idx])
+        for i in np.concatenate(([0], splits)) if len(it) else []:
+            el_type = re.sub(r'\'', '', kley[i])
+            name = _ELEMENT_NAME_MAP.get(el_type, el_type) + ' ' + label[i]
+            if name not in names:
+                names.append(name)
+        x_points = [v.tolist() for v in np.split(x, splits)]
+        points = [v.tolist() for v in np.split(y, splits)]
         title += ' ' + ', '.join(names)
     return {
         'title': title,
         'y_label': y_info[0],
         'x_label': x_info[0],
-        'x_range': _2d_range(x_points),
-        'y_range': _2d_range(points),
+        'x_range': [float(np.min(x)), float(np.max(x))],
+        'y_range': [float(np.min(y)), float(np.max(y))],
         'x_points': x_points,
         'points': points,
     }
 
 
 def _extract_spin_3d(frame_args):
-    col_names, all_rows = _read_data_file(frame_args.run_dir.join(_ZGOUBI_FAI_DATA_FILE))
-    x_idx = col_names.index('SX')
-    y_idx = col_names.index('SY')
-    z_idx = col_names.index('SZ')
-    points = []
-    it_idx = int(col_names.index('IT'))
+    c = _read_columns(frame_args.run_dir.join(_ZGOUBI_FAI_DATA_FILE)).columns
+    rows = slice(None)
     it_filter = None
     if frame_args.particleSelector != 'all':
         it_filter = frame_args.particleSelector
-    for row in all_rows:
-        if it_filter and it_filter != row[it_idx]:
-            continue
-        points.append(row[x_idx])
-        points.append(row[y_idx])
-        points.append(row[z_idx])
+        rows = c.IT == float(it_filter)
     return {
         'title': 'Particle {}'.format(it_filter) if it_filter else 'All Particles',
-        'points': points,
+        'points': np.column_stack(
+            [c.SX[rows], c.SY[rows], c.SZ[rows]],
+        ).ravel().tolist(),
     }
 
 
@@ -820,13 +817,28 @@ def _initial_phase_field(field):
     return _INITIAL_PHASE_MAP.get(field, '{}o'.format(field))
 
 
-def _ipasses_for_data(col_names, rows):
-    res = []
-    ipass_index = col_names.index('IPASS')
-    for row in rows:
-        ipass = row[ipass_index]
-        if ipass not in res:
-            res.append(ipass)
+def _parse_columns(path):
+    col_names, rows = _read_data_file(path)
+    res = PKDict(columns=PKDict())
+    for i, n in enumerate(col_names):
+        if not n:
+            continue
+        v = [r[i] if i < len(r) else '' for r in rows]
+        if n not in _STRING_COLUMNS:
+            try:
+                res.columns[n] = np.array(v, dtype=float)
+                continue
+            except ValueError:
+                pass
+        res.columns[n] = np.array(v)
+    ipass = res.columns.IPASS.astype(int) if 'IPASS' in res.columns \
+        else np.zeros(len(rows), dtype=int)
+    res.row_order = np.argsort(ipass, kind='mergesort')
+    u, start, count = np.unique(ipass[res.row_order], return_index=True, return_counts=True)
+    first = np.unique(ipass, return_index=True)[1]
+    res.ipass_index = [
+        (int(u[i]), int(start[i]), int(start[i] + count[i])) for i in np.argsort(first)
+    ]
     return res
 
 
@@ -910,7 +922,7 @@ def _read_data_file(path, mode='title'):
                 # header row starts with '# <letter>'
                 if re.search(r'^\s*#\s+[a-zA-Z]', line):
                     col_names = re.split('\s+', line)
-                    col_names = map(lambda x: re.sub(r'\W|_', '', x), col_names[1:])
+                    col_names = [re.sub(r'\W|_', '', x) for x in col_names[1:]]
                     mode = 'data'
             elif mode == 'data':
                 if re.search('^\s*#', line):
@@ -920,6 +932,31 @@ def _read_data_file(path, mode='title'):
     return col_names, rows
 
 
+def _read_columns(path):
+    """Typed columns of zgoubi.fai or zgoubi.plt
+
+    The text file is parsed once and saved as a numpy archive which is
+    reused while the file's mtime and size are unchanged.
+
+    Returns:
+        PKDict: columns (name to array), ipass_index (ipass, start, end)
+            into row_order in order of first appearance, and row_order
+    """
+    path = py.path.local(path)
+    k = str(path)
+    s = template_common.npz_cache_source(path)
+    if k in _COLUMN_CACHE and _COLUMN_CACHE[k][0] == s:
+        return _COLUMN_CACHE[k][1]
+    res = _column_cache_read(path, s)
+    if not res:
+        res = _parse_columns(path)
+        _column_cache_write(path, s, res)
+    if len(_COLUMN_CACHE) >= _COLUMN_CACHE_MAX:
+        _COLUMN_CACHE.clear()
+    _COLUMN_CACHE[k] = (s, res)
+    return res
+
+
 def _read_twiss_header(run_dir):
     path = py.path.local(run_dir).join(_ZGOUBI_TWISS_FILE)
     res = []
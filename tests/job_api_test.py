@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for :mod:`sirepo.job_api` requests to a fake supervisor
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern.pkcollections import PKDict
+import pytest
+
+
+def test_early_return(monkeypatch):
+    from pykern import pkunit
+    from sirepo import job
+    import requests
+
+    def api_runSimulation():
+        return job_api._request(_request_content=_content())
+
+    def api_runStatus():
+        return job_api._request(_request_content=_content())
+
+    with _Supervisor(monkeypatch, default=1, run_simulation=0.2) as s:
+        from sirepo import job_api
+
+        s.delay = 0.5
+        r = api_runSimulation()
+        pkunit.pkeq(job.PENDING, r.state)
+        pkunit.pkeq(
+            PKDict(
+                computeJobHash='h1',
+                report='animation',
+                simulationId='s1',
+                simulationType='srw',
+            ),
+            r.nextRequest,
+        )
+        pkunit.pkeq(job_api._PENDING_NEXT_REQUEST_SECONDS, r.nextRequestSeconds)
+        s.delay = 1.5
+        # other apis raise
+        with pkunit.pkexcept(requests.exceptions.ReadTimeout):
+            api_runStatus()
+        s.delay = 0
+        pkunit.pkeq('api_runSimulation', api_runSimulation().api)
+
+
+def test_unix_socket(monkeypatch):
+    from pykern import pkunit
+
+    def api_runStatus():
+        return job_api._request(_request_content=_content())
+
+    with _Supervisor(monkeypatch) as s:
+        from sirepo import job_api
+
+        for _ in range(3):
+            r = api_runStatus()
+            pkunit.pkeq('api_runStatus', r.api)
+            pkunit.pkeq('a secret', r.serverSecret)
+            pkunit.pkeq('/job-api-request', r.path)
+        # one keep-alive connection
+        pkunit.pkeq(1, s.connections)
+        # a forked process gets its own session
+        o = job_api._session()
+        job_api._session_cache.pid = -1
+        pkunit.pkok(o is not job_api._session(), 'session not recreated after fork')
+
+
+def _content():
+    return PKDict(
+        analysisModel='animation',
+        computeJobHash='h1',
+        simulationId='s1',
+        simulationType='srw',
+    )
+
+
+class _Supervisor(PKDict):
+    """Supervisor which replies on a unix socket with what it received
+
+    Args:
+        timeout_secs (dict): overrides job_api.cfg.timeout_secs
+    """
+
+    def __init__(self, monkeypatch, **timeout_secs):
+        super().__init__(
+            connections=0,
+            delay=0,
+            monkeypatch=monkeypatch,
+            timeout_secs=timeout_secs,
+        )
+
+    def __enter__(self):
+        from pykern import pkjson
+        from pykern import pkunit
+        from sirepo import job
+        from sirepo import job_api
+        import http.server
+        import socketserver
+        import threading
+        import time
+
+        s = self
+
+        class _Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def setup(self):
+                super().setup()
+                s.connections += 1
+
+            def do_POST(self):
+                r = pkjson.load_any(self.rfile.read(int(self.headers['Content-Length'])))
+                r.path = self.path
+                time.sleep(s.delay)
+                b = pkjson.dump_bytes(r)
+                try:
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(b)))
+                    self.end_headers()
+                    self.wfile.write(b)
+                except BrokenPipeError:
+                    # client timed out
+                    pass
+
+            def log_message(self, *args, **kwargs):
+                pass
+
+        p = str(pkunit.empty_work_dir().join('supervisor.sock'))
+        self.server = socketserver.ThreadingUnixStreamServer(p, _Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.monkeypatch.setattr(
+            job,
+            'cfg',
+            PKDict(
+                server_secret='a secret',
+                supervisor_unix_socket=p,
+                verify_tls=False,
+            ),
+        )
+        self.monkeypatch.setattr(
+            job_api,
+            'cfg',
+            PKDict(
+                connect_timeout_secs=1,
+                pool_size=2,
+                # host and port are not used with a unix socket
+                supervisor_uri='http://localhost:1',
+                timeout_secs=PKDict(default=0).pkupdate(self.timeout_secs),
+            ),
+        )
+        self.monkeypatch.setattr(job_api, '_session_cache', None)
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
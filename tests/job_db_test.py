@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for :mod:`sirepo.job_db`
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+import pytest
+
+
+def test_sqlite():
+    from pykern import pkunit
+    from pykern.pkunit import pkeq
+    from sirepo.job_db import jsonfile, sqlite
+
+    d = pkunit.empty_work_dir()
+    jsonfile.JsonFileDb(d).write(_db('j0', 'u1', 'srw', 'running'))
+    s = sqlite.SqliteDb(d)
+    pkeq('running', s.read('j0').status)
+    s.write_many(
+        _db('j{}'.format(i), 'u{}'.format(i % 2), 'srw', 'completed')
+        for i in range(1, 5)
+    )
+    pkeq(None, s.read('missing'))
+    pkeq(5, len(s.load_all()))
+    pkeq(['j1', 'j3'], sorted(x.computeJid for x in s.search(uid='u1', status='completed')))
+    s.write(s.read('j0').pkupdate(status='canceled'))
+    pkeq('canceled', sqlite.SqliteDb(d).read('j0').status)
+    with pkunit.pkexcept('invalid search'):
+        s.search(computeJobHash='x')
+
+
+def test_jsonfile():
+    from pykern import pkunit
+    from pykern.pkunit import pkeq
+    from sirepo.job_db import jsonfile
+
+    s = jsonfile.JsonFileDb(pkunit.empty_work_dir())
+    s.write_many((_db('j1', 'u1', 'srw', 'error'), _db('j2', 'u2', 'elegant', 'error')))
+    pkeq(None, s.read('missing'))
+    pkeq(['j2'], [x.computeJid for x in s.search(simulationType='elegant')])
+
+
+def _db(computeJid, uid, simulationType, status):
+    from pykern.pkcollections import PKDict
+
+    return PKDict(
+        computeJid=computeJid,
+        parallelStatus=PKDict(frameCount=1),
+        simulationType=simulationType,
+        status=status,
+        uid=uid,
+    )
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for :mod:`sirepo.job_driver` slots without agents
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+import pytest
+
+
+def test_destroy_op_yield():
+    from pykern import pkconfig
+
+    pkconfig.reset_state_for_testing()
+
+    from pykern.pkcollections import PKDict
+    from pykern.pkunit import pkeq, pkok
+    from sirepo import job
+    import asyncio
+    import sirepo.job_driver
+    import sirepo.job_scheduler
+    import sirepo.job_supervisor
+
+    def _op(driver, op_id):
+        res = PKDict(opId=op_id, opName=job.OP_RUN, op_slot=None)
+        driver.ops[op_id] = res
+        return res
+
+    async def _test():
+        sirepo.job_scheduler.init()
+        q = sirepo.job_scheduler.CpuSlotQ('test', job.SEQUENTIAL, 1)
+        a = sirepo.job_driver.DriverBase(
+            PKDict(kind=job.SEQUENTIAL, content=PKDict(uid='a')),
+        ).pkupdate(cpu_slot_q=q)
+        a1 = _op(a, 'a1')
+        a.cpu_slot = q.get_nowait(a, a1)
+        await a.op_ready(a1)
+        a2 = _op(a, 'a2')
+        w = asyncio.ensure_future(a.op_ready(a2))
+        await asyncio.sleep(0)
+        b = PKDict(uid='b')
+        f = asyncio.ensure_future(q.get(b, PKDict(opName=job.OP_RUN)))
+        await asyncio.sleep(0)
+        pkok(q.should_yield(a), 'b is waiting so a should yield')
+        a.destroy_op(a1)
+        # a2 was handed the op_slot so it will run
+        pkok(a.cpu_slot, 'a yielded cpu_slot to b while a2 has the op_slot')
+        with pytest.raises(sirepo.job_supervisor.Awaited):
+            await w
+        pkok(a2.op_slot, 'a2 has no op_slot')
+        pkok(not f.done(), 'b should wait for the cpu_slot')
+        a3 = _op(a, 'a3')
+        a.destroy_op(a2)
+        # a3 is queued, not running, so b gets the slot
+        pkeq(None, a.cpu_slot)
+        await asyncio.sleep(0)
+        pkok(f.done(), 'b should have the cpu_slot')
+        pkeq(0, a._op_slot_waiters)
+        q.put_nowait(b, f.result())
+
+    c = sirepo.job_driver.cfg
+    s = getattr(sirepo.job_driver, 'job_supervisor', None)
+    try:
+        sirepo.job_driver.cfg = PKDict(analysis_ops_per_agent=1)
+        sirepo.job_driver.job_supervisor = sirepo.job_supervisor
+        asyncio.get_event_loop().run_until_complete(_test())
+    finally:
+        sirepo.job_driver.cfg = c
+        sirepo.job_driver.job_supervisor = s
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for :mod:`sirepo.job_scheduler`
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+import pytest
+
+
+def test_fair_share():
+    from pykern import pkconfig
+
+    pkconfig.reset_state_for_testing()
+
+    from pykern.pkcollections import PKDict
+    from pykern.pkunit import pkeq, pkok
+    from sirepo import job
+    import asyncio
+    import sirepo.job_scheduler
+    import tornado.queues
+
+    async def _test():
+        sirepo.job_scheduler.init()
+        q = sirepo.job_scheduler.CpuSlotQ('test', job.SEQUENTIAL, 1)
+        a = PKDict(uid='a')
+        b = PKDict(uid='b')
+        r = PKDict(opName=job.OP_RUN)
+        s = q.get_nowait(a, r)
+        pkok(s, 'expecting slot')
+        # a had a long run so b has precedence, and analysis before runs
+        a._cpu_slot_alloc_time = 1
+        x = []
+        for d, o in (a, r), (b, r), (a, PKDict(opName=job.OP_ANALYSIS)):
+            x.append(asyncio.ensure_future(q.get(d, o)))
+        await asyncio.sleep(0)
+        pkeq(3, q.metrics().queueDepth)
+        pkok(q.should_yield(a), 'b is waiting so a should yield')
+        q.put_nowait(a, s)
+        await asyncio.sleep(0)
+        pkok(x[2].done() and not x[0].done(), 'expecting analysis op first')
+        q.put_nowait(a, x[2].result())
+        await asyncio.sleep(0)
+        pkok(x[1].done() and not x[0].done(), 'expecting b before a')
+        x[0].cancel()
+        await asyncio.sleep(0)
+        pkeq(0, q.metrics().queueDepth)
+        with pytest.raises(tornado.queues.QueueEmpty):
+            q.get_nowait(a, r)
+
+    asyncio.get_event_loop().run_until_complete(_test())
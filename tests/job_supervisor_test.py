@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for :mod:`sirepo.job_supervisor` without agents
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern.pkcollections import PKDict
+import pytest
+
+
+def test_db_write_behind(monkeypatch):
+    from pykern import pkunit
+    from sirepo import job
+    import sirepo.job_driver
+    import tornado.gen
+    import tornado.ioloop
+
+    async def terminate():
+        pass
+
+    monkeypatch.setattr(sirepo.job_driver, 'terminate', terminate)
+    s = _supervisor(db_write_behind_secs=0.1)
+    d = s._DB = _Db()
+
+    async def t():
+        j = s._ComputeJob(_req(), db=_db(job.RUNNING))
+        j._ComputeJob__db_write_behind()
+        j._ComputeJob__db_write_behind()
+        pkunit.pkeq([], d.writes)
+        await tornado.gen.sleep(0.2)
+        # deferred states are written in one batch
+        pkunit.pkeq([[j.db]], d.writes)
+        n = _db(job.RUNNING)
+
+        def fail():
+            # newer state deferred before the failed batch is restored
+            s._DB_PENDING[n.computeJid] = n
+            raise IOError('write_many failed')
+
+        d.on_write = fail
+        j._ComputeJob__db_write_behind()
+        await tornado.gen.sleep(0.2)
+        pkunit.pkeq(1, len(d.writes))
+        pkunit.pkeq([n], list(s._DB_PENDING.values()))
+        pkunit.pkok(s._DB_PENDING_TIMER, 'failed flush not rescheduled')
+        await tornado.gen.sleep(0.2)
+        pkunit.pkeq([n], d.writes[-1])
+        pkunit.pkeq(None, s._DB_PENDING_TIMER)
+        # shutdown flushes without waiting for the timer
+        j._ComputeJob__db_write_behind()
+        await s.terminate()
+        pkunit.pkeq([j.db], d.writes[-1])
+        pkunit.pkeq(PKDict(), s._DB_PENDING)
+        pkunit.pkeq(None, s._DB_PENDING_TIMER)
+        j.timer.cancel()
+
+    tornado.ioloop.IOLoop.current().run_sync(t)
+
+
+def test_frame_cache():
+    from pykern import pkjson
+    from pykern import pkunit
+    from sirepo import job
+
+    def r(i, **kwargs):
+        return PKDict(state=job.COMPLETED, points=[i] * 5).pkupdate(kwargs)
+
+    def a(i, **kwargs):
+        return PKDict(
+            computeJobHash='h1',
+            computeJobSerial=1,
+            frameIndex=i,
+            frameReport='animation',
+        ).pkupdate(kwargs)
+
+    n = len(pkjson.dump_bytes(r(0)))
+    # four replies fit
+    s = _supervisor(frame_cache_bytes=n * 4)
+    c = s._FRAME_CACHE
+    c.put_reply('j1', a(0), r(0))
+    # key is computeJid and frame args regardless of order
+    pkunit.pkeq(r(0), c.get_reply('j1', PKDict(reversed(list(a(0).items())))))
+    pkunit.pkeq(None, c.get_reply('j2', a(0)))
+    pkunit.pkeq(None, c.get_reply('j1', a(0, computeJobSerial=2)))
+    for i in range(1, 4):
+        c.put_reply('j1', a(i), r(i))
+    pkunit.pkeq(n * 4, c._bytes)
+    # least recently used is evicted
+    pkunit.pkeq(r(0), c.get_reply('j1', a(0)))
+    c.put_reply('j1', a(4), r(4))
+    pkunit.pkeq(None, c.get_reply('j1', a(1)))
+    pkunit.pkeq(r(0), c.get_reply('j1', a(0)))
+    c.put_reply('j2', a(0), r(9))
+    pkunit.pkeq(None, c.get_reply('j1', a(2)))
+    pkunit.pkeq(n * 4, c._bytes)
+    c.remove_jid('j1')
+    pkunit.pkeq(n, c._bytes)
+    pkunit.pkeq(['j2'], list(c._by_jid.keys()))
+    pkunit.pkeq(r(9), c.get_reply('j2', a(0)))
+    # not cached
+    c.put_reply('j1', a(0), r(0, state=job.ERROR))
+    c.put_reply('j1', a(1), r(1, error='x'))
+    c.put_reply('j1', a(2), PKDict(state=job.COMPLETED, points=list(range(n))))
+    pkunit.pkeq(n, c._bytes)
+    s._FRAME_CACHE = s._FrameCache(0)
+    s._FRAME_CACHE.put_reply('j1', a(0), r(0))
+    pkunit.pkeq(0, s._FRAME_CACHE._bytes)
+
+
+def test_frame_cache_invalidate(monkeypatch):
+    from pykern import pkunit
+    from sirepo import job
+    import tornado.ioloop
+
+    async def run(self, op):
+        pass
+
+    s = _supervisor()
+    monkeypatch.setattr(s, '_DB', _Db())
+    monkeypatch.setattr(
+        s,
+        '_NEXT_REQUEST_SECONDS',
+        PKDict({job.PARALLEL: 2, job.SEQUENTIAL: 1}),
+    )
+    monkeypatch.setattr(
+        s._ComputeJob,
+        '_create_op',
+        lambda self, *args, **kwargs: _Op(),
+    )
+    monkeypatch.setattr(s._ComputeJob, '_run', run)
+    c = s._FRAME_CACHE
+    f = PKDict(frameIndex=0, frameReport='animation')
+
+    def put():
+        for j in ('u1-s1-animation', 'u1-s2-animation'):
+            c.put_reply(j, f, PKDict(state=job.COMPLETED, jid=j))
+
+    async def t():
+        j = s._ComputeJob(_req(), db=_db(job.RUNNING))
+        put()
+        pkunit.pkeq(job.CANCELED, (await j._receive_api_runCancel(_req())).state)
+        pkunit.pkeq(None, c.get_reply('u1-s1-animation', f))
+        pkunit.pkeq('u1-s2-animation', c.get_reply('u1-s2-animation', f).jid)
+        put()
+        r = _req()
+        r.content.pkupdate(
+            computeJid='u1-s1-animation',
+            computeJobHash='h2',
+            computeJobSerial=0,
+            data=PKDict(),
+            isParallel=True,
+            jobRunMode=job.PARALLEL,
+            simulationId='s1',
+            simulationType='srw',
+            uid='u1',
+        )
+        pkunit.pkeq(job.PENDING, (await j._receive_api_runSimulation(r)).state)
+        pkunit.pkeq(None, c.get_reply('u1-s1-animation', f))
+        pkunit.pkeq('u1-s2-animation', c.get_reply('u1-s2-animation', f).jid)
+        j.timer.cancel()
+
+    tornado.ioloop.IOLoop.current().run_sync(t)
+
+
+def test_run_status_stream_ends():
+    from pykern import pkunit
+    from sirepo import job
+    import asyncio
+    import tornado.ioloop
+
+    s = _supervisor()
+
+    async def t(end_state, notify_in_flush):
+        h = _StreamHandler()
+        j = s._ComputeJob(_req(h), db=_db(job.RUNNING))
+
+        def change():
+            j.db.status = end_state
+            j._ComputeJob__status_notify()
+
+        if notify_in_flush:
+            # notified before the stream waits again
+            h.on_flush = change
+        else:
+            tornado.ioloop.IOLoop.current().call_later(0.1, change)
+        await asyncio.wait_for(j._receive_api_runStatusStream(_req(h)), 5)
+        j.timer.cancel()
+        return h.events()
+
+    for state in (job.COMPLETED, job.ERROR, job.CANCELED):
+        for f in (False, True):
+            e = tornado.ioloop.IOLoop.current().run_sync(lambda: t(state, f))
+            pkunit.pkeq([job.RUNNING, state], [x.state for x in e])
+
+
+class _Db(PKDict):
+
+    def __init__(self):
+        super().__init__(on_write=None, writes=[])
+
+    def write(self, db):
+        self.write_many([db])
+
+    def write_many(self, dbs):
+        f = self.on_write
+        self.on_write = None
+        if f:
+            f()
+        self.writes.append(list(dbs))
+
+
+class _Op(PKDict):
+    """Op which is sent nowhere"""
+
+    def __hash__(self):
+        return id(self)
+
+    def destroy(self, cancel=True):
+        pass
+
+    def make_lib_dir_symlink(self):
+        pass
+
+    async def prepare_send(self):
+        pass
+
+    def send(self):
+        pass
+
+
+class _StreamHandler(PKDict):
+
+    def __init__(self):
+        super().__init__(on_flush=None, written=[])
+
+    def events(self):
+        from pykern import pkjson
+
+        return [
+            pkjson.load_any(x[len(b'data: '):])
+            for x in b''.join(self.written).split(b'\n\n')
+            if x.startswith(b'data: ')
+        ]
+
+    async def flush(self):
+        f = self.on_flush
+        self.on_flush = None
+        if f:
+            f()
+
+    def set_header(self, name, value):
+        pass
+
+    def write(self, data):
+        self.written.append(data)
+
+
+def _db(status):
+    return PKDict(
+        computeJid='u1-s1-animation',
+        computeJobHash='h1',
+        computeJobSerial=1,
+        computeJobStart=1,
+        error=None,
+        history=[],
+        isParallel=True,
+        lastUpdateTime=2,
+        nextRequestSeconds=1,
+        parallelStatus=PKDict(frameCount=1),
+        simulationId='s1',
+        simulationType='srw',
+        status=status,
+    )
+
+
+def _req(handler=None):
+    return PKDict(
+        content=PKDict(
+            analysisModel='animation',
+            computeJobHash='h1',
+            computeJobSerial=1,
+        ),
+        handler=handler,
+    )
+
+
+def _supervisor(**kwargs):
+    from sirepo import job_supervisor
+
+    # init() needs agents and a db, which these tests don't use
+    job_supervisor.cfg = PKDict(
+        db_write_behind_secs=0,
+        frame_cache_bytes=1000,
+        job_cache_secs=300,
+        status_stream_keepalive_secs=60,
+    ).pkupdate(kwargs)
+    job_supervisor._FRAME_CACHE = job_supervisor._FrameCache(
+        job_supervisor.cfg.frame_cache_bytes,
+    )
+    job_supervisor._DB_PENDING.clear()
+    job_supervisor._DB_PENDING_TIMER = None
+    return job_supervisor
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+u"""test fastcgi workers of sirepo.pkcli.job_agent without processes
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern.pkcollections import PKDict
+import pytest
+
+
+def test_fastcgi_cancel_queued(monkeypatch):
+
+    async def t(d):
+        from pykern import pkunit
+
+        # worker hasn't connected so o1 is queued
+        await d._op_analysis(_msg('o1'))
+        await d._op_cancel(PKDict(opId='c1', opIdsToCancel=['o1']))
+        pkunit.pkeq(0, d._fastcgi_ops)
+        await d._op_analysis(_msg('o2'))
+        await _replies(d, 1)
+        pkunit.pkeq(['o2'], d.workers[0].served)
+        pkunit.pkeq(['o2'], [r.reply.opId for r in d.replies])
+        pkunit.pkeq(0, d._fastcgi_ops)
+
+    _run(monkeypatch, t)
+
+
+def test_fastcgi_recycle(monkeypatch):
+
+    async def t(d):
+        from pykern import pkunit
+
+        for i in range(5):
+            await d._op_analysis(_msg('o{}'.format(i)))
+            await _replies(d, i + 1)
+        pkunit.pkeq(
+            [['o0', 'o1'], ['o2', 'o3'], ['o4']],
+            [w.served for w in d.workers],
+        )
+        # replaced workers' connections were closed
+        pkunit.pkeq([True, True, False], [w.closed for w in d.workers])
+        pkunit.pkeq(0, d._fastcgi_ops)
+
+    _run(monkeypatch, t, fastcgi_max_requests=2)
+
+
+def test_fastcgi_worker_exit_idle(monkeypatch):
+
+    async def t(d):
+        from pykern import pkunit
+
+        await d._op_analysis(_msg('o1'))
+        await _replies(d, 1)
+        # like _Cmd._await_exit when the process exits
+        d.workers[0].destroy()
+        await d._op_analysis(_msg('o2'))
+        await _replies(d, 2)
+        pkunit.pkeq([['o1'], ['o2']], [w.served for w in d.workers])
+        pkunit.pkeq(['o1', 'o2'], [r.reply.opId for r in d.replies])
+        pkunit.pkeq(0, d._fastcgi_ops)
+
+    _run(monkeypatch, t)
+
+
+def _msg(op_id):
+    from sirepo import job
+
+    return PKDict(
+        computeJid='u1-s1-animation',
+        jobCmd='sim_frame',
+        jobRunMode=job.SEQUENTIAL,
+        opId=op_id,
+        opName=job.OP_ANALYSIS,
+        runDir='/not/used',
+    )
+
+
+async def _replies(dispatcher, count):
+    import tornado.gen
+
+    for _ in range(200):
+        if len(dispatcher.replies) >= count:
+            return
+        await tornado.gen.sleep(0.01)
+    raise AssertionError('replies={} expect count={}'.format(dispatcher.replies, count))
+
+
+def _run(monkeypatch, test, **kwargs):
+    from pykern import pkio
+    from pykern import pkjson
+    from pykern import pkunit
+    from sirepo import job
+    from sirepo.pkcli import job_agent
+    import socket
+    import tornado.ioloop
+    import tornado.iostream
+
+    class _Worker(PKDict):
+        """Serves ops like job_cmd._do_fastcgi"""
+
+        def destroy(self):
+            self._terminating = True
+            self.dispatcher.fastcgi_cmds.pkdel(self.msg.fastcgiWorkerId)
+            self.dispatcher.cmds.remove(self)
+
+        async def serve(self):
+            s = tornado.iostream.IOStream(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM))
+            await s.connect(self.msg.fastcgiFile)
+            await s.write(pkjson.dump_bytes(PKDict(fastcgiWorkerId=self.msg.fastcgiWorkerId)) + b'\n')
+            try:
+                while True:
+                    m = pkjson.load_any(await s.read_until(b'\n'))
+                    self.served.append(m.opId)
+                    await s.write(
+                        pkjson.dump_bytes(PKDict(opId=m.opId, state=job.COMPLETED)) + b'\n',
+                    )
+            except tornado.iostream.StreamClosedError:
+                self.closed = True
+
+    class _Dispatcher(job_agent._Dispatcher):
+
+        def __init__(self):
+            super().__init__()
+            self.pkupdate(replies=[], workers=[])
+
+        async def send(self, msg):
+            m = pkjson.load_any(msg)
+            if m.opName == job.OP_ANALYSIS:
+                self.replies.append(m)
+            return True
+
+        async def _cmd(self, msg, **kwargs):
+            if msg.jobCmd != 'fastcgi':
+                assert self._fastcgi_ops < job_agent.cfg.fastcgi_workers, \
+                    'op={} not served by a fastcgi worker'.format(msg.opId)
+                return await super()._cmd(msg, **kwargs)
+            w = _Worker(
+                _terminating=False,
+                closed=False,
+                dispatcher=self,
+                msg=msg,
+                op_id=None,
+                served=[],
+            )
+            self.fastcgi_cmds[msg.fastcgiWorkerId] = w
+            self.cmds.append(w)
+            self.workers.append(w)
+            tornado.ioloop.IOLoop.current().spawn_callback(w.serve)
+
+    monkeypatch.setattr(job, 'cfg', PKDict(max_message_size=int(1e8)))
+    monkeypatch.setattr(
+        job_agent,
+        'cfg',
+        PKDict(
+            agent_id='a1',
+            fastcgi_max_requests=0,
+            fastcgi_preload=set(),
+            fastcgi_workers=1,
+        ).pkupdate(kwargs),
+    )
+    with pkio.save_chdir(pkunit.empty_work_dir()):
+        d = _Dispatcher()
+        try:
+            tornado.ioloop.IOLoop.current().run_sync(lambda: test(d))
+        finally:
+            if d._fastcgi_msg_q:
+                d._fastcgi_remove_handler()
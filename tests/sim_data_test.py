@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for :mod:`sirepo.sim_data`
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+import pytest
+from sirepo import srunit
+
+
+@srunit.wrap_in_request()
+def test_fixup_source_changed():
+    from pykern import pkio
+    from pykern import pkunit
+    import sirepo.sim_data
+
+    c = sirepo.sim_data.get_class('myapp')
+    for m in ('sirepo.simulation_db', 'sirepo.template.myapp', 'sirepo.sim_data.myapp'):
+        pkunit.pkok(
+            any(p.endswith(m.replace('.', '/') + '.py') for p in c._fixup_source_paths()),
+            'module={} not in fixup sources',
+            m,
+        )
+    f = pkunit.empty_work_dir().join('myapp_fixup.py')
+    pkio.write_text(f, 'x = 1\n')
+    p = c._fixup_source_paths() + [str(f)]
+    c._fixup_source_paths = classmethod(lambda cls: p)
+    try:
+        s = _stamp(c)
+        # same stamp skips fixup_old_data
+        pkunit.pkok('dog' not in _fixup(s).models, 'fixup_old_data called')
+        pkio.write_text(f, 'x = 2\n')
+        pkunit.pkne(s, _stamp(c))
+        # changed fixup source invalidates the stamp
+        d = _fixup(s)
+        pkunit.pkok('dog' in d.models, 'fixup_old_data not called')
+        pkunit.pkeq(_stamp(c), d.fixupVersion)
+    finally:
+        del c._fixup_source_paths
+        _stamp(c)
+
+
+def _fixup(stamp):
+    from sirepo import simulation_db
+
+    d = simulation_db.default_data('myapp')
+    d.version = '20150101.000000'
+    d.fixupVersion = stamp
+    del d.models['dog']
+    return simulation_db.fixup_old_data(d)[0]
+
+
+def _stamp(sim_data_class):
+    # fixup_version is memoized on the class
+    if 'fixup_version' in sim_data_class.__dict__:
+        delattr(sim_data_class, 'fixup_version')
+    return sim_data_class.fixup_version()
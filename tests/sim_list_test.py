@@ -7,6 +7,40 @@ u"""test simulation list
 from __future__ import absolute_import, division, print_function
 import pytest
 
+def test_catalog(fc):
+    from pykern import pkio
+    from pykern.pkcollections import PKDict
+    from pykern.pkunit import pkeq, pkok
+    from sirepo import simulation_db
+    import sirepo.srdb
+    import sirepo.util
+
+    def _names():
+        return sorted(
+            r.name for r in fc.sr_post(
+                'listSimulations',
+                PKDict(simulationType=fc.sr_sim_type),
+            )
+        )
+
+    n = _names()
+    d = sirepo.srdb.root().join('user', fc.sr_auth_state().uid, fc.sr_sim_type)
+    c = d.join('sirepo-catalog.json')
+    pkok(c.check(file=True), 'catalog not created={}', c)
+    # changes written by other processes are reindexed
+    f = pkio.sorted_glob(d.join('*', simulation_db.SIMULATION_DATA_FILE))[0]
+    x = simulation_db.read_json(f)
+    o = x.models.simulation.name
+    x.models.simulation.name = 'catalog test'
+    sirepo.util.json_dump(x, path=f)
+    n.remove(o)
+    pkeq(sorted(n + ['catalog test']), _names())
+    # rebuilt from disk
+    c.remove()
+    pkok('catalog test' in _names(), 'catalog not rebuilt')
+    pkok(c.check(file=True), 'catalog not recreated={}', c)
+
+
 def test_copy_non_session(fc):
     from pykern.pkcollections import PKDict
     from pykern.pkdebug import pkdp
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for :mod:`sirepo.simulation_db` schemas
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+import pytest
+
+_SIM_TYPES = ('elegant', 'myapp', 'srw', 'zgoubi')
+
+
+def test_schema_bundle():
+    from pykern import pkio
+    from pykern import pkunit
+    from sirepo import feature_config
+    from sirepo import simulation_db
+
+    _init()
+    p = simulation_db._schema_bundle_path('myapp')
+    s = simulation_db.get_schema('myapp')
+    pkunit.pkok(p.check(file=True), '{}: bundle not written', p)
+    pkunit.pkeq(
+        feature_config.cfg().run_status_stream,
+        s.feature_config.run_status_stream,
+    )
+    pkunit.pkok('feature_config' not in simulation_db.read_json(p), 'config in bundle')
+    m = p.mtime()
+    c = feature_config.cfg().run_status_stream
+    try:
+        # another process (e.g. job_cmd) with a different config
+        feature_config.cfg().run_status_stream = not c
+        simulation_db._SCHEMA_CACHE.clear()
+        pkunit.pkeq(p, simulation_db._schema_bundle_path('myapp'))
+        s = simulation_db.get_schema('myapp')
+        pkunit.pkeq(not c, s.feature_config.run_status_stream)
+        pkunit.pkeq(m, p.mtime())
+        pkunit.pkeq([p], pkio.sorted_glob(p.dirpath().join('myapp-*')))
+    finally:
+        feature_config.cfg().run_status_stream = c
+        simulation_db._SCHEMA_CACHE.clear()
+
+
+def test_schema_enum():
+    from pykern import pkunit
+    from sirepo import simulation_db
+    from sirepo.template import template_common
+
+    _init()
+    for t in _SIM_TYPES:
+        s = simulation_db.get_schema(t)
+        for n, l in s.enum.items():
+            e = simulation_db.get_schema_enum(t, n)
+            pkunit.pkeq(len(set(v[0] for v in l)), len(e), '{} {}', t, n)
+            for v in l:
+                pkunit.pkeq(_scan(l, v[0]), e[v[0]], '{} {} {}', t, n, v[0])
+                pkunit.pkeq(_scan(l, v[0]), template_common.enum_text(s, n, v[0]))
+        with pkunit.pkexcept(AssertionError):
+            template_common.enum_text(s, n, 'not-a-value')
+
+
+def _init():
+    from pykern import pkconfig
+    from pykern import pkunit
+
+    pkconfig.reset_state_for_testing(dict(
+        SIREPO_FEATURE_CONFIG_SIM_TYPES=':'.join(_SIM_TYPES),
+        SIREPO_SRDB_ROOT=str(pkunit.empty_work_dir()),
+    ))
+
+
+def _scan(values, value):
+    """Label of value as looked up before get_schema_enum"""
+    for e in values:
+        if e[0] == value:
+            return e[1]
+    raise AssertionError('value={} not found'.format(value))
@@ -26,6 +26,36 @@ def test_get_application_data():
     _expr('sin(sqrt((1+1*2.0)*3)+.14)+13', 13)
 
 
+def test_extract_report_data_columns():
+    from pykern import pkunit
+    from sirepo.template import template_common
+
+    d = pkunit.empty_work_dir()
+    b = PKDict(
+        x=[1.0, 2.0, 3.0, 4.0],
+        xp=[0.1, 0.2, 0.1, 0.4],
+        y=[0.0, 1.0, 0.0, 1.0],
+        yp=[0.3, 0.2, 0.1, 0.0],
+        t=[1e-9, 2e-9, 3e-9, 4e-9],
+        p=[100.0, 101.0, 102.0, 103.0],
+    )
+    a = PKDict(frameIndex=0, histogramBins=10, x='x', y1='xp', y2='stale', y3='none')
+    # histograms ignore y fields not in the file
+    pkunit.pkeq(
+        template_common.heatmap([b.x, b.xp], a).z_matrix,
+        _elegant()._extract_report_data(_write_sdds(d.join('bunch.sdds'), b), a).z_matrix,
+    )
+    t = PKDict(s=[0.0, 1.0, 2.0], betax=[5.0, 6.0, 7.0])
+    f = _write_sdds(d.join('twiss.sdds'), t)
+    a = PKDict(frameIndex=0, x='s', y1='betax', y2='stale', y3='none')
+    pkunit.pkeq(
+        'Column stale not found',
+        _elegant()._extract_report_data(f, a).error,
+    )
+    a.y2 = 'none'
+    pkunit.pkeq(t.betax, _elegant()._extract_report_data(f, a).plots[0].points)
+
+
 def test_file_iterator():
     from sirepo.template import lattice
     from sirepo.template.lattice import LatticeUtil
@@ -64,6 +94,23 @@ def _expr(expr, expect, variables=None):
     )
 
 
+def _write_sdds(path, columns):
+    from pykern import pkio
+
+    pkio.write_text(
+        path,
+        'SDDS1\n'
+        + ''.join('&column name={}, type=double, &end\n'.format(k) for k in columns)
+        + '&data mode=ascii, &end\n! page number 1\n{}\n'.format(
+            len(list(columns.values())[0]),
+        )
+        + ''.join(
+            ' '.join(repr(v) for v in r) + '\n' for r in zip(*columns.values())
+        ),
+    )
+    return str(path)
+
+
 def _find_example(name):
     from sirepo import simulation_db
     for ex in simulation_db.examples(_elegant().SIM_TYPE):
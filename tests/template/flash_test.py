@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+u"""Test for sirepo.template.flash grid resampling
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+import numpy
+
+
+def test_apply_to_grid():
+    from pykern import pkunit
+    from sirepo.template import flash
+
+    r = numpy.random.RandomState(1)
+    for nyb, nxb in ((2, 2), (2, 4), (3, 2)):
+        # level 3 blocks are 1x1, level 2 2x2, and level 1 4x4 in domain units
+        b = [
+            [[0, 4], [0, 4]],
+            [[4, 6], [0, 2]],
+            [[6, 8], [0, 2]],
+            [[4, 6], [2, 4]],
+            [[6, 7], [2, 3]],
+            [[7, 8], [2, 3]],
+            [[6, 7], [3, 4]],
+            [[7, 8], [3, 4]],
+        ]
+        d = ([0, 8], [0, 4])
+        c = [1.0, 1.0]
+        v = r.rand(len(b), nyb, nxb)
+        e = numpy.full((4 * nyb, 8 * nxb), numpy.nan)
+        for i in range(len(b)):
+            _paint(e, v[i], b[i], c, *d)
+        pkunit.pkok(not numpy.isnan(e).any(), 'blocks do not cover grid')
+        a = numpy.full(e.shape, numpy.nan)
+        flash._apply_to_grid(a, v, numpy.array(b, dtype=float), c, *d)
+        pkunit.pkeq(e.tolist(), a.tolist(), 'nyb={} nxb={}', nyb, nxb)
+
+
+def test_reduce_grid():
+    from pykern import pkunit
+    from sirepo.template import flash
+
+    g = numpy.arange(35.0).reshape(5, 7)
+    pkunit.pkeq(g.tolist(), flash._reduce_grid(g, 7).tolist())
+    a = flash._reduce_grid(g, 3)
+    # ceil(7 / 3) cells per side, edges are extended to fill the last groups
+    pkunit.pkeq((2, 3), a.shape)
+    for i in range(a.shape[0]):
+        for j in range(a.shape[1]):
+            pkunit.pkeq(
+                numpy.mean([
+                    g[min(y, 4), min(x, 6)]
+                    for y in range(i * 3, i * 3 + 3)
+                    for x in range(j * 3, j * 3 + 3)
+                ]),
+                a[i, j],
+                'cell={},{}',
+                i,
+                j,
+            )
+
+
+def _paint(grid, values, bounds, cell_size, xdomain, ydomain):
+    """Painter before vectorizing with sizes from values[y][x]
+
+    The original took xsize from the rows of values, which only
+    works for square blocks.
+    """
+    ysize, xsize = values.shape
+    xi = int(round((bounds[0][0] - xdomain[0]) / cell_size[0])) * xsize
+    yi = int(round((bounds[1][0] - ydomain[0]) / cell_size[1])) * ysize
+    xscale = int(round((bounds[0][1] - bounds[0][0]) / cell_size[0]))
+    yscale = int(round((bounds[1][1] - bounds[1][0]) / cell_size[1]))
+    for x in range(xsize):
+        for y in range(ysize):
+            for x1 in range(xscale):
+                for y1 in range(yscale):
+                    grid[yi + (y * yscale) + y1][xi + (x * xscale) + x1] = values[y][x]
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+u"""Test for sirepo.template.hellweg_dump_reader
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+import ctypes
+import math
+import numpy
+
+# per-particle functions before vectorizing
+_OLD_BEAM_PARAMETER = {
+    'r': lambda p, lmb: abs(p.r * lmb),
+    'th': lambda p, lmb: p.Th * 180.0 / math.pi,
+    'x': lambda p, lmb: p.r * math.cos(p.Th) * lmb,
+    'y': lambda p, lmb: p.r * math.sin(p.Th) * lmb,
+    'br': lambda p, lmb: math.copysign(p.beta.r, p.r),
+    'bth': lambda p, lmb: p.beta.th,
+    'bx': lambda p, lmb: p.beta.r * math.cos(p.Th) - p.beta.th * math.sin(p.Th) * lmb,
+    'by': lambda p, lmb: p.beta.r * math.sin(p.Th) + p.beta.th * math.cos(p.Th) * lmb,
+    'bz': lambda p, lmb: p.beta.z,
+    'ar': lambda p, lmb: math.atan2(p.beta.r, p.beta0),
+    'ath': lambda p, lmb: math.atan2(p.beta.th, p.beta0),
+    'ax': lambda p, lmb: math.atan2(p.beta.r * math.cos(p.Th) - p.beta.th * math.sin(p.Th) * lmb, p.beta.z),
+    'ay': lambda p, lmb: math.atan2(p.beta.r * math.sin(p.Th) + p.beta.th * math.cos(p.Th) * lmb, p.beta.z),
+    'az': lambda p, lmb: 0,
+    'phi': lambda p, lmb: p.phi * 180.0 / math.pi,
+    'zrel': lambda p, lmb: lmb * p.phi / (2 * math.pi),
+    'z0': lambda p, lmb: p.z,
+    'beta': lambda p, lmb: p.beta0,
+    'w': lambda p, lmb: 0.5110034e6 * (1 / math.sqrt(1 - p.beta0 ** 2) - 1) * 1e-6,
+}
+
+
+def test_dump_reader():
+    from pykern import pkunit
+    from sirepo.template import hellweg_dump_reader
+
+    f = str(pkunit.empty_work_dir().join('dump.bin'))
+    # the last point has no live particles
+    _write_dump(f, [[0, 2, 0, 0, 7], [3, 0, 0, 1, 0], [1, 1, 2, 3, 4]])
+    h = hellweg_dump_reader.beam_header(f)
+    pkunit.pkeq((3, 5), (h.NPoints, h.NParticles))
+    for i in range(h.NPoints):
+        e = _old_beam_info(f, i)
+        a = hellweg_dump_reader.beam_info(f, i)
+        pkunit.pkeq(e['Structure'].ksi, a['Structure']['ksi'])
+        pkunit.pkeq(e['BeamHeader'].beam_lmb, a['BeamHeader']['beam_lmb'])
+        pkunit.pkeq([p.lost for p in e['Particles']], a['Particles']['lost'].tolist())
+        pkunit.pkeq(
+            e['Structure'].ksi * e['Structure'].lmb,
+            hellweg_dump_reader.get_parameter(a, 'z'),
+        )
+        for n, fn in _OLD_BEAM_PARAMETER.items():
+            _assert_close(
+                [fn(p, e['BeamHeader'].beam_lmb) for p in e['Particles'] if p.lost == 0],
+                hellweg_dump_reader.get_points(a, n),
+                'point={} field={}', i, n,
+            )
+    e = _old_field_ranges(f, list(_OLD_BEAM_PARAMETER.keys()))
+    a = hellweg_dump_reader.field_ranges(f, list(_OLD_BEAM_PARAMETER.keys()))
+    for n in _OLD_BEAM_PARAMETER:
+        _assert_close(e[n], a[n], 'field={}', n)
+    for n in ('r', 'w', 'ax', 'phi'):
+        for c in (1, 2, 3, 10):
+            e = _old_particle_info(f, n, c)
+            a = hellweg_dump_reader.particle_info(f, n, c)
+            _assert_close(e['z_values'], a.z_values, 'field={} count={}', n, c)
+            pkunit.pkeq(len(e['y_values']), len(a.y_values))
+            for x, y in zip(e['y_values'], a.y_values):
+                _assert_close(x, y, 'field={} count={}', n, c)
+            _assert_close(e['y_range'], a.y_range, 'field={} count={}', n, c)
+    # all lost
+    _write_dump(f, [[1, 1, 1, 1, 1]])
+    pkunit.pkeq(None, hellweg_dump_reader.particle_info(f, 'r', 1).y_range)
+    pkunit.pkeq([], hellweg_dump_reader.field_ranges(f, ['r']).r)
+    # truncated
+    with open(f, 'ab') as o:
+        o.write(b'x')
+    with pkunit.pkexcept(AssertionError):
+        hellweg_dump_reader.beam_info(f, 0)
+
+
+def _assert_close(expect, actual, fmt, *args):
+    from pykern import pkunit
+
+    if expect is None or actual is None:
+        pkunit.pkeq(expect, actual, fmt, *args)
+        return
+    pkunit.pkeq(len(expect), len(actual), fmt, *args)
+    pkunit.pkok(
+        numpy.allclose(expect, actual, rtol=1e-12, atol=0),
+        '{} expect={} != actual={}',
+        fmt.format(*args),
+        expect,
+        actual,
+    )
+
+
+def _old_beam_info(filename, idx):
+    from sirepo.template.hellweg_dump_reader import THeader, TStructure, TBeamHeader, TParticle
+
+    info = {}
+    with open(filename, 'rb') as f:
+        header = THeader()
+        assert f.readinto(header) == ctypes.sizeof(header)
+        info['Header'] = header
+        structure = TStructure()
+        size = ctypes.sizeof(structure)
+        if idx > 0:
+            f.seek(idx * size, 1)
+        assert f.readinto(structure) == size
+        info['Structure'] = structure
+        if idx < header.NPoints - 1:
+            f.seek((header.NPoints - idx - 1) * size, 1)
+        beam_header = TBeamHeader()
+        size = ctypes.sizeof(beam_header) + ctypes.sizeof(TParticle) * header.NParticles
+        if idx > 0:
+            f.seek(idx * size, 1)
+        assert f.readinto(beam_header) == ctypes.sizeof(beam_header)
+        info['BeamHeader'] = beam_header
+        particles = []
+        for _ in range(header.NParticles):
+            p = TParticle()
+            assert f.readinto(p) == ctypes.sizeof(p)
+            particles.append(p)
+        info['Particles'] = particles
+    return info
+
+
+def _old_field_ranges(filename, fields):
+    from sirepo.template import hellweg_dump_reader
+
+    res = dict((f, []) for f in fields)
+    for frame in range(hellweg_dump_reader.beam_header(filename).NPoints):
+        info = _old_beam_info(filename, frame)
+        lmb = info['BeamHeader'].beam_lmb
+        for field in res:
+            values = [
+                _OLD_BEAM_PARAMETER[field](p, lmb) for p in info['Particles'] if p.lost == 0
+            ]
+            if not len(values):
+                pass
+            elif len(res[field]):
+                res[field][0] = min(min(values), res[field][0])
+                res[field][1] = max(max(values), res[field][1])
+            else:
+                res[field] = [min(values), max(values)]
+    return res
+
+
+def _old_particle_info(filename, field, count):
+    """Same sampling as the old reader without its seeks"""
+    from sirepo.template import hellweg_dump_reader
+
+    h = hellweg_dump_reader.beam_header(filename)
+    if count > h.NPoints:
+        count = h.NPoints
+    indices = [int(round((i * h.NParticles) / count)) for i in range(count)]
+    z_values = []
+    y_values = [[] for _ in indices]
+    y_range = None
+    for frame in range(h.NPoints):
+        info = _old_beam_info(filename, frame)
+        z_values.append(info['Structure'].ksi * info['Structure'].lmb)
+        for i, idx in enumerate(indices):
+            p = info['Particles'][idx]
+            if p.lost == 0:
+                v = _OLD_BEAM_PARAMETER[field](p, info['BeamHeader'].beam_lmb)
+                y_values[i].append(v)
+                y_range = [min(v, y_range[0]), max(v, y_range[1])] if y_range else [v, v]
+    return dict(z_values=z_values, y_values=y_values, y_range=y_range)
+
+
+def _write_dump(filename, lost):
+    """Write a dump through the ctypes structures
+
+    Args:
+        lost (list): [point][particle] loss values
+    """
+    from sirepo.template.hellweg_dump_reader import THeader, TStructure, TBeamHeader, TParticle
+
+    r = numpy.random.RandomState(len(lost))
+    with open(filename, 'wb') as f:
+        f.write(THeader(NPoints=len(lost), NParticles=len(lost[0])))
+        for _ in lost:
+            f.write(TStructure(ksi=r.rand(), lmb=0.1 + r.rand(), CellNumber=1))
+        for l in lost:
+            f.write(TBeamHeader(beam_lmb=0.1 + r.rand(), beam_current=r.rand()))
+            for x in l:
+                p = TParticle(
+                    r=r.uniform(-1, 1),
+                    Th=r.uniform(-math.pi, math.pi),
+                    phi=r.uniform(-math.pi, math.pi),
+                    z=r.rand(),
+                    beta0=r.uniform(0.1, 0.9),
+                    lost=x,
+                )
+                p.beta.r, p.beta.th, p.beta.z = r.uniform(-0.1, 0.1, 3)
+                f.write(p)
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for incremental reads of opal.h5 in :mod:`sirepo.template.opal`
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern import pkunit
+import pytest
+
+pytest.importorskip('h5py')
+
+
+def test_read_steps():
+    from sirepo.template import opal
+    import numpy
+
+    d = pkunit.empty_work_dir()
+    p = d.join('opal.h5')
+    c = d.join('.opal-steps', 'opal.h5.npz')
+    _write(p, range(3))
+    _assert_steps(p, attrs=['spos'], datasets=['x'])
+    # last step was incomplete and steps were appended
+    _write(p, [20, 3, 4], mode='a', start=2)
+    _assert_steps(p, attrs=['spos'], datasets=['x'])
+    # new keys are read for all steps, cached keys stay current
+    _write(p, [5], mode='a', start=5)
+    _assert_steps(p, attrs=['RMSx'])
+    r = _assert_steps(p, attrs=['RMSx', 'spos'], datasets=['x'])
+    pkunit.pkeq(6, len(r.steps.r_x))
+    # frame count polls don't rewrite the cache
+    m = c.mtime()
+    _write(p, [6], mode='a', start=6)
+    pkunit.pkeq(7, opal._read_frame_count(d))
+    pkunit.pkeq(m, c.mtime())
+    with numpy.load(str(c)) as x:
+        pkunit.pkeq(6, int(x['count']))
+    _assert_steps(p, attrs=['spos'], datasets=['x'])
+    # rewritten with fewer steps
+    _write(p, [7, 8])
+    _assert_steps(p, attrs=['RMSx', 'spos'], datasets=['x'])
+
+
+def _assert_steps(path, attrs=(), datasets=()):
+    from sirepo.template import opal
+    import h5py
+    import numpy
+
+    r = opal._read_steps(path, attrs=attrs, datasets=datasets)
+    with h5py.File(str(path), 'r') as f:
+        n = len([k for k in f if k.startswith('Step#')])
+        pkunit.pkeq(n, r.count)
+        for a in attrs:
+            pkunit.pkeq(
+                [f['Step#{}'.format(i)].attrs[a].tolist() for i in range(n)],
+                r.steps['a_' + a].tolist(),
+            )
+            pkunit.pkeq('m', r.units[a])
+        for x in datasets:
+            pkunit.pkeq(
+                [
+                    [numpy.min(v), numpy.max(v)] for v in (
+                        f['Step#{}'.format(i)][x][()] for i in range(n)
+                    )
+                ],
+                r.steps['r_' + x].tolist(),
+            )
+    for k in r.steps:
+        pkunit.pkeq(r.count, len(r.steps[k]), 'key={}', k)
+    return r
+
+
+def _write(path, values, mode='w', start=0):
+    import h5py
+    import numpy
+
+    with h5py.File(str(path), mode) as f:
+        f.attrs['sposUnit'] = b'm'
+        f.attrs['RMSxUnit'] = b'm'
+        for i, v in enumerate(values):
+            k = 'Step#{}'.format(start + i)
+            if k in f:
+                del f[k]
+            g = f.create_group(k)
+            g.attrs['spos'] = float(v)
+            g.attrs['RMSx'] = numpy.array([v, v * 2.0, v * 3.0])
+            g.create_dataset('x', data=numpy.linspace(-v, v * 2.0, 5))
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+u"""PyTest for incremental reads of the monitor log in :mod:`sirepo.template.webcon`
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern import pkunit
+from pykern.pkcollections import PKDict
+
+
+def test_background_percent_complete():
+    from pykern import pkio
+    from sirepo.template import webcon
+
+    d = pkunit.empty_work_dir()
+    l = _lines(12)
+    pkio.write_text(d.join(webcon.MONITOR_LOGFILE), ''.join(l))
+    e = _full_parse(''.join(l), 0)
+    r = webcon.background_percent_complete('correctorSettingAnimation', d, False)
+    pkunit.pkeq(e.count, r.frameCount)
+    # polls get the latest values, not the history
+    pkunit.pkeq(
+        PKDict((k, v.vals[-1]) for k, v in e.history.items()),
+        r.summaryData.monitorValues,
+    )
+
+
+def test_read_monitor_log():
+    from pykern import pkio
+    from sirepo.template import webcon
+
+    d = pkunit.empty_work_dir()
+    p = d.join(webcon.MONITOR_LOGFILE)
+    l = _lines(12)
+    pkio.write_text(p, ''.join(l[:5]))
+    _assert_log(p)
+    pkunit.pkok(
+        d.join('.monitor-log', p.basename + '.npz').check(file=True),
+        'missing monitor log cache',
+    )
+    # partial line is read on the next call
+    _append(p, ''.join(l[5:8]) + l[8][:10])
+    _assert_log(p)
+    # start_time is the earliest, not the first, time
+    _append(p, l[8][10:] + ''.join(l[9:]) + 'sr_epics:bpm0:x 2019-12-31 23:59:59.5 2.0\n')
+    _assert_log(p)
+    # truncated
+    pkio.write_text(p, ''.join(l[:3]))
+    _assert_log(p)
+    # rewritten with a different head and a larger size
+    pkio.write_text(p, ''.join(_lines(20, start=1)))
+    _assert_log(p)
+    h = webcon.cfg.monitor_history_max
+    try:
+        webcon.cfg.monitor_history_max = 4
+        pkio.unchecked_remove(d.join('.monitor-log'))
+        l = _lines(30, start=2)
+        pkio.write_text(p, ''.join(l[:7]))
+        _assert_log(p)
+        _append(p, ''.join(l[7:]))
+        _assert_log(p)
+    finally:
+        webcon.cfg.monitor_history_max = h
+
+
+def _append(path, text):
+    with open(str(path), 'a') as f:
+        f.write(text)
+
+
+def _assert_log(path):
+    from pykern import pkio
+    from sirepo.template import webcon
+
+    t = pkio.read_text(path)
+    e = _full_parse(t[:t.rfind('\n') + 1], webcon.cfg.monitor_history_max)
+    # twice, the second from the cache
+    for _ in range(2):
+        a = webcon._read_monitor_log(path)
+        pkunit.pkeq(e.count, a.count)
+        pkunit.pkeq(e.start_time, a.start_time)
+        pkunit.pkeq(sorted(e.history.keys()), sorted(a.history.keys()))
+        for k, v in e.history.items():
+            pkunit.pkeq(v.times, a.history[k].times.tolist(), '{} times', k)
+            pkunit.pkeq(v.vals, a.history[k].vals.tolist(), '{} vals', k)
+        v, c, _ = webcon._read_monitor_file(path)
+        pkunit.pkeq(PKDict((k, x.vals[-1]) for k, x in e.history.items()), v)
+        pkunit.pkeq(e.count, c)
+
+
+def _full_parse(text, history_max):
+    """Parse the whole log as before the log was read incrementally"""
+    from datetime import datetime
+    import re
+
+    res = PKDict(count=0, history=PKDict(), start_time=None)
+    for line in text.split('\n'):
+        m = re.match(r'(\S+)(.*?)\s([\d\.e\-\+]+)\s*$', line)
+        if not m:
+            continue
+        n = re.sub(r':', '_', re.sub(r'^sr_epics:', '', m.group(1)))
+        t = (
+            datetime.strptime(m.group(2).strip(), '%Y-%m-%d %H:%M:%S.%f')
+            - datetime(1970, 1, 1)
+        ).total_seconds()
+        if res.start_time is None or t < res.start_time:
+            res.start_time = t
+        h = res.history.setdefault(n, PKDict(times=[], vals=[]))
+        h.times.append(t)
+        h.vals.append(float(m.group(3)))
+        res.count += 1
+    if history_max:
+        for h in res.history.values():
+            h.times = h.times[-history_max:]
+            h.vals = h.vals[-history_max:]
+    return res
+
+
+def _lines(count, start=0):
+    res = []
+    for i in range(count):
+        res.append(
+            'sr_epics:bpm{}:{} 2020-01-0{} 10:{:02d}:{:02d}.{:06d} {}\n'.format(
+                i % 3,
+                'xy'[i % 2],
+                start + 1,
+                i // 60,
+                i % 60,
+                i * 1001,
+                -1.5e-3 * i + start,
+            ),
+        )
+    return res
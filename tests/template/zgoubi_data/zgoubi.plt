@@ -0,0 +1,20 @@
+@ Zgoubi, "PRINT" procedure : step by step coordinates
+# PLT - STORAGE FILE
+# KEX, Do-1, Yo, To, Y, T, X, BORO, IT, IPASS, KLEY, LABEL1
+# int, float, cm, mrd, cm, mrd, cm, kG.cm, int, int, string, string
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 -5.450182e-02 2.188239e+00 7.909315e+00 1.005000e+02 1 1 'QUADRUPO' 'Q1'
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 4.282590e-01 4.210987e+00 3.554671e+00 1.005000e+02 1 1 'QUADRUPO' 'Q1'
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 6.018175e-01 -5.537894e-01 8.420280e+00 1.005000e+02 1 1 'FFAG' 'F1'
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 7.577333e-01 -4.025457e+00 1.223720e+00 1.005000e+02 1 1 'FFAG' 'F1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 -5.660261e-01 4.654801e+00 3.925457e+00 1.005000e+02 2 1 'QUADRUPO' 'Q1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 2.532966e-01 -1.989738e+00 4.565187e+00 1.005000e+02 2 1 'QUADRUPO' 'Q1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 -2.282675e-01 -1.490895e+00 5.265667e+00 1.005000e+02 2 1 'FFAG' 'F1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 1.685036e-01 4.042018e+00 6.137839e+00 1.005000e+02 2 1 'FFAG' 'F1'
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 8.578912e-01 3.564006e+00 8.918907e+00 1.010000e+02 1 2 'QUADRUPO' 'Q1'
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 3.425471e-01 -3.369004e+00 7.745738e+00 1.010000e+02 1 2 'QUADRUPO' 'Q1'
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 9.292659e-01 4.046960e+00 5.121968e+00 1.010000e+02 1 2 'FFAG' 'F1'
+ 1 1.000000e-02 1.000000e-01 -2.000000e-01 4.276340e-01 -2.888750e+00 7.484471e+00 1.010000e+02 1 2 'FFAG' 'F1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 1.470647e-01 -2.150425e+00 5.711452e-01 1.010000e+02 2 2 'QUADRUPO' 'Q1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 7.078850e-01 4.898060e+00 7.966628e-01 1.010000e+02 2 2 'QUADRUPO' 'Q1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 6.011906e-01 -8.953817e-01 1.356888e+00 1.010000e+02 2 2 'FFAG' 'F1'
+ 1 2.000000e-02 2.000000e-01 -4.000000e-01 -4.122175e-01 2.687919e+00 7.854903e+00 1.010000e+02 2 2 'FFAG' 'F1'
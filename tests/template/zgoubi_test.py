@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+u"""Test for sirepo.template.zgoubi animation frames
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern.pkcollections import PKDict
+import numpy
+
+
+def test_bunch_animation():
+    from pykern import pkunit
+
+    d = _run_dir()
+    for i in range(4):
+        _assert_frame(d, 'bunchAnimation', i, '0', 'all')
+    _assert_frame(d, 'bunchAnimation', 2, '1', 'all')
+    _assert_frame(d, 'bunchAnimation', 2, '1', '2')
+    _assert_frame(d, 'bunchAnimation', 2, '1', '2', plot_type='heatmap')
+    _assert_frame(d, 'bunchAnimation', 1, '0', 'all', plot_type='heatmap')
+    # cached columns give the same frames
+    pkunit.pkok(
+        d.join('.zgoubi-columns', 'zgoubi.fai.npz').check(file=True),
+        'missing column cache',
+    )
+    _zgoubi()._COLUMN_CACHE.clear()
+    _assert_frame(d, 'bunchAnimation', 3, '0', 'all')
+    _assert_frame(d, 'energyAnimation', 0, '1', '3')
+
+
+def test_element_step_animation():
+    d = _run_dir()
+    for i in range(2):
+        _assert_frame(d, 'elementStepAnimation', i, '0', 'all')
+    _assert_frame(d, 'elementStepAnimation', 0, '1', 'all')
+    _assert_frame(d, 'elementStepAnimation', 0, '1', '2')
+
+
+def _assert_frame(run_dir, report, frame_index, show_all_frames, particle_selector, plot_type='particle'):
+    from pykern import pkunit
+    from sirepo.template import template_common
+
+    z = _zgoubi()
+    a = PKDict(
+        frameReport=report,
+        frameIndex=frame_index,
+        particleSelector=particle_selector,
+        plotType=plot_type,
+        run_dir=run_dir,
+        showAllFrames=show_all_frames,
+        sim_in=PKDict(
+            models=PKDict(
+                bunch=PKDict(method='MCOBJET3', particleCount=3),
+                bunchAnimation=PKDict(histogramBins=10, plotRangeType='none'),
+                energyAnimation=PKDict(histogramBins=10, plotRangeType='none'),
+            ),
+        ),
+        x='Y',
+        y='T',
+    )
+    actual = z.sim_frame(a.copy())
+    x, y, title, col_names, rows = _old_rows(a)
+    if plot_type == 'particle':
+        expect = _old_particle_data(x, y, col_names, rows, title)
+    else:
+        expect = template_common.heatmap(
+            [
+                numpy.array(z.column_data(x, col_names, rows)) * z._ANIMATION_FIELD_INFO[x][1],
+                numpy.array(z.column_data(y, col_names, rows)) * z._ANIMATION_FIELD_INFO[y][1],
+            ],
+            PKDict(histogramBins=10, plotRangeType='none'),
+            PKDict(title=title),
+        )
+    for k in expect:
+        pkunit.pkeq(expect[k], actual[k], '{} frame={} {}', report, frame_index, k)
+
+
+def _old_particle_data(x_field, y_field, col_names, rows, title):
+    """Particle lines as computed by the row filter before columns were cached"""
+    import re
+
+    z = _zgoubi()
+    x = numpy.array(z.column_data(x_field, col_names, rows)) * z._ANIMATION_FIELD_INFO[x_field][1]
+    y = numpy.array(z.column_data(y_field, col_names, rows)) * z._ANIMATION_FIELD_INFO[y_field][1]
+    it = z.column_data('IT', col_names, rows)
+    x_points = []
+    points = []
+    if 'ENEKI' in col_names:
+        by_it = PKDict()
+        for i in range(len(x)):
+            by_it.setdefault(it[i], [[], []])
+            by_it[it[i]][0].append(x[i])
+            by_it[it[i]][1].append(y[i])
+        for v in by_it.values():
+            x_points.append(v[0])
+            points.append(v[1])
+    else:
+        k = col_names.index('KLEY')
+        l = col_names.index('LABEL1')
+        p = col_names.index('IPASS')
+        names = []
+        c = None
+        for i in range(len(x)):
+            if c != (it[i], rows[i][p]):
+                e = re.sub(r'\'', '', rows[i][k])
+                n = z._ELEMENT_NAME_MAP.get(e, e) + ' ' + rows[i][l]
+                if n not in names:
+                    names.append(n)
+                c = (it[i], rows[i][p])
+                x_points.append([])
+                points.append([])
+            x_points[-1].append(x[i])
+            points[-1].append(y[i])
+        title += ' ' + ', '.join(names)
+    return PKDict(
+        title=title,
+        x_points=x_points,
+        points=points,
+        x_range=[min(x), max(x)],
+        y_range=[min(y), max(y)],
+    )
+
+
+def _old_rows(frame_args):
+    """Rows of a frame selected as before columns were cached"""
+    z = _zgoubi()
+    x = frame_args.x
+    y = frame_args.y
+    i = frame_args.frameIndex
+    if frame_args.frameReport in ('energyAnimation', 'elementStepAnimation'):
+        i += 1
+    elif i == 0:
+        x = z._initial_phase_field(x)
+        y = z._initial_phase_field(y)
+        i = 1
+    col_names, all_rows = z._read_data_file(frame_args.run_dir.join(
+        'zgoubi.plt' if frame_args.frameReport == 'elementStepAnimation' else 'zgoubi.fai',
+    ))
+    p = col_names.index('IPASS')
+    t = col_names.index('IT')
+    ipasses = []
+    for r in all_rows:
+        if r[p] not in ipasses:
+            ipasses.append(r[p])
+    ipass = int(ipasses[i - 1])
+    f = frame_args.particleSelector
+    if frame_args.showAllFrames == '1':
+        rows = [r for r in all_rows if f == 'all' or r[t] == f]
+        title = 'All Frames' + ('' if f == 'all' else ', Particle {}'.format(f))
+    else:
+        rows = [r for r in all_rows if int(r[p]) == ipass]
+        title = 'Initial Distribution' if frame_args.frameIndex == 0 \
+            and frame_args.frameReport == 'bunchAnimation' \
+            else 'Pass {}'.format(ipass)
+    return x, y, title, col_names, rows
+
+
+def _run_dir():
+    from pykern import pkunit
+
+    d = pkunit.empty_work_dir()
+    for f in pkunit.data_dir().listdir():
+        f.copy(d)
+    return d
+
+
+def _zgoubi():
+    from sirepo.template import zgoubi
+
+    return zgoubi
+
@@ -34,3 +34,179 @@ def test_validate_safe_zip():
 
     # Finally, accept a zip file known to be safe
     srw._validate_safe_zip(zip_dir + '/good_zip.zip', zip_dir, srw.validate_magnet_data_file)
+
+
+def test_read_appended():
+    from sirepo.template import template_common
+
+    f = pkunit.empty_work_dir().join('x.log')
+    f.write('a\nb')
+    t, o = template_common.read_appended(f, 0)
+    pkunit.pkeq('a\n', t)
+    pkunit.pkeq(2, o)
+    f.write('\nbc\nd', mode='a')
+    t, o = template_common.read_appended(f, o)
+    pkunit.pkeq('b\nbc\n', t)
+    # truncated
+    f.write('e\n')
+    t, o = template_common.read_appended(f, o)
+    pkunit.pkeq('e\n', t)
+    pkunit.pkeq(2, o)
+
+
+def test_field_range_across_files():
+    from pykern.pkcollections import PKDict
+    from sirepo.template import template_common
+
+    d = pkunit.empty_work_dir()
+    calls = []
+
+    def _range(path):
+        calls.append(path.basename)
+        v = [float(x) for x in path.read().split()]
+        return PKDict(x=[min(v), max(v)])
+
+    d.join('a').write('1 5')
+    d.join('b').write('-2 3')
+    p = [d.join('a'), d.join('b')]
+    r = template_common.field_range_across_files(d, ['x', 'y'], p, _range)
+    pkunit.pkeq([-2.0, 5.0], r.x)
+    pkunit.pkeq([], r.y)
+    pkunit.pkeq(['a', 'b'], calls)
+    d.join('c').write('9')
+    p.append(d.join('c'))
+    r = template_common.field_range_across_files(d, ['x', 'y'], p, _range)
+    pkunit.pkeq([-2.0, 9.0], r.x)
+    # only the new file is read
+    pkunit.pkeq(['a', 'b', 'c'], calls)
+    d.join('e').write('nan inf 100')
+    p.append(d.join('e'))
+    r = template_common.field_range_across_files(d, ['x', 'y'], p, _range)
+    # non-finite ranges are skipped
+    pkunit.pkeq([-2.0, 9.0], r.x)
+
+
+def test_frame_encode():
+    from pykern import pkjson
+    from pykern.pkcollections import PKDict
+    from sirepo.template import template_common
+    import numpy
+    import struct
+
+    x = 1577836800.0 + numpy.arange(100) * 1e-3
+    v = PKDict(
+        title='t',
+        x_points=x.tolist(),
+        y_points=[i / 3.0 for i in range(65)],
+        z_matrix=numpy.arange(200.0).reshape(2, 100),
+        plots=[PKDict(points=[1e39] * 100)],
+        points=[1.0, 2.0],
+    )
+    for float32, t, o, n in (
+        (False, '<f8', [0, 800, 1320, 2920], 3720),
+        (True, '<f4', [0, 800, 1064, None], 1864),
+    ):
+        b = template_common.frame_encode(v, float32=float32)
+        l = struct.unpack_from('<I', b)[0]
+        # header is padded so buffers are aligned
+        pkunit.pkeq(0, (4 + l) % 8)
+        pkunit.pkeq(4 + l + n, len(b))
+        h = pkjson.load_any(b[4:4 + l])
+        # x_points keep float64 for large offsets
+        pkunit.pkeq([o[0], [100], '<f8'], h.x_points['__sirepoBuffer'])
+        pkunit.pkeq([o[1], [65], t], h.y_points['__sirepoBuffer'])
+        pkunit.pkeq([o[2], [2, 100], t], h.z_matrix['__sirepoBuffer'])
+        if float32:
+            # overflows float32
+            pkunit.pkeq(v.plots[0].points, h.plots[0].points)
+        else:
+            pkunit.pkeq([o[3], [100], t], h.plots[0].points['__sirepoBuffer'])
+        # too small
+        pkunit.pkeq([1.0, 2.0], h.points)
+        d = template_common.frame_decode(b)
+        pkunit.pkeq('t', d.title)
+        pkunit.pkeq(v.x_points, d.x_points.tolist())
+        pkunit.pkeq(numpy.asarray(v.y_points, dtype=t).tolist(), d.y_points.tolist())
+        pkunit.pkeq(v.z_matrix.tolist(), d.z_matrix.tolist())
+        pkunit.pkeq(v.plots[0].points, list(d.plots[0].points))
+        pkunit.pkeq(v.points, d.points)
+    # non-finite values are not buffered and not allowed in the header
+    with pkunit.pkexcept(ValueError):
+        template_common.frame_encode(PKDict(points=[float('nan')] * 100))
+
+
+def test_npz_cache():
+    from pykern.pkcollections import PKDict
+    from sirepo.template import template_common
+    import numpy
+
+    class _Bad(object):
+        def __array__(self, *args, **kwargs):
+            raise ValueError('not an array')
+
+    d = pkunit.empty_work_dir()
+    f = d.join('x.out')
+    f.write('abc')
+    s = template_common.npz_cache_source(f)
+    pkunit.pkeq(None, template_common.npz_cache_read(f, '.x', source=s))
+    template_common.npz_cache_write(f, '.x', s, PKDict(a=numpy.arange(3)))
+    template_common.npz_cache_write(f, '.x', s, PKDict(b=[1.5]), suffix='-b')
+    r = template_common.npz_cache_read(f, '.x', source=s)
+    pkunit.pkeq([0, 1, 2], r.a.tolist())
+    pkunit.pkeq(s, r.source)
+    pkunit.pkeq([1.5], template_common.npz_cache_read(f, '.x', suffix='-b').b.tolist())
+    f.write('abcd')
+    # changed file
+    pkunit.pkeq(None, template_common.npz_cache_read(f, '.x', source=template_common.npz_cache_source(f)))
+    pkunit.pkeq(s, template_common.npz_cache_read(f, '.x').source)
+    # failed write leaves the cache and no temporary file
+    template_common.npz_cache_write(f, '.x', [0, 0], PKDict(a=_Bad()))
+    pkunit.pkeq(['x.out-b.npz', 'x.out.npz'], sorted(x.basename for x in d.join('.x').listdir()))
+    pkunit.pkeq(s, template_common.npz_cache_read(f, '.x').source)
+
+
+def test_plot_values():
+    from pykern.pkcollections import PKDict
+    from sirepo.template import template_common
+    import numpy
+
+    pkunit.pkeq([1, 2, 3], template_common.compact_values(numpy.array([1.0, 2.0, 3.0])))
+    pkunit.pkeq(
+        [0.1234568, -12345.68, 0.0],
+        template_common.compact_values([0.123456789, -12345.6789, 0.0]),
+    )
+    # each value keeps its own precision
+    pkunit.pkeq(
+        [1e-10, 2.123457e-09, 1000.0, 5.5, float('inf')],
+        template_common.compact_values([1e-10, 2.1234567891e-9, 1e3, 5.5, float('inf')]),
+    )
+    # x with a large offset is not compacted
+    r = template_common.parameter_plot(
+        [1577836800.001, 1577836800.002],
+        [PKDict(points=[1e-10, 2e-9], field='y')],
+        PKDict(),
+    )
+    pkunit.pkeq([1577836800.001, 1577836800.002], r.x_points)
+    pkunit.pkeq([1e-10, 2e-9], r.plots[0].points)
+    h = template_common.histogram([1, 2, 2, 3], PKDict(histogramBins=2))
+    pkunit.pkeq([1, 3], h.points)
+    pkunit.pkeq([1.0, 3.0], h.x_range)
+    h = template_common.heatmap(
+        [[0, 1], [0, 1]],
+        PKDict(histogramBins=2),
+        weights=[0.5, 2],
+    )
+    pkunit.pkeq([[0.5, 0], [0, 2]], h.z_matrix)
+    n = template_common.cfg.plot_max_points * 10
+    x = numpy.arange(n)
+    y = numpy.sin(x / 1000.0)
+    y[12345] = 5
+    r = template_common.parameter_plot(x, [PKDict(points=y, field='y')], PKDict())
+    pkunit.pkok(
+        len(r.x_points) <= template_common.cfg.plot_max_points + 2,
+        'not downsampled len={}',
+        len(r.x_points),
+    )
+    pkunit.pkeq([0, n - 1], r.x_range)
+    pkunit.pkeq(5, r.y_range[1])
+    pkunit.pkok(12345 in r.x_points, 'max point dropped')
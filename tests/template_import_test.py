@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+u"""Templates import without loading heavy modules
+
+:copyright: Copyright (c) 2020 RadiaSoft LLC.  All Rights Reserved.
+:license: http://www.apache.org/licenses/LICENSE-2.0.html
+"""
+from __future__ import absolute_import, division, print_function
+from pykern.pkcollections import PKDict
+import pytest
+
+#: modules which must only be imported by the functions which use them
+_HEAVY = (
+    'h5py',
+    'opmd_viewer',
+    'rswarp',
+    'scipy',
+    'sklearn',
+    'sympy',
+    'synergia',
+)
+
+#: optional native modules a template imports at module level; any of
+#: the alternatives in a tuple will do
+_NATIVE = PKDict(
+    elegant=('sdds',),
+    rs4pi=(('pydicom', 'dicom'),),
+    srw=('bnlcrl', 'srwlib'),
+)
+
+_IMPORT = '''
+import json, sys
+import sirepo.template.{}
+print(json.dumps(sorted(set(m.split('.')[0] for m in sys.modules))))
+'''
+
+
+def _missing_native(sim_type):
+    import importlib.util
+
+    for m in _NATIVE.get(sim_type, ()):
+        if isinstance(m, str):
+            m = (m,)
+        if not any(importlib.util.find_spec(x) for x in m):
+            return m[0]
+    return None
+
+
+def _sim_types():
+    from sirepo import feature_config
+
+    return sorted(feature_config.ALL_CODES)
+
+
+@pytest.mark.parametrize('sim_type', _sim_types())
+def test_import(sim_type):
+    from pykern import pkjson
+    from pykern import pkunit
+    import subprocess
+    import sys
+
+    m = _missing_native(sim_type)
+    if m:
+        pytest.skip('{}: optional module {} not installed'.format(sim_type, m))
+    p = subprocess.Popen(
+        [sys.executable, '-c', _IMPORT.format(sim_type)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    o, e = p.communicate()
+    pkunit.pkeq(0, p.returncode, '{}: import failed: {}', sim_type, e)
+    r = pkjson.load_any(o)
+    for m in _HEAVY:
+        pkunit.pkok(
+            m not in r,
+            '{}: imports {} at module level',
+            sim_type,
+            m,
+        )